@@ -0,0 +1,152 @@
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import ner_worker
+from mlflow_registry import read_scalars
+from numpy_intent import NumpyIntentModel
+from text_tokenizer import VocabTokenizer
+
+# Sample traffic used to warm the models up after loading, so the first real
+# request doesn't pay for TensorFlow graph tracing and spaCy lazy init
+WARMUP_MESSAGES = [
+    "hello",
+    "Add Garri from Lagos Premium Garri to my cart",
+    "remove local beans from my cart",
+    "search for garri",
+    "view my cart",
+]
+
+
+class AssistantModels:
+    """The intent classifier, its tokenizer and intent labels, and the NER pipeline"""
+
+    def __init__(self, tokenizer, classes, intent_model, nlp_ner, max_seq_len: int = 35, ner_processes: int = 1):
+        self.tokenizer = tokenizer
+        # Intent label of each model output, i.e. the label encoder's classes_
+        self.classes = np.asarray(classes)
+        self.intent_model = intent_model
+        self.nlp_ner = nlp_ner
+        self.max_seq_len = max_seq_len
+        self.ner_processes = ner_processes
+
+    def prepare_sentences(self, sentences: List[str]) -> np.ndarray:
+        return self.tokenizer.encode(sentences, self.max_seq_len)
+
+    def predict_intents(self, input_features: np.ndarray) -> List[str]:
+        probs = self.intent_model.predict(input_features, batch_size=len(input_features), verbose=0)
+        return list(self.classes[probs.argmax(axis=-1)])
+
+    def extract_entities(self, messages: List[str]) -> List[List[Dict[str, str]]]:
+        if self.nlp_ner is None:
+            return [[] for _ in messages]
+        return ner_worker.pipe_entities(self.nlp_ner, messages, self.ner_processes)
+
+    def with_intent_artifact(self, path: str, label_encoder_path: str) -> "AssistantModels":
+        """A copy running the intent model in `path` (see load_intent_artifact), sharing the NER
+        pipeline, and the tokenizer unless the artifact brings its own vocabulary"""
+        intent_model, classes, max_seq_len, vocab_path = load_intent_artifact(path, label_encoder_path)
+        return AssistantModels(
+            VocabTokenizer.load(vocab_path) if vocab_path else self.tokenizer,
+            classes, intent_model, self.nlp_ner,
+            max_seq_len=max_seq_len or self.max_seq_len, ner_processes=self.ner_processes,
+        )
+
+
+def load_intent_artifact(path: str, label_encoder_path: str) -> Tuple[object, np.ndarray, Optional[int], Optional[str]]:
+    """Load an intent model version; returns (model, classes, max_seq_len, vocabulary path).
+
+    `path` is an exported intent_model.npz (or a directory holding one) or
+    a Keras SavedModel directory. MLflow models logged as pickles are
+    refused: unpickling runs arbitrary code from the artifact store. Export
+    them with export_intent_model.py and register the .npz instead. Labels
+    come from `label_encoder_path` unless the artifact carries its own, and
+    the tokenizer and sequence length stay those already in use unless the
+    artifact brings a vocabulary.
+    """
+    npz = path if path.endswith(".npz") else os.path.join(path, "intent_model.npz")
+    if os.path.isfile(npz):
+        model = NumpyIntentModel.load(npz)
+        vocab_path = os.path.join(os.path.dirname(npz), "tokenizer_vocab.json")
+        return model, model.classes, model.max_seq_len, vocab_path if os.path.isfile(vocab_path) else None
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No intent model at {path}")
+
+    mlmodel = os.path.join(path, "MLmodel")
+    if os.path.isfile(mlmodel) and read_scalars(mlmodel).get("pickled_model"):
+        raise ValueError(f"{path} holds a pickled model, which isn't loaded; "
+                         "register the intent_model.npz export_intent_model.py writes for it")
+    from tensorflow.keras.models import load_model
+    model = load_model(path)
+
+    with open(label_encoder_path, "rb") as f:
+        classes = pickle.load(f).classes_
+    vocab_path = os.path.join(path, "tokenizer_vocab.json")
+    return model, classes, None, vocab_path if os.path.isfile(vocab_path) else None
+
+
+def load_ner_model(ner_model_path: Optional[str], ner_mode: str = "full"):
+    if not ner_model_path:
+        return None
+    return ner_worker.load_ner(ner_model_path, ner_mode)
+
+
+def load_assistant_models(
+    vocab_path: str,
+    label_encoder_path: str,
+    intent_model_path: str,
+    ner_model_path: Optional[str],
+    ner_mode: str = "full",
+    ner_processes: int = 1,
+) -> AssistantModels:
+    """Load every artifact; TensorFlow and spaCy are only imported here"""
+    from tensorflow.keras.models import load_model
+
+    tokenizer = VocabTokenizer.load(vocab_path)
+
+    with open(label_encoder_path, 'rb') as f:
+        label_encoder = pickle.load(f)
+
+    intent_model = load_model(intent_model_path)
+
+    return AssistantModels(
+        tokenizer, label_encoder.classes_, intent_model, load_ner_model(ner_model_path, ner_mode),
+        ner_processes=ner_processes,
+    )
+
+
+def load_registry_assistant_models(
+    vocab_path: str,
+    label_encoder_path: str,
+    artifact_path: str,
+    ner_model_path: Optional[str],
+    ner_mode: str = "full",
+    ner_processes: int = 1,
+) -> AssistantModels:
+    """Load the intent model of a registry version (see load_intent_artifact) and the NER model"""
+    intent_model, classes, max_seq_len, artifact_vocab = load_intent_artifact(artifact_path, label_encoder_path)
+    models = AssistantModels(
+        VocabTokenizer.load(artifact_vocab or vocab_path), classes, intent_model,
+        load_ner_model(ner_model_path, ner_mode), ner_processes=ner_processes,
+    )
+    if max_seq_len:
+        models.max_seq_len = max_seq_len
+    return models
+
+
+def load_numpy_assistant_models(
+    vocab_path: str,
+    weights_path: str,
+    ner_model_path: Optional[str],
+    ner_mode: str = "full",
+    ner_processes: int = 1,
+) -> AssistantModels:
+    """Load the exported intent model (see export_intent_model.py) without TensorFlow"""
+    tokenizer = VocabTokenizer.load(vocab_path)
+    intent_model = NumpyIntentModel.load(weights_path)
+    return AssistantModels(
+        tokenizer, intent_model.classes, intent_model, load_ner_model(ner_model_path, ner_mode),
+        max_seq_len=intent_model.max_seq_len, ner_processes=ner_processes,
+    )
@@ -0,0 +1,187 @@
+"""Catalog bulk load and incremental update benchmark.
+
+Writes a synthetic catalog to a JSONL or CSV file, streams it into a
+Catalog with every derived index the app subscribes, and reports the load
+time and memory, plus the memory per product of the rows alone as dicts
+and as compact records. Then times small batches of upserts and deletes followed
+by a query, which patches the sort orders, against a full rebuild, and
+checks that both give the same results. Run from the api directory:
+
+    python -m benchmarks.bench_catalog --rows 1000000 --out catalog.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from typing import Any, Dict
+
+import numpy as np
+
+from benchmarks.datasets import CATEGORIES, iter_catalog
+from benchmarks.harness import save_results
+from catalog import Catalog
+from catalog_io import FIELDS, iter_products
+from catalog_store import CatalogStore
+from fast_json import RowEncoder
+from gazetteer import Gazetteer
+from product_index import ProductLookup
+from query_cache import QueryCache
+from schemas import Product
+from search_index import SearchIndex
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_catalog(path: str, rows: int):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            for row in iter_catalog(rows):
+                writer.writerow({**row, "categories": "|".join(row["categories"])})
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            for row in iter_catalog(rows):
+                f.write(json.dumps(row) + "\n")
+
+
+def row_bytes(path: str, compact: bool, limit: int) -> float:
+    """Traced bytes per product held by a Catalog of the first `limit` rows"""
+    rows = islice(iter_products(path), limit)
+    tracemalloc.start()
+    catalog = Catalog(rows, compact=compact)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / max(len(catalog), 1)
+
+
+def build(catalog: Catalog) -> CatalogStore:
+    """Subscribe the same derived structures as the app"""
+    catalog.subscribe(SearchIndex())
+    store = CatalogStore(catalog, CATEGORIES)
+    catalog.subscribe(ProductLookup())
+    catalog.subscribe(RowEncoder(Product))
+    catalog.subscribe(Gazetteer())
+    catalog.subscribe(QueryCache())
+    return store
+
+
+def queries(store: CatalogStore) -> Dict[Any, np.ndarray]:
+    results = {}
+    for sort_by in (None, "price-low", "price-high", "rating"):
+        for category in (None, CATEGORIES[0]):
+            positions = store.query(category=category, sort_by=sort_by)
+            results[(category, sort_by)] = store.ids[positions]
+    return results
+
+
+def bench_updates(catalog: Catalog, store: CatalogStore, batch: int, rounds: int) -> Dict[str, Any]:
+    """Upsert/delete `batch` rows, then time the query that applies them"""
+    rng = random.Random(1)
+    ids = [p["id"] for p in catalog]
+    next_id = max(ids) + 1
+    patch_ms = []
+    for _ in range(rounds):
+        for product_id in rng.sample(ids, batch):
+            row = catalog.get(product_id)
+            if row is None:
+                continue
+            if rng.random() < 0.2:
+                catalog.delete(product_id)
+            else:
+                catalog.upsert({**row, "price": row["price"] * rng.uniform(0.5, 1.5),
+                                "rating": round(rng.uniform(2.5, 5.0), 1)})
+        for row in iter_catalog(batch // 10, seed=rng.randrange(1 << 30), start_id=next_id):
+            catalog.upsert(row)
+        next_id += batch // 10
+        start = time.perf_counter()
+        store.query(sort_by="price-low")
+        patch_ms.append((time.perf_counter() - start) * 1000)
+
+    patched = queries(store)
+    store._invalidate()
+    start = time.perf_counter()
+    store.query()
+    rebuild_ms = (time.perf_counter() - start) * 1000
+    rebuilt = queries(store)
+    for key, expected in rebuilt.items():
+        if not np.array_equal(patched[key], expected):
+            raise AssertionError(f"Patched sort order differs from a rebuild for {key}")
+    return {
+        "batch": batch,
+        "rounds": rounds,
+        "patch_ms": round(float(np.median(patch_ms)), 3),
+        "rebuild_ms": round(rebuild_ms, 3),
+        "matches_rebuild": True,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--file", help="load this catalog file instead of a synthetic one")
+    parser.add_argument("--batch", type=int, default=100, help="rows changed per incremental update")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--compact", type=int, choices=[0, 1], default=1, help="load rows as compact records")
+    parser.add_argument("--memory-rows", type=int, default=100000, help="rows used for the bytes/product figures")
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, f"catalog.{args.format}")
+            start = time.perf_counter()
+            write_catalog(path, args.rows)
+            print(f"Wrote {args.rows} rows to {path} in {time.perf_counter() - start:.1f}s")
+
+        rss_before = max_rss_mb()
+        catalog = Catalog(compact=bool(args.compact))
+        store = build(catalog)
+        start = time.perf_counter()
+        count = catalog.load(iter_products(path))
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        store.query()
+        columns_s = time.perf_counter() - start
+        rss_after = max_rss_mb()
+        # Measured after the load so tracing doesn't inflate its max RSS
+        memory = {
+            "dict_bytes_per_product": round(row_bytes(path, False, args.memory_rows), 1),
+            "compact_bytes_per_product": round(row_bytes(path, True, args.memory_rows), 1),
+        }
+
+    results = {
+        "load": {
+            "rows": count,
+            "load_s": round(load_s, 2),
+            "us_per_item": round(load_s / max(count, 1) * 1e6, 2),
+            "columns_s": round(columns_s, 2),
+            "max_rss_mb": round(rss_after, 1),
+            "rss_growth_mb": round(rss_after - rss_before, 1),
+        },
+        "memory": memory,
+        "updates": bench_updates(catalog, store, args.batch, args.rounds),
+    }
+    load = results["load"]
+    print(f"Loaded {load['rows']} rows in {load['load_s']}s ({load['us_per_item']} us/row), "
+          f"columns built in {load['columns_s']}s, max RSS {load['max_rss_mb']} MB")
+    print(f"Rows alone: {memory['dict_bytes_per_product']} bytes/product as dicts, "
+          f"{memory['compact_bytes_per_product']} as compact records")
+    updates = results["updates"]
+    print(f"{updates['batch']}-row update: patch {updates['patch_ms']} ms, full rebuild {updates['rebuild_ms']} ms")
+    if args.out:
+        save_results(args.out, "catalog", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Facet count benchmark.
+
+Loads a synthetic catalog into a CatalogStore, then times facet counts of
+filtered results of different sizes against counting the same rows one
+dict at a time (what a client counting the full response would do), and
+the per-change cost of keeping the catalog-wide totals up to date. Run
+from the api directory:
+
+    python -m benchmarks.bench_facets --rows 1000000 --out facets.json
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict
+
+import config
+from benchmarks.datasets import CATEGORIES, iter_catalog
+from benchmarks.harness import latency_summary, save_results, timeit
+from catalog import Catalog
+from catalog_store import CatalogStore
+from facets import FacetCounts
+from search_index import SearchIndex
+
+
+def count_rows(rows, facets: FacetCounts) -> Dict[str, Any]:
+    """Facet counts over materialized rows, for comparison"""
+    counts = FacetCounts(facets.price_edges, facets.rating_thresholds, facets.store_limit)
+    counts.add_many(rows)
+    return counts.totals()
+
+
+def bench_queries(catalog: Catalog, store: CatalogStore, facets: FacetCounts, repeat: int) -> Dict[str, Any]:
+    search = SearchIndex()
+    catalog.subscribe(search)
+    queries = {
+        "all": store.query(),
+        "category": store.query(category=CATEGORIES[0]),
+        "price_band": store.query(min_price=5000, max_price=20000),
+        "category_price": store.query(category=CATEGORIES[1], max_price=2500),
+        "search": store.query(subset=store.positions(i for i, _ in search.search("garri"))),
+    }
+    results = {}
+    for name, positions in queries.items():
+        if len(positions) == len(catalog):
+            counted = facets.totals()
+            facet_ms = timeit(facets.totals, repeat)
+        else:
+            counted = facets.count(store, positions)
+            facet_ms = timeit(lambda: facets.count(store, positions), repeat)
+        start = time.perf_counter()
+        expected = count_rows(store.iter_rows(positions), facets)
+        rows_ms = (time.perf_counter() - start) * 1000
+        if counted != expected:
+            raise AssertionError(f"Facet counts differ from a row-by-row count for {name}")
+        results[name] = {"rows": len(positions), "facet_ms": round(facet_ms, 3), "row_count_ms": round(rows_ms, 1)}
+    return results
+
+
+def bench_updates(catalog: Catalog, store: CatalogStore, facets: FacetCounts, changes: int) -> Dict[str, Any]:
+    rng = random.Random(1)
+    ids = rng.sample([p["id"] for p in catalog], changes)
+    samples = []
+    for product_id in ids:
+        old = catalog.get(product_id)
+        row = {**old, "price": old["price"] * rng.uniform(0.5, 1.5), "store": rng.choice([old["store"], "New Store"])}
+        start = time.perf_counter()
+        facets.remove(old)
+        facets.add(row)
+        samples.append((time.perf_counter() - start) * 1000)
+        # Undone so that the upsert below applies the change through the catalog
+        facets.remove(row)
+        facets.add(old)
+        catalog.upsert(row)
+    if facets.totals() != facets.count(store, store.query()):
+        raise AssertionError("Maintained totals differ from a recount")
+    return {"changes": changes, **latency_summary(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    catalog = Catalog(compact=True)
+    store = CatalogStore(catalog, CATEGORIES)
+    facets = catalog.subscribe(FacetCounts(config.FACET_PRICE_EDGES, config.FACET_RATING_THRESHOLDS,
+                                           config.FACET_STORE_LIMIT))
+    start = time.perf_counter()
+    catalog.load(iter_catalog(args.rows))
+    load_s = time.perf_counter() - start
+    store.query()
+    start = time.perf_counter()
+    facets.reset(store)
+    reset_ms = (time.perf_counter() - start) * 1000
+
+    results = {
+        "load_s": round(load_s, 2),
+        "reset_ms": round(reset_ms, 1),
+        "queries": bench_queries(catalog, store, facets, args.repeat),
+        "updates": bench_updates(catalog, store, facets, args.changes),
+    }
+    print(f"Loaded {args.rows} rows in {results['load_s']}s; recounting the catalog takes {results['reset_ms']} ms")
+    for name, r in results["queries"].items():
+        print(f"{name:15} {r['rows']:8d} rows: facets {r['facet_ms']} ms (row by row {r['row_count_ms']} ms)")
+    updates = results["updates"]
+    print(f"Totals update per change: p50 {updates['p50_ms']} ms, p99 {updates['p99_ms']} ms")
+    if args.out:
+        save_results(args.out, "facets", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compare FastAPI's response_model serialization with the FAST_JSON path.
+
+Run from the api directory:
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import asyncio
+import json
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import fast_json
+from benchmarks.harness import timeit
+from schemas import Product
+
+
+def make_rows(n: int) -> List[dict]:
+    return [
+        {
+            "id": i,
+            "product": "Local Beans" if i % 2 else "Garri",
+            "price": 3000 + (i * 37) % 2500,
+            "image": "/images/products/local-beans.jpg",
+            "categories": ["Food & Groceries"],
+            "rating": round(3.5 + (i % 15) / 10, 1),
+            "store": f"Store {i % 500}",
+            "badge": "Popular" if i % 3 == 0 else None,
+            "description": "Fresh local beans, perfect for traditional dishes",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    field = create_response_field(name="response", type_=List[Product])
+    loop = asyncio.new_event_loop()
+
+    def pydantic_path(page):
+        content = loop.run_until_complete(serialize_response(field=field, response_content=page))
+        return JSONResponse(content).body
+
+    encoder = fast_json.RowEncoder(Product)
+
+    def fast_path(page):
+        return encoder.encode_list(page)
+
+    backend = "orjson" if fast_json.orjson is not None else "json"
+    print(f"{args.rows} rows, fast path encoder: {backend}")
+    print(f"{'page size':>10} {'pydantic ms':>12} {'fast cold ms':>13} {'fast warm ms':>13} {'speedup':>8}")
+    for size in (20, 100, 1000, args.rows):
+        page = rows[:size]
+        # Both paths must produce the same document
+        assert json.loads(pydantic_path(page)) == json.loads(fast_path(page))
+        slow = timeit(lambda: pydantic_path(page), args.repeat)
+        encoder._cache.clear()
+        cold = timeit(lambda: fast_path(page), 1)
+        warm = timeit(lambda: fast_path(page), args.repeat)
+        print(f"{size:>10} {slow:>12.3f} {cold:>13.3f} {warm:>13.3f} {slow / warm:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Microbenchmarks for each stage of the catalog and assistant pipelines.
+
+Scales the catalog with synthetic rows and times tokenization, padding, the
+intent LSTM, NER (catalog gazetteer and spaCy model), lookups, search,
+filter/sort and serialization on the app's own objects. Run from the api
+directory:
+
+    python -m benchmarks.bench_stages --rows 100000 --out stages.json
+
+Stages whose models can't be loaded here are reported as skipped.
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import config
+import main as api
+import ner_worker
+from benchmarks.datasets import CATEGORIES, assistant_corpus, generate_catalog, populate
+from benchmarks.harness import save_results, timeit
+from schemas import Product
+from text_tokenizer import VocabTokenizer
+
+
+def chunks(items, size: int):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def load_intent_model(backend: str):
+    if backend == "numpy":
+        from numpy_intent import NumpyIntentModel
+        return NumpyIntentModel.load(config.INTENT_NUMPY_WEIGHTS_PATH)
+    from tensorflow.keras.models import load_model
+    return load_model(config.INTENT_MODEL_PATH)
+
+
+class StageRunner:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: Dict[str, Any] = {}
+        print(f"{'stage':<26} {'items':>8} {'total ms':>10} {'us/item':>10}")
+
+    def run(self, name: str, fn, items: int):
+        ms = timeit(fn, self.repeat)
+        self.results[name] = {"items": items, "total_ms": round(ms, 3), "us_per_item": round(ms * 1000 / items, 3)}
+        print(f"{name:<26} {items:>8} {ms:>10.2f} {ms * 1000 / items:>10.2f}")
+
+    def skip(self, name: str, reason: str):
+        self.results[name] = {"skipped": reason}
+        print(f"{name:<26} skipped: {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="synthetic rows added to the catalog")
+    parser.add_argument("--per-intent", type=int, default=200, help="assistant messages per intent")
+    parser.add_argument("--batch-size", type=int, default=config.ASSISTANT_MAX_BATCH_SIZE)
+    parser.add_argument("--intent-backend", choices=("numpy", "keras"), default="numpy")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    rows = generate_catalog(args.rows, start_id=len(api.catalog) + 1)
+    start = time.perf_counter()
+    populate(api.catalog, rows)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"Catalog: {len(api.catalog)} rows, loaded in {load_ms:.0f} ms")
+    corpus = assistant_corpus(rows or list(api.catalog), args.per_intent)
+    messages: List[str] = [m for intent_messages in corpus.values() for m in intent_messages]
+
+    stages = StageRunner(args.repeat)
+    stages.results["catalog_load"] = {"items": len(rows), "total_ms": round(load_ms, 3)}
+
+    # Assistant pipeline
+    tokenizer = VocabTokenizer.load(config.TOKENIZER_VOCAB_PATH)
+    stages.run("tokenize", lambda: tokenizer.texts_to_sequences(messages), len(messages))
+    stages.run("tokenize+pad", lambda: tokenizer.encode(messages, 35), len(messages))
+    batches = chunks(tokenizer.encode(messages, 35), args.batch_size)
+    try:
+        model = load_intent_model(args.intent_backend)
+    except Exception as e:
+        stages.skip("lstm", f"{type(e).__name__}: {e}")
+    else:
+        stages.run("lstm", lambda: [model.predict(b, batch_size=len(b), verbose=0) for b in batches], len(messages))
+    if api.gazetteer is not None:
+        stages.run("ner_gazetteer", lambda: [api.gazetteer.match(m) for m in messages], len(messages))
+    try:
+        nlp = ner_worker.load_ner(config.NER_MODEL_PATH, config.NER_MODE)
+    except Exception as e:
+        stages.skip("ner_model", f"{type(e).__name__}: {e}")
+    else:
+        stages.run("ner_model", lambda: [ner_worker.pipe_entities(nlp, b) for b in chunks(messages, args.batch_size)],
+                   len(messages))
+
+    # Catalog lookups, search and listing
+    sample = rows[::max(1, len(rows) // 1000)] or list(api.catalog)
+    lookup = api.product_lookup
+    stages.run("lookup_name_store", lambda: [lookup.by_name_and_store(r["product"], r["store"]) for r in sample],
+               len(sample))
+    stages.run("lookup_id", lambda: [api.catalog.get(r["id"]) for r in sample], len(sample))
+    queries = [r["product"].split()[-1] for r in sample[:200]] + [r["product"][:3] for r in sample[:50]]
+    stages.run("search", lambda: [api.search_index.search(q) for q in queries], len(queries))
+    stages.run("catalog_store_rebuild", api.catalog_store._rebuild, len(api.catalog))
+    listings = [(c, s) for c in CATEGORIES for s in (None, "price-low", "rating")]
+    stages.run("filter_sort", lambda: [api.catalog_store.query(category=c, sort_by=s) for c, s in listings],
+               len(listings))
+
+    # Serialization of 20-row pages
+    pages = chunks(sample, 20)
+    stages.run("serialize_pydantic", lambda: [json.dumps([Product(**r).dict() for r in p]) for p in pages],
+               len(sample))
+    stages.run("serialize_fast", lambda: [api.row_encoder.encode_list(p) for p in pages], len(sample))
+
+    if args.out:
+        save_results(args.out, "stages", vars(args), stages.results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Typeahead (/suggest) benchmark at catalog scale.
+
+Builds a SuggestIndex over `--entries` distinct synthetic names made of
+pseudo-words, with Zipf-distributed listing counts, and reports the build
+time and memory and the latency of typed prefixes, multi-word prefixes,
+misspelled words and whole-name snapping. Run from the api directory:
+
+    python -m benchmarks.bench_suggest --entries 1000000 --out suggest.json
+"""
+import argparse
+import random
+import resource
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.datasets import CATEGORIES
+from benchmarks.harness import latency_summary, save_results
+from suggest_index import SuggestIndex
+
+SYLLABLES = [c + v for c in "bcdfghjklmnprstvwyz" for v in "aeiou"]
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def names(entries: int, vocab: List[str], rng: random.Random) -> List[str]:
+    found = set()
+    while len(found) < entries:
+        found.add(" ".join(rng.choice(vocab) for _ in range(rng.randint(1, 4))).title())
+    return list(found)
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word))
+    edit = rng.choice(("delete", "replace", "insert", "swap"))
+    if edit == "delete" and len(word) > 4:
+        return word[:i] + word[i + 1:]
+    if edit == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == "insert":
+        return word[:i] + rng.choice("aeioubkr") + word[i:]
+    return word[:i] + rng.choice("aeioubkr".replace(word[i], "")) + word[i + 1:]
+
+
+def measure(fn: Callable[[str], object], queries: List[str]) -> Dict[str, float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return latency_summary(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000000, help="distinct product names")
+    parser.add_argument("--vocab", type=int, default=50000, help="distinct words in the names")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    product_names = names(args.entries, vocabulary(args.vocab, rng), rng)
+    stores = [f"{name} Stores" for name in rng.sample(product_names, min(1000, len(product_names)))]
+
+    rss_before = max_rss_mb()
+    index = SuggestIndex()
+    start = time.perf_counter()
+    for name in product_names:
+        # Zipf-like popularity: most names have one listing, a few many
+        index.add_name("product", name, int(1 / (1 - rng.random()) ** 0.8))
+    for store in stores:
+        index.add_name("store", store, rng.randint(1, 500))
+    for category in CATEGORIES:
+        index.add_name("category", category, rng.randint(1000, 100000))
+    index.build()
+    build_s = time.perf_counter() - start
+    rss_after = max_rss_mb()
+
+    sample = [name.lower() for name in rng.sample(product_names, args.queries)]
+    query_sets = {
+        "prefix_1_3_chars": [name[:rng.randint(1, 3)] for name in sample],
+        "prefix_4_8_chars": [name[:rng.randint(4, 8)] for name in sample],
+        "two_word_prefix": [" ".join(name.split()[:2])[:-1] for name in sample],
+        "misspelled_word": [misspell(name.split()[0], rng) for name in sample],
+    }
+    suggest = lambda q: index.suggest(q, args.limit)  # noqa: E731
+    results = {
+        "build": {
+            "entries": len(index),
+            "build_s": round(build_s, 2),
+            "max_rss_mb": round(rss_after, 1),
+            "rss_growth_mb": round(rss_after - rss_before, 1),
+        },
+        # A first pass fills the memo of wide prefixes; the second is steady state
+        "cold": {"prefix_1_3_chars": measure(suggest, query_sets["prefix_1_3_chars"])},
+        "suggest": {name: measure(suggest, queries) for name, queries in query_sets.items()},
+        "snap": measure(lambda q: index.snap(q, "product"), [misspell(name, rng) for name in sample]),
+    }
+    build = results["build"]
+    print(f"Indexed {build['entries']} names in {build['build_s']}s, max RSS {build['max_rss_mb']} MB")
+    for name, summary in results["suggest"].items():
+        print(f"{name:18} p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms")
+    print(f"{'snap':18} p50 {results['snap']['p50_ms']} ms, p99 {results['snap']['p99_ms']} ms")
+    if args.out:
+        save_results(args.out, "suggest", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
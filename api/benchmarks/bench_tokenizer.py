@@ -0,0 +1,71 @@
+"""Compare the pickled Keras tokenizer with text_tokenizer.VocabTokenizer.
+
+Run from the api directory (the Keras rows need TensorFlow installed):
+
+    python -m benchmarks.bench_tokenizer --messages 10000
+"""
+import argparse
+import pickle
+import random
+import time
+
+import config
+from assistant_models import WARMUP_MESSAGES
+from benchmarks.harness import timeit
+from text_tokenizer import VocabTokenizer
+
+MAX_SEQ_LEN = 35
+
+
+def make_messages(words, n: int):
+    rng = random.Random(0)
+    messages = list(WARMUP_MESSAGES)
+    while len(messages) < n:
+        messages.append(" ".join(rng.choice(words) for _ in range(rng.randint(2, 12))).capitalize() + "?")
+    return messages[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tokenizer = VocabTokenizer.load(config.TOKENIZER_VOCAB_PATH)
+    load_ms = (time.perf_counter() - start) * 1000
+    messages = make_messages(list(tokenizer.word_index), args.messages)
+    n = len(messages)
+
+    results = [("VocabTokenizer.encode, batch", timeit(lambda: tokenizer.encode(messages, MAX_SEQ_LEN), args.repeat)),
+               ("VocabTokenizer.encode, per message",
+                timeit(lambda: [tokenizer.encode([m], MAX_SEQ_LEN) for m in messages], args.repeat))]
+    print(f"{n} messages; vocabulary JSON loaded in {load_ms:.2f} ms")
+
+    try:
+        from tensorflow.keras.preprocessing.sequence import pad_sequences
+    except ImportError:
+        print("TensorFlow not installed, skipping the Keras tokenizer")
+    else:
+        start = time.perf_counter()
+        with open(config.TOKENIZER_PATH, "rb") as handle:
+            keras_tokenizer = pickle.load(handle)
+        print(f"Keras tokenizer unpickled in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        def keras_batch():
+            return pad_sequences(keras_tokenizer.texts_to_sequences(messages), maxlen=MAX_SEQ_LEN, padding="post")
+
+        # Both tokenizers must produce the same ids
+        assert (keras_batch() == tokenizer.encode(messages, MAX_SEQ_LEN)).all()
+        results.append(("Keras + pad_sequences, batch", timeit(keras_batch, args.repeat)))
+        results.append(("Keras + pad_sequences, per message", timeit(
+            lambda: [pad_sequences(keras_tokenizer.texts_to_sequences([m]), maxlen=MAX_SEQ_LEN, padding="post")
+                     for m in messages], args.repeat)))
+
+    print(f"{'tokenizer':<36} {'total ms':>10} {'us/message':>11}")
+    for name, ms in results:
+        print(f"{name:<36} {ms:>10.2f} {ms * 1000 / n:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
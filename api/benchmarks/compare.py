@@ -0,0 +1,60 @@
+"""Compare two benchmark result files, e.g. from two commits.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Prints every timing present in both files with its relative change, and
+exits non-zero if any got worse by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+from typing import Dict
+
+# Metrics where a higher value is better; every other timing is lower-is-better
+HIGHER_IS_BETTER = ("throughput_rps",)
+METRICS = ("us_per_item", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{prefix}{key}."))
+        elif key in METRICS and isinstance(value, (int, float)):
+            metrics[prefix + key] = float(value)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before["benchmark"] != after["benchmark"]:
+        sys.exit(f"Different benchmarks: {before['benchmark']} vs {after['benchmark']}")
+    print(f"{before['benchmark']}: {before['commit']} -> {after['commit']}")
+
+    old, new = flatten(before["results"]), flatten(after["results"])
+    regressions = 0
+    print(f"{'metric':<48} {'before':>10} {'after':>10} {'change':>8}")
+    for name in sorted(old.keys() & new.keys()):
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / old[name] * 100
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<48} {old[name]:>10.3f} {new[name]:>10.3f} {change:>+7.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
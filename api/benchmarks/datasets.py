@@ -0,0 +1,125 @@
+"""Synthetic catalog rows and assistant messages for the benchmarks.
+
+Everything is generated from a fixed seed, so runs on different commits
+see exactly the same data.
+"""
+import random
+from typing import Dict, Iterator, List
+
+CATEGORIES = [
+    "Food & Groceries",
+    "Fashion & Accessories",
+    "Arts & Crafts",
+    "Home & Living",
+    "Beauty & Wellness",
+    "Electronics",
+    "Books & Education",
+    "Sports & Recreation",
+]
+
+PRODUCTS = {
+    "Food & Groceries": ["Garri", "Local Beans", "Ofada Rice", "Egusi", "Palm Oil", "Yam Flour", "Suya Spice",
+                         "Plantain Chips", "Dried Crayfish", "Ogbono"],
+    "Fashion & Accessories": ["Ankara Dress", "Aso Oke", "Coral Beads", "Agbada", "Gele", "Leather Sandals"],
+    "Arts & Crafts": ["Bronze Mask", "Adire Fabric", "Calabash Bowl", "Wood Carving", "Raffia Basket"],
+    "Home & Living": ["Clay Pot", "Woven Mat", "Mortar and Pestle", "Brass Lamp", "Throw Pillow"],
+    "Beauty & Wellness": ["Shea Butter", "Black Soap", "Chewing Stick", "Coconut Oil", "Kohl"],
+    "Electronics": ["Phone Charger", "Power Bank", "Solar Lantern", "Bluetooth Speaker", "Earphones"],
+    "Books & Education": ["Yoruba Primer", "Igbo Dictionary", "Hausa Reader", "Exercise Book", "Atlas"],
+    "Sports & Recreation": ["Football", "Ayo Board", "Jersey", "Skipping Rope", "Table Tennis Bat"],
+}
+CITIES = ["Lagos", "Abuja", "Kano", "Ibadan", "Enugu", "Benin City", "Calabar", "Jos", "Maiduguri", "Sokoto",
+          "Port Harcourt", "Onitsha", "Owerri", "Abeokuta", "Ilorin", "Akure", "Kaduna", "Uyo"]
+STORE_KINDS = ["Essentials", "Market", "Traders", "Hub", "Depot", "Fresh Foods", "Emporium", "Stores", "Co"]
+ADJECTIVES = ["Premium", "Organic", "Handmade", "Fresh", "Traditional", "Classic", "Deluxe", "Local"]
+BADGES = [None, None, None, "Best Seller", "Popular", "Organic", "New", "Limited"]
+
+# Assistant messages per intent; {product} and {store} come from the catalog.
+# "greeting" is not one of the model's classes, it exercises the fallback.
+INTENT_TEMPLATES = {
+    "addToCart": [
+        "Add {product} from {store} to my cart",
+        "please put {product} from {store} in my cart",
+        "I want to buy {product} from {store}",
+        "add {product} to cart",
+    ],
+    "removeFromCart": [
+        "remove {product} from my cart",
+        "take {product} out of my cart",
+        "delete {product} from {store} from my cart",
+    ],
+    "searchProduct": [
+        "search for {product}",
+        "do you have {product}",
+        "show me {product} from {store}",
+        "find cheap {product}",
+    ],
+    "viewCart": [
+        "view my cart",
+        "what is in my cart",
+        "show my cart please",
+        "open my shopping cart",
+    ],
+    "greeting": [
+        "hello",
+        "good morning",
+        "hi there, how are you",
+        "hey",
+    ],
+}
+
+
+def store_names(seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    names = [f"{city} {kind}" for city in CITIES for kind in STORE_KINDS]
+    rng.shuffle(names)
+    return names
+
+
+def generate_catalog(n: int, seed: int = 0, start_id: int = 1) -> List[dict]:
+    """`n` product rows shaped like `products_db`, with ids from `start_id`"""
+    return list(iter_catalog(n, seed, start_id))
+
+
+def iter_catalog(n: int, seed: int = 0, start_id: int = 1) -> Iterator[dict]:
+    """Streaming version of `generate_catalog`, for catalogs too big to hold twice"""
+    rng = random.Random(seed)
+    stores = store_names(seed)
+    for product_id in range(start_id, start_id + n):
+        category = rng.choice(CATEGORIES)
+        base = rng.choice(PRODUCTS[category])
+        # Mostly plain names, so names repeat across stores like the real catalog
+        name = base if rng.random() < 0.7 else f"{rng.choice(ADJECTIVES)} {base}"
+        categories = [category]
+        if rng.random() < 0.1:
+            categories.append(rng.choice(CATEGORIES))
+        yield {
+            "id": product_id,
+            "product": name,
+            "price": float(rng.randrange(200, 200000, 50)),
+            "image": f"/images/products/{base.lower().replace(' ', '-')}.jpg",
+            "categories": list(dict.fromkeys(categories)),
+            "rating": round(rng.uniform(2.5, 5.0), 1) if rng.random() < 0.95 else None,
+            "store": rng.choice(stores),
+            "badge": rng.choice(BADGES),
+            "description": f"{rng.choice(ADJECTIVES)} {base.lower()} from {rng.choice(CITIES)}",
+        }
+
+
+def assistant_corpus(rows: List[dict], per_intent: int = 200, seed: int = 0) -> Dict[str, List[str]]:
+    """`per_intent` messages for each intent in INTENT_TEMPLATES, naming products from `rows`"""
+    rng = random.Random(seed)
+    corpus = {}
+    for intent, templates in INTENT_TEMPLATES.items():
+        messages = []
+        for _ in range(per_intent):
+            row = rng.choice(rows)
+            message = rng.choice(templates).format(product=row["product"], store=row["store"])
+            messages.append(message.lower() if rng.random() < 0.3 else message)
+        corpus[intent] = messages
+    return corpus
+
+
+def populate(catalog, rows: List[dict]):
+    """Bulk-load `rows` into a Catalog, updating every subscribed index"""
+    catalog.load(rows)
@@ -0,0 +1,60 @@
+"""Timing helpers and the JSON result format shared by the benchmarks."""
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+
+def timeit(fn, repeat: int) -> float:
+    """Best-of-repeat wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    """Mean, p50/p95/p99 and max of a list of latencies (nearest-rank percentiles)"""
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(path: str, benchmark: str, params: Dict[str, Any], results: Dict[str, Any]):
+    """Write results with enough context to compare runs across commits"""
+    document = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {path}")
@@ -0,0 +1,152 @@
+"""In-process concurrent load test of the API.
+
+Drives the FastAPI app through httpx's ASGI transport (no network, no
+uvicorn) with a fixed number of concurrent clients per scenario, and
+reports throughput and p50/p95/p99 latency. Run from the api directory:
+
+    python -m benchmarks.load_test --rows 100000 --concurrency 32 --out load.json
+
+The assistant scenario uses whatever models the config selects; without
+TensorFlow or spaCy installed, run it with INTENT_BACKEND=numpy and an
+empty NER_MODEL_PATH.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+import main as api
+from benchmarks.datasets import CATEGORIES, assistant_corpus, generate_catalog, populate
+from benchmarks.harness import latency_summary, save_results
+from model_registry import ModelsUnavailable
+
+# i -> (method, url, httpx request kwargs, tag for per-kind latencies)
+RequestFactory = Callable[[int], Tuple[str, str, Dict[str, Any], str]]
+
+SORTS = [None, "price-low", "price-high", "rating"]
+
+
+def scenarios(rows: List[dict], corpus: Dict[str, List[str]], seed: int = 0) -> Dict[str, RequestFactory]:
+    rng = random.Random(seed)
+    sample = rng.sample(rows, min(len(rows), 1000))
+    words = sorted({w for r in sample for w in r["product"].lower().split()})
+    messages = [(intent, m) for intent, intent_messages in corpus.items() for m in intent_messages]
+    rng.shuffle(messages)
+
+    def products(i):
+        params = {"category": CATEGORIES[i % len(CATEGORIES)], "limit": 20}
+        sort_by = SORTS[i % len(SORTS)]
+        if sort_by:
+            params["sort_by"] = sort_by
+        return "GET", "/products", {"params": params}, "list"
+
+    def search(i):
+        body = {"query": words[i % len(words)], "limit": 20, "sort_by": SORTS[i % len(SORTS)]}
+        return "POST", "/search", {"json": body}, "search"
+
+    def product_by_id(i):
+        return "GET", f"/products/{sample[i % len(sample)]['id']}", {}, "get"
+
+    def cart(i):
+        # Each add, view, update cycle works on one user's item
+        cycle, kind = divmod(i, 3)
+        user = f"bench-{cycle % 64}"
+        row = sample[cycle % len(sample)]
+        if kind == 0:
+            item = {f: row[f] for f in ("id", "product", "price", "image", "store")}
+            return "POST", f"/cart/{user}/add", {"json": {**item, "quantity": 1}}, "add"
+        if kind == 1:
+            return "GET", f"/cart/{user}", {}, "get"
+        return "PUT", f"/cart/{user}/update", {"json": {"product_id": row["id"], "quantity": 2}}, "update"
+
+    def assistant(i):
+        intent, message = messages[i % len(messages)]
+        return "POST", "/personal_assistant", {"json": {"message": message}}, intent
+
+    return {"products": products, "search": search, "product_by_id": product_by_id, "cart": cart,
+            "assistant": assistant}
+
+
+async def drive(client: httpx.AsyncClient, make_request: RequestFactory, total: int, concurrency: int,
+                offset: int = 0) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {}
+    statuses: Counter = Counter()
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            method, url, kwargs, tag = make_request(offset + next_index)
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.setdefault(tag, []).append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    all_latencies = [ms for samples in latencies.values() for ms in samples]
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "throughput_rps": round(total / elapsed, 1),
+        "status": {str(code): n for code, n in sorted(statuses.items())},
+        **latency_summary(all_latencies),
+        "by_kind": {tag: latency_summary(samples) for tag, samples in sorted(latencies.items())},
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    await api.app.router.startup()
+    try:
+        rows = generate_catalog(args.rows, start_id=len(api.catalog) + 1)
+        populate(api.catalog, rows)
+        corpus = assistant_corpus(rows or list(api.catalog), args.per_intent)
+        factories = scenarios(rows or list(api.catalog), corpus)
+        results = {}
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                if name == "assistant":
+                    try:
+                        await api.model_registry.get()
+                    except ModelsUnavailable as e:
+                        results[name] = {"skipped": str(e)}
+                        print(f"{name:<14} skipped: {e}")
+                        continue
+                make_request = factories[name]
+                # Warm-up requests fill caches and trigger lazy rebuilds first
+                await drive(client, make_request, args.warmup, args.concurrency)
+                result = await drive(client, make_request, args.requests, args.concurrency, offset=args.warmup)
+                results[name] = result
+                print(f"{name:<14} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+                      f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}  {result['status']}")
+        return results
+    finally:
+        await api.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="synthetic rows added to the catalog")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-intent", type=int, default=200, help="assistant messages per intent")
+    parser.add_argument("--scenarios", nargs="+", default=["products", "search", "product_by_id", "cart", "assistant"])
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<14} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  status")
+    results = asyncio.run(run(args))
+    if args.out:
+        save_results(args.out, "load_test", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
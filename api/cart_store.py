@@ -0,0 +1,297 @@
+import json
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Tuple
+
+# Field order of a cart item, as returned to clients (matches CartItem)
+ITEM_FIELDS = ("id", "product", "price", "quantity", "image", "store")
+
+
+class CartNotFound(KeyError):
+    pass
+
+
+class CartItemNotFound(KeyError):
+    pass
+
+
+def check_updates(present: Iterable[int], updates: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """The updates, once every product id is known to be in the cart.
+
+    Raises CartItemNotFound before anything is written, so a batch applies
+    whole or not at all. An item removed earlier in the batch counts as gone.
+    """
+    present = set(present)
+    checked = []
+    for product_id, quantity in updates:
+        if product_id not in present:
+            raise CartItemNotFound(product_id)
+        if quantity <= 0:
+            present.discard(product_id)
+        checked.append((product_id, quantity))
+    return checked
+
+
+class MemoryCartBackend:
+    """Carts in a dict of per-user {product id: item} maps (one process only)"""
+
+    def __init__(self):
+        self._carts: Dict[str, Dict[int, dict]] = {}
+
+    def exists(self, user_id: str) -> bool:
+        return user_id in self._carts
+
+    def items(self, user_id: str) -> List[dict]:
+        return [dict(item) for item in self._carts.get(user_id, {}).values()]
+
+    def add_item(self, user_id: str, item: dict):
+        cart = self._carts.setdefault(user_id, {})
+        existing = cart.get(item["id"])
+        if existing is not None:
+            existing["quantity"] += item["quantity"]
+        else:
+            cart[item["id"]] = {f: item[f] for f in ITEM_FIELDS}
+
+    def update_items(self, user_id: str, updates: Iterable[Tuple[int, int]]):
+        cart = self._carts.get(user_id, {})
+        for product_id, quantity in check_updates(cart, updates):
+            if quantity <= 0:
+                del cart[product_id]
+            else:
+                cart[product_id]["quantity"] = quantity
+
+    def remove_item(self, user_id: str, product_id: int) -> bool:
+        return self._carts.get(user_id, {}).pop(product_id, None) is not None
+
+    def clear(self, user_id: str):
+        if user_id in self._carts:
+            self._carts[user_id] = {}
+
+
+class SQLiteCartBackend:
+    """Carts in a SQLite file, shared by every worker process on the host.
+
+    Each thread gets its own connection; WAL mode lets readers in other
+    processes proceed while one of them writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS carts (user_id TEXT PRIMARY KEY)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cart_items ("
+                " user_id TEXT NOT NULL, id INTEGER NOT NULL, product TEXT NOT NULL,"
+                " price REAL NOT NULL, quantity INTEGER NOT NULL, image TEXT NOT NULL,"
+                " store TEXT NOT NULL, seq INTEGER NOT NULL,"
+                " PRIMARY KEY (user_id, id))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def exists(self, user_id: str) -> bool:
+        row = self._conn().execute("SELECT 1 FROM carts WHERE user_id = ?", (user_id,)).fetchone()
+        return row is not None
+
+    def items(self, user_id: str) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT id, product, price, quantity, image, store FROM cart_items"
+            " WHERE user_id = ? ORDER BY seq", (user_id,)
+        ).fetchall()
+        return [dict(zip(ITEM_FIELDS, row)) for row in rows]
+
+    def add_item(self, user_id: str, item: dict):
+        with self._conn() as conn:
+            conn.execute("INSERT OR IGNORE INTO carts (user_id) VALUES (?)", (user_id,))
+            # Upsert keeps the increment atomic across processes
+            conn.execute(
+                "INSERT INTO cart_items (user_id, id, product, price, quantity, image, store, seq)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?,"
+                "  (SELECT COALESCE(MAX(seq), 0) + 1 FROM cart_items WHERE user_id = ?))"
+                " ON CONFLICT (user_id, id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                (user_id, item["id"], item["product"], item["price"], item["quantity"],
+                 item["image"], item["store"], user_id),
+            )
+
+    def update_items(self, user_id: str, updates: Iterable[Tuple[int, int]]):
+        with self._conn() as conn:
+            # Takes the write lock up front, so no other process changes the
+            # cart between the check and the writes; raising rolls back
+            conn.execute("BEGIN IMMEDIATE")
+            present = [row[0] for row in conn.execute("SELECT id FROM cart_items WHERE user_id = ?", (user_id,))]
+            for product_id, quantity in check_updates(present, updates):
+                if quantity <= 0:
+                    conn.execute("DELETE FROM cart_items WHERE user_id = ? AND id = ?", (user_id, product_id))
+                else:
+                    conn.execute(
+                        "UPDATE cart_items SET quantity = ? WHERE user_id = ? AND id = ?",
+                        (quantity, user_id, product_id),
+                    )
+
+    def remove_item(self, user_id: str, product_id: int) -> bool:
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "DELETE FROM cart_items WHERE user_id = ? AND id = ?", (user_id, product_id)
+            )
+        return cursor.rowcount > 0
+
+    def clear(self, user_id: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cart_items WHERE user_id = ?", (user_id,))
+
+
+class RedisCartBackend:
+    """Carts in a Redis-compatible server (Redis, Valkey, KeyDB, ...).
+
+    Per user, `cart:<user>:items` maps product id to the item JSON and
+    `cart:<user>:qty` holds quantities, so adding to an existing item is a
+    single atomic HINCRBY. Items carry an insertion sequence for ordering.
+    Read-then-write operations run as WATCH/MULTI transactions on the
+    cart's keys, retried if another worker changes them in between.
+    """
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+
+    def _keys(self, user_id: str) -> Tuple[str, str]:
+        return f"cart:{user_id}:items", f"cart:{user_id}:qty"
+
+    def exists(self, user_id: str) -> bool:
+        return bool(self._redis.sismember("carts", user_id))
+
+    def items(self, user_id: str) -> List[dict]:
+        items_key, qty_key = self._keys(user_id)
+        pipe = self._redis.pipeline()
+        pipe.hgetall(items_key)
+        pipe.hgetall(qty_key)
+        raw_items, raw_qty = pipe.execute()
+        items = []
+        for product_id, raw in raw_items.items():
+            item = json.loads(raw)
+            item["quantity"] = int(raw_qty.get(product_id, 0))
+            items.append(item)
+        items.sort(key=lambda item: item.pop("seq"))
+        return [{f: item[f] for f in ITEM_FIELDS} for item in items]
+
+    def add_item(self, user_id: str, item: dict):
+        items_key, qty_key = self._keys(user_id)
+        product_id = item["id"]
+
+        def add(pipe):
+            if pipe.hexists(items_key, product_id):
+                pipe.multi()
+                pipe.hincrby(qty_key, product_id, item["quantity"])
+            else:
+                stored = {f: item[f] for f in ITEM_FIELDS if f != "quantity"}
+                stored["seq"] = pipe.incr(f"cart:{user_id}:seq")
+                pipe.multi()
+                pipe.hset(items_key, product_id, json.dumps(stored))
+                pipe.hset(qty_key, product_id, item["quantity"])
+            pipe.sadd("carts", user_id)
+
+        self._redis.transaction(add, items_key)
+
+    def update_items(self, user_id: str, updates: Iterable[Tuple[int, int]]):
+        items_key, qty_key = self._keys(user_id)
+        updates = list(updates)
+
+        def update(pipe):
+            present = [int(product_id) for product_id in pipe.hkeys(items_key)]
+            checked = check_updates(present, updates)
+            pipe.multi()
+            for product_id, quantity in checked:
+                if quantity <= 0:
+                    pipe.hdel(items_key, product_id)
+                    pipe.hdel(qty_key, product_id)
+                else:
+                    pipe.hset(qty_key, product_id, quantity)
+
+        self._redis.transaction(update, items_key, qty_key)
+
+    def remove_item(self, user_id: str, product_id: int) -> bool:
+        items_key, qty_key = self._keys(user_id)
+        pipe = self._redis.pipeline()
+        pipe.hdel(items_key, product_id)
+        pipe.hdel(qty_key, product_id)
+        removed, _ = pipe.execute()
+        return removed > 0
+
+    def clear(self, user_id: str):
+        self._redis.delete(*self._keys(user_id))
+
+
+class CartStore:
+    """Cart operations over a pluggable backend.
+
+    Item operations are O(1) per item (keyed by product id). A striped set
+    of locks serializes operations on the same cart when handlers run on
+    several threads, without one global lock for every user.
+    """
+
+    def __init__(self, backend, lock_stripes: int = 64):
+        self.backend = backend
+        self._locks = [threading.Lock() for _ in range(max(1, lock_stripes))]
+
+    def _lock(self, user_id: str) -> threading.Lock:
+        return self._locks[zlib.crc32(user_id.encode()) % len(self._locks)]
+
+    def exists(self, user_id: str) -> bool:
+        return self.backend.exists(user_id)
+
+    def get(self, user_id: str) -> List[dict]:
+        # Handlers run on several threads: don't read a cart mid-write
+        with self._lock(user_id):
+            return self.backend.items(user_id)
+
+    def add(self, user_id: str, item: dict) -> List[dict]:
+        return self.add_many(user_id, [item])
+
+    def add_many(self, user_id: str, items: Iterable[dict]) -> List[dict]:
+        with self._lock(user_id):
+            for item in items:
+                self.backend.add_item(user_id, item)
+            return self.backend.items(user_id)
+
+    def update(self, user_id: str, product_id: int, quantity: int) -> List[dict]:
+        return self.update_many(user_id, [(product_id, quantity)])
+
+    def update_many(self, user_id: str, updates: Iterable[Tuple[int, int]]) -> List[dict]:
+        """Set quantities; a quantity of zero or less removes the item.
+
+        All or nothing: if any product isn't in the cart, CartItemNotFound
+        is raised and the cart is left unchanged.
+        """
+        with self._lock(user_id):
+            if not self.backend.exists(user_id):
+                raise CartNotFound(user_id)
+            self.backend.update_items(user_id, updates)
+            return self.backend.items(user_id)
+
+    def remove(self, user_id: str, product_id: int) -> List[dict]:
+        with self._lock(user_id):
+            if not self.backend.exists(user_id):
+                raise CartNotFound(user_id)
+            self.backend.remove_item(user_id, product_id)
+            return self.backend.items(user_id)
+
+    def clear(self, user_id: str):
+        with self._lock(user_id):
+            self.backend.clear(user_id)
+
+
+def create_cart_store(backend: str, db_path: str, redis_url: str, lock_stripes: int) -> CartStore:
+    if backend == "memory":
+        return CartStore(MemoryCartBackend(), lock_stripes)
+    if backend == "sqlite":
+        return CartStore(SQLiteCartBackend(db_path), lock_stripes)
+    if backend == "redis":
+        return CartStore(RedisCartBackend(redis_url), lock_stripes)
+    raise ValueError(f"Unknown cart backend: {backend}")
@@ -0,0 +1,129 @@
+import gc
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional
+
+from product_record import ProductRecords
+
+
+class Catalog:
+    """Owns the product rows and keeps derived indexes in sync.
+
+    Indexes register through `subscribe` and must provide `add(product)` and
+    `remove(product)`; they are told about every row change so they can
+    update incrementally instead of being rebuilt. Optional hooks:
+    `add_many(products)` receives bulk loads in batches, and
+    `replace(old, new)` is called instead of remove + add when a row is
+    updated in place. `version` is bumped on every change.
+
+    Rows are kept in an insertion-ordered dict: updating a row keeps its
+    place in catalog order, new rows go to the end, and lookups, upserts
+    and deletes are constant time. With `compact` on, rows are stored as
+    read-only ProductRecords sharing repeated strings instead of dicts.
+    """
+
+    def __init__(self, products: Iterable[dict] = (), compact: bool = False):
+        self._by_id: Dict[int, dict] = {}
+        self._listeners = []
+        self.version = 0
+        self._record = ProductRecords() if compact else None
+        for product in products:
+            product = self._row(product)
+            self._by_id[product["id"]] = product
+
+    def _row(self, product: dict) -> dict:
+        return self._record(product) if self._record is not None else product
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def subscribe(self, listener):
+        add_many = getattr(listener, "add_many", None)
+        if add_many is not None:
+            add_many(self._by_id.values())
+        else:
+            for product in self._by_id.values():
+                listener.add(product)
+        self._listeners.append(listener)
+        return listener
+
+    def get(self, product_id: int) -> Optional[dict]:
+        return self._by_id.get(product_id)
+
+    def _replace(self, old: dict, product: dict):
+        for listener in self._listeners:
+            replace = getattr(listener, "replace", None)
+            if replace is not None:
+                replace(old, product)
+            else:
+                listener.remove(old)
+                listener.add(product)
+
+    def upsert(self, product: dict) -> dict:
+        product = self._row(product)
+        old = self._by_id.get(product["id"])
+        self._by_id[product["id"]] = product
+        if old is not None:
+            self._replace(old, product)
+        else:
+            for listener in self._listeners:
+                listener.add(product)
+        self.version += 1
+        return product
+
+    def delete(self, product_id: int) -> Optional[dict]:
+        old = self._by_id.pop(product_id, None)
+        if old is None:
+            return None
+        for listener in self._listeners:
+            listener.remove(old)
+        self.version += 1
+        return old
+
+    def load(self, products: Iterable[dict], batch_size: int = 10000) -> int:
+        """Upsert a stream of rows, handing new rows to listeners in batches.
+
+        Only `batch_size` rows are buffered at a time, so a large file can
+        be streamed straight into the catalog. Returns the number of rows.
+        The cyclic garbage collector is paused meanwhile: the indexes only
+        allocate acyclic dicts and lists, and full collections over millions
+        of new objects would otherwise dominate the load time.
+        """
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._load(iter(products), batch_size)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _load(self, products: Iterator[dict], batch_size: int) -> int:
+        count = 0
+        while True:
+            batch = list(islice(products, batch_size))
+            if not batch:
+                break
+            count += len(batch)
+            added = {}
+            for product in batch:
+                product = self._row(product)
+                product_id = product["id"]
+                old = self._by_id.get(product_id)
+                self._by_id[product_id] = product
+                if product_id in added:
+                    added[product_id] = product
+                elif old is not None:
+                    self._replace(old, product)
+                else:
+                    added[product_id] = product
+            for listener in self._listeners:
+                add_many = getattr(listener, "add_many", None)
+                if add_many is not None:
+                    add_many(added.values())
+                else:
+                    for product in added.values():
+                        listener.add(product)
+            self.version += 1
+        return count
@@ -0,0 +1,197 @@
+"""Catalog files: streaming readers and the SQLite catalog store.
+
+Rows are read one at a time, so a large file can be fed straight into
+`Catalog.load` without first building a list of every product. Supported
+inputs are CSV (categories as a JSON list or "a|b"), JSON Lines and SQLite
+files with a `products` table. Import a file into a catalog store with:
+
+    python catalog_io.py products.csv catalog.sqlite3
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+import fast_json
+
+# Column order of the products table (matches schemas.Product)
+FIELDS = ("id", "product", "price", "image", "categories", "rating", "store", "badge", "description")
+OPTIONAL_FIELDS = ("rating", "store", "badge", "description")
+
+
+def _categories(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            return json.loads(value)
+        return [c.strip() for c in value.split("|") if c.strip()]
+    return list(value)
+
+
+def normalize_product(raw: dict) -> dict:
+    """Coerce one input row to the shape of schemas.Product.
+
+    Values read from text formats arrive as strings; empty optional values
+    become None and unknown columns are dropped. Raises ValueError (or
+    KeyError for a missing required field) on bad rows.
+    """
+    product = {
+        "id": int(raw["id"]),
+        "product": str(raw["product"]),
+        "price": float(raw["price"]),
+        "image": str(raw["image"]),
+        "categories": _categories(raw.get("categories")),
+    }
+    for field in OPTIONAL_FIELDS:
+        value = raw.get(field)
+        if value == "" or value is None:
+            product[field] = None
+        elif field == "rating":
+            product[field] = float(value)
+        else:
+            product[field] = str(value)
+    return product
+
+
+def _normalized(rows: Iterable[dict], path: str) -> Iterator[dict]:
+    for line, raw in enumerate(rows, 1):
+        try:
+            yield normalize_product(raw)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: bad product in row {line}: {e!r}") from e
+
+
+def read_csv(path: str) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from _normalized(csv.DictReader(f), path)
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        yield from _normalized((fast_json.loads(line) for line in f if line.strip()), path)
+
+
+def read_sqlite(path: str) -> Iterator[dict]:
+    """Rows of the `products` table, in insertion order when it has a seq column"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(products)")]
+        order = " ORDER BY seq" if "seq" in columns else ""
+        selected = [f for f in FIELDS if f in columns]
+        cursor = conn.execute(f"SELECT {', '.join(selected)} FROM products{order}")
+        yield from _normalized((dict(zip(selected, row)) for row in cursor), path)
+    finally:
+        conn.close()
+
+
+READERS = {
+    ".csv": read_csv,
+    ".jsonl": read_jsonl,
+    ".ndjson": read_jsonl,
+    ".sqlite": read_sqlite,
+    ".sqlite3": read_sqlite,
+    ".db": read_sqlite,
+}
+
+
+def iter_products(path: str) -> Iterator[dict]:
+    """Stream normalized products from a file, picking the reader by extension"""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported catalog file {path!r}; expected one of {', '.join(sorted(READERS))}")
+    return reader(path)
+
+
+class CatalogFile:
+    """Catalog rows persisted in a SQLite file.
+
+    Admin changes are written here as they are applied to the in-memory
+    catalog, and the API reloads the file on startup. Rows keep the order
+    they were first inserted in (the seq column). Each thread gets its own
+    connection, as in the SQLite cart backend.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                " id INTEGER PRIMARY KEY, product TEXT NOT NULL, price REAL NOT NULL,"
+                " image TEXT NOT NULL, categories TEXT NOT NULL, rating REAL, store TEXT,"
+                " badge TEXT, description TEXT, seq INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS products_seq ON products (seq)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def rows(self) -> Iterator[dict]:
+        return read_sqlite(self.path)
+
+    def get(self, product_id: int) -> Optional[dict]:
+        conn = self._conn()
+        row = conn.execute(f"SELECT {', '.join(FIELDS)} FROM products WHERE id = ?", (product_id,)).fetchone()
+        return normalize_product(dict(zip(FIELDS, row))) if row is not None else None
+
+    def save(self, products: Iterable[dict]) -> int:
+        """Upsert products in one transaction; updated rows keep their place"""
+        conn = self._conn()
+        with conn:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM products").fetchone()[0]
+            params = (
+                (p["id"], p["product"], p["price"], p["image"], json.dumps(p.get("categories") or []),
+                 p.get("rating"), p.get("store"), p.get("badge"), p.get("description"), seq + i)
+                for i, p in enumerate(products, 1)
+            )
+            cursor = conn.executemany(
+                "INSERT INTO products (id, product, price, image, categories, rating, store, badge, description, seq)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET product = excluded.product, price = excluded.price,"
+                " image = excluded.image, categories = excluded.categories, rating = excluded.rating,"
+                " store = excluded.store, badge = excluded.badge, description = excluded.description",
+                params,
+            )
+        return cursor.rowcount
+
+    def delete(self, product_ids: Iterable[int]) -> int:
+        with self._conn() as conn:
+            cursor = conn.executemany("DELETE FROM products WHERE id = ?", ((i,) for i in product_ids))
+        return cursor.rowcount
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a catalog file into a SQLite catalog store")
+    parser.add_argument("source", help=f"input file ({', '.join(sorted(READERS))})")
+    parser.add_argument("store", help="SQLite catalog store to create or update")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = CatalogFile(args.store).save(iter_products(args.source))
+    elapsed = time.perf_counter() - start
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Imported {count} products in {elapsed:.1f}s (max RSS {max_rss_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
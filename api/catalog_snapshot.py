@@ -0,0 +1,739 @@
+"""Catalog snapshots shared by every worker through memory-mapped files.
+
+A snapshot is a directory written once by `publish`. It holds:
+- the filter and sort columns, with their sort orders and ranks;
+- the BM25 postings of the search index;
+- a sorted name index for product lookups;
+- the gazetteer's product and store names;
+- the typeahead's sorted name and deletion arrays;
+- every row pre-encoded as JSON.
+
+Workers open the arrays with np.load(mmap_mode="r"). The page cache keeps
+one copy for all of them, so a worker's own memory for the catalog does
+not grow with the catalog or with the number of workers. The CURRENT
+file names the active version and is replaced atomically. SnapshotCatalog
+polls it and swaps to a new version between requests, so a publish
+reaches every worker without a reload or restart.
+
+    python catalog_snapshot.py products.csv /var/lib/naijamarket/catalog
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import math
+import os
+import re
+import resource
+import shutil
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import fast_json
+from catalog_io import iter_products, normalize_product
+from catalog_store import ColumnarView
+from gazetteer import Gazetteer, Key, name_key
+from instrumentation import logger
+from product_index import normalize_name
+from product_record import ProductRecord
+from search_index import SearchIndex, tokenize
+from suggest_index import KINDS as SUGGEST_KINDS, SuggestArrays, SuggestIndex
+
+CURRENT = "CURRENT"
+# Bumped when the snapshot layout changes; older snapshots are republished
+FORMAT = 4
+_VERSION = re.compile(r"^v(\d+)$")
+# Sort orders are stored as order_<name>.npy; None is the id order
+_ORDER_FILES = {None: "id", "price-low": "price_low", "price-high": "price_high", "rating": "rating"}
+
+
+def _load(path: str) -> np.ndarray:
+    return np.load(path, mmap_mode="r")
+
+
+class StringTable:
+    """Strings stored as one UTF-8 blob plus offsets; `find` needs them sorted by their bytes"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        # Slicing memoryviews is several times faster than slicing arrays
+        self._blob = memoryview(blob)
+        self._offsets = memoryview(offsets)
+
+    @staticmethod
+    def write(path: str, name: str, strings: List[str], sort: bool = True):
+        """Write `strings`, sorted unless `sort` is False (such tables are only indexed, not searched)"""
+        encoded = [s.encode() for s in strings]
+        if sort:
+            encoded.sort()
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        np.save(os.path.join(path, f"{name}_blob.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(os.path.join(path, f"{name}_offsets.npy"), offsets)
+
+    @classmethod
+    def load(cls, path: str, name: str) -> "StringTable":
+        return cls(_load(os.path.join(path, f"{name}_blob.npy")), _load(os.path.join(path, f"{name}_offsets.npy")))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._bytes(i).decode()
+
+    def _bytes(self, i: int) -> bytes:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+    def find(self, key: str) -> int:
+        """Index of `key`, or -1 (binary search over the mapped blob)"""
+        target = key.encode()
+        blob, offsets = self._blob, self._offsets
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if blob[offsets[mid]:offsets[mid + 1]].tobytes() < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self._bytes(lo) == target else -1
+
+
+def write_suggest_index(path: str, names: Dict[Tuple[str, str], list], suggest: SuggestIndex):
+    """Typeahead arrays over the distinct names, built once here instead of in every worker"""
+    keys = [words for _, words in names]
+    kinds = np.array([SUGGEST_KINDS.index(kind) for kind, _ in names], dtype=np.int8)
+    counts = np.array([count for _, count in names.values()], dtype=np.int64)
+    words: Dict[str, int] = {}
+    for key, count in zip(keys, counts.tolist()):
+        for word in key.split():
+            words[word] = words.get(word, 0) + count
+    arrays = suggest.build_arrays(keys, np.ones(len(keys), dtype=bool), words)
+
+    def save(name: str, values):
+        np.save(os.path.join(path, f"suggest_{name}.npy"), values)
+
+    StringTable.write(path, "suggest_keys", keys, sort=False)
+    StringTable.write(path, "suggest_text", [text for text, _ in names.values()], sort=False)
+    save("kinds", kinds)
+    save("counts", counts)
+    save("rot_entries", arrays.rot_entries)
+    save("rot_offsets", arrays.rot_offsets)
+    StringTable.write(path, "suggest_vocab", arrays.vocab)
+    save("vocab_counts", np.array([words[word] for word in arrays.vocab], dtype=np.int64))
+    save("delete_hashes", arrays.delete_hashes)
+    save("delete_words", arrays.delete_words)
+    # (kind, name words) -> entry, for snapping whole names
+    lookup = [f"{kind}\0{words}" for kind, words in names]
+    entries = sorted(range(len(lookup)), key=lambda entry: lookup[entry].encode())
+    StringTable.write(path, "suggest_lookup", [lookup[entry] for entry in entries], sort=False)
+    save("lookup_entries", np.array(entries, dtype=np.int64))
+
+
+def write_gazetteer(path: str, names: Dict[Tuple[str, str], list]):
+    """The gazetteer's product and store names, built once here instead of in every worker.
+
+    Each first word maps to a bit mask of the name lengths starting with
+    it; names of 64 words or more are left out.
+    """
+    labels: Dict[str, int] = {}
+    lengths: Dict[str, int] = {}
+    for kind, words in names:
+        key = words.split()
+        if kind not in Gazetteer.LABELS or len(key) >= 64:
+            continue
+        # A name listed both as a product and as a store is a product
+        code = Gazetteer.LABELS.index(kind)
+        labels[words] = min(code, labels.get(words, code))
+        lengths[key[0]] = lengths.get(key[0], 0) | 1 << len(key)
+    keys = sorted(labels, key=str.encode)
+    StringTable.write(path, "gazetteer_names", keys)
+    np.save(os.path.join(path, "gazetteer_labels.npy"), np.array([labels[k] for k in keys], dtype=np.int8))
+    firsts = sorted(lengths, key=str.encode)
+    StringTable.write(path, "gazetteer_first", firsts)
+    np.save(os.path.join(path, "gazetteer_lengths.npy"), np.array([lengths[w] for w in firsts], dtype=np.uint64))
+
+
+def upserted_rows(ids: np.ndarray) -> Optional[np.ndarray]:
+    """Positions of the rows to keep when `ids` repeats some id, None if it doesn't.
+
+    A repeated id is an upsert, as in Catalog.load: the row stays where the
+    id first appeared, with the values of its last occurrence.
+    """
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    if len(starts) == len(ids):
+        return None
+    ends = np.r_[starts[1:], len(ids)] - 1
+    first, last = order[starts], order[ends]
+    return last[np.argsort(first)]
+
+
+def read_rows(path: str, offsets: Sequence[int], positions: Iterable[int]) -> Iterator[dict]:
+    """Rows at `positions` of a rows.bin file with the given row offsets"""
+    with open(path, "rb") as f:
+        for pos in positions:
+            f.seek(offsets[pos])
+            yield fast_json.loads(f.read(offsets[pos + 1] - offsets[pos]))
+
+
+def write_snapshot(path: str, products: Iterable[dict], search: Optional[SearchIndex] = None,
+                   suggest: Optional[SuggestIndex] = None) -> int:
+    """Write a snapshot of `products` (in catalog order) into the empty directory `path`.
+
+    Rows are normalized and streamed to disk; only the columns, postings
+    and distinct names are held in memory. A repeated id is an upsert (see
+    upserted_rows), which costs a second pass over the rows written.
+    Returns the number of rows.
+    """
+    search = search or SearchIndex()
+    suggest = suggest or SuggestIndex()
+    ids, price, rating, masks, store_codes = array("q"), array("d"), array("d"), array("Q"), array("i")
+    row_offsets = array("q", [0])
+    categories: Dict[str, int] = {}
+    stores: Dict[str, int] = {}
+    category_masks: Dict[Tuple[str, ...], int] = {}
+    vocab: Dict[str, int] = {}
+    post_terms, post_rows, post_tf = array("l"), array("l"), array("f")
+    doc_len = array("d")
+    total_len = 0.0
+    # first row per lookup key, as in ProductLookup
+    by_name: Dict[str, int] = {}
+    by_name_store: Dict[str, int] = {}
+    # (kind, name words) -> [name as first listed, listings], for the
+    # gazetteer and typeahead
+    names: Dict[Tuple[str, str], list] = {}
+
+    with open(os.path.join(path, "rows.bin"), "wb") as rows_file:
+        for pos, product in enumerate(products):
+            product = normalize_product(product)
+            encoded = fast_json.dumps(product)
+            rows_file.write(encoded)
+            row_offsets.append(row_offsets[-1] + len(encoded))
+
+            ids.append(product["id"])
+            price.append(product["price"])
+            # Missing ratings sort as 0, like CatalogStore
+            rating.append(product["rating"] or 0.0)
+            key = tuple(product["categories"])
+            mask = category_masks.get(key)
+            if mask is None:
+                mask = 0
+                for category in key:
+                    bit = categories.setdefault(category, len(categories))
+                    if bit >= 64:
+                        raise ValueError("A catalog snapshot supports at most 64 categories")
+                    mask |= 1 << bit
+                category_masks[key] = mask
+            masks.append(mask)
+            store_codes.append(stores.setdefault(product["store"] or "", len(stores)))
+
+            terms, length = search._cached_terms(product["product"], product["description"], key)
+            for term, tf in terms.items():
+                post_terms.append(vocab.setdefault(term, len(vocab)))
+                post_rows.append(pos)
+                post_tf.append(tf)
+            doc_len.append(length)
+            total_len += length
+
+            name = normalize_name(product["product"])
+            by_name.setdefault(name, pos)
+            store = normalize_name(product["store"])
+            if store:
+                by_name_store.setdefault(f"{name}\0{store}", pos)
+            labelled = [("product", product["product"]), ("store", product["store"])]
+            labelled.extend(("category", category) for category in key)
+            for kind, text in labelled:
+                words = " ".join(name_key(text))
+                if words:
+                    names.setdefault((kind, words), [text, 0])[1] += 1
+
+    keep = upserted_rows(np.frombuffer(ids, dtype=np.int64))
+    if keep is not None:
+        # Repeated ids: rewrite from the rows as Catalog.load would keep them
+        source = os.path.join(path, "rows.source.bin")
+        os.replace(os.path.join(path, "rows.bin"), source)
+        try:
+            return write_snapshot(path, read_rows(source, row_offsets, keep), search, suggest)
+        finally:
+            os.remove(source)
+
+    def save(name: str, values):
+        np.save(os.path.join(path, f"{name}.npy"), values)
+
+    ids = np.frombuffer(ids, dtype=np.int64)
+    columns = {
+        "ids": ids,
+        "price": np.frombuffer(price, dtype=np.float64),
+        "rating": np.frombuffer(rating, dtype=np.float64),
+    }
+    for name, values in columns.items():
+        save(name, values)
+    save("category_mask", np.frombuffer(masks, dtype=np.uint64))
+    save("store_code", np.frombuffer(store_codes, dtype=np.int32))
+    save("row_offsets", np.frombuffer(row_offsets, dtype=np.int64))
+
+    for sort_by, name in _ORDER_FILES.items():
+        if sort_by is None:
+            key = ids
+        else:
+            column, descending = ColumnarView.SORTS[sort_by]
+            key = -columns[column] if descending else columns[column]
+        order = np.lexsort((ids, key))
+        save(f"order_{name}", order)
+        if sort_by is None:
+            save("sorted_ids", ids[order])
+        else:
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            save(f"rank_{name}", rank)
+
+    # Postings in CSR form, terms in sorted order and rows ascending per term
+    terms = sorted(vocab)
+    remap = np.empty(len(terms), dtype=np.int64)
+    remap[[vocab[t] for t in terms]] = np.arange(len(terms))
+    term_of = remap[np.frombuffer(post_terms, dtype=np.int64)] if len(post_terms) else np.zeros(0, np.int64)
+    order = np.argsort(term_of, kind="stable")
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_of, minlength=len(terms)), out=offsets[1:])
+    save("postings_offsets", offsets)
+    save("postings_rows", np.frombuffer(post_rows, dtype=np.int64)[order].astype(np.int32))
+    save("postings_tf", np.frombuffer(post_tf, dtype=np.float32)[order])
+    save("doc_len", np.frombuffer(doc_len, dtype=np.float64))
+
+    for name, index in (("names", by_name), ("name_stores", by_name_store)):
+        keys = sorted(index, key=str.encode)
+        StringTable.write(path, name, keys)
+        save(f"{name}_rows", np.array([index[k] for k in keys], dtype=np.int64))
+    StringTable.write(path, "terms", terms)
+    StringTable.write(path, "stores", list(stores), sort=False)
+    write_gazetteer(path, names)
+    write_suggest_index(path, names, suggest)
+
+    meta = {
+        "rows": len(ids),
+        "format": FORMAT,
+        "categories": sorted(categories, key=categories.get),
+        "search": {"k1": search.k1, "b": search.b, "max_expansions": search.max_expansions,
+                   "total_len": total_len},
+        "suggest": {"max_edits": suggest.max_edits},
+        "created": time.time(),
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return len(ids)
+
+
+def current_version(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_format(path: str) -> int:
+    """Layout version of the snapshot in `path` (1 for snapshots predating the field)"""
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f).get("format", 1)
+
+
+def _versions(directory: str) -> List[Tuple[int, str]]:
+    versions = []
+    for name in os.listdir(directory):
+        match = _VERSION.match(name)
+        if match:
+            versions.append((int(match.group(1)), name))
+    return sorted(versions)
+
+
+def publish(directory: str, products: Iterable[dict], keep: int = 3) -> Tuple[str, int]:
+    """Write a new snapshot version and make it current; returns (version, rows).
+
+    The snapshot is written to a temporary directory, renamed into place
+    and then named in CURRENT with an atomic replace, so readers only ever
+    see complete snapshots. Beyond the newest `keep` versions, old ones are
+    deleted; workers still mapping one keep their pages until they swap.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".publish-", dir=directory)
+    try:
+        rows = write_snapshot(tmp, products)
+        while True:
+            versions = _versions(directory)
+            version = f"v{(versions[-1][0] if versions else 0) + 1:08d}"
+            try:
+                os.rename(tmp, os.path.join(directory, version))
+                break
+            except OSError:
+                # Another publisher took this version number
+                if not os.path.isdir(os.path.join(directory, version)):
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    pointer = os.path.join(directory, f".{CURRENT}.{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(directory, CURRENT))
+    for _, old in _versions(directory)[:-keep]:
+        if old != version:
+            shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version, rows
+
+
+def publish_if_missing(directory: str, products: Callable[[], Iterable[dict]]) -> Optional[str]:
+    """Publish `products()` unless a snapshot is already current; returns the current version.
+
+    A current snapshot in an older format is replaced. Workers starting
+    together take a file lock, so only the first publishes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".publish.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        version = current_version(directory)
+        if version is None or snapshot_format(os.path.join(directory, version)) != FORMAT:
+            version, rows = publish(directory, products())
+            logger.info("Published catalog snapshot %s (%d products)", version, rows)
+        return version
+
+
+class SnapshotGazetteer(Gazetteer):
+    """Gazetteer over the names `write_gazetteer` published, mapped read-only"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._names = StringTable.load(path, "gazetteer_names")
+        self._labels = _load(os.path.join(path, "gazetteer_labels.npy"))
+        self._first = StringTable.load(path, "gazetteer_first")
+        self._first_lengths = _load(os.path.join(path, "gazetteer_lengths.npy"))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _name_lengths(self, word: str) -> List[int]:
+        i = self._first.find(word)
+        if i < 0:
+            return []
+        mask = int(self._first_lengths[i])
+        return [length for length in range(mask.bit_length() - 1, 0, -1) if mask >> length & 1]
+
+    def _label(self, key: Key) -> Optional[str]:
+        i = self._names.find(" ".join(key))
+        return self.LABELS[self._labels[i]] if i >= 0 else None
+
+
+class SnapshotSuggestIndex(SuggestIndex):
+    """SuggestIndex over the arrays `write_suggest_index` published, mapped read-only"""
+
+    def __init__(self, path: str, max_edits: int):
+        super().__init__(max_edits)
+
+        def load(name: str) -> np.ndarray:
+            return _load(os.path.join(path, f"suggest_{name}.npy"))
+
+        self._keys = StringTable.load(path, "suggest_keys")
+        self._text = StringTable.load(path, "suggest_text")
+        self._kinds = load("kinds")
+        self._counts = load("counts")
+        self._vocab_counts = load("vocab_counts")
+        self._lookup = StringTable.load(path, "suggest_lookup")
+        self._lookup_entries = load("lookup_entries")
+        self._arrays = SuggestArrays(
+            self._keys,
+            load("rot_entries"),
+            load("rot_offsets"),
+            StringTable.load(path, "suggest_vocab"),
+            load("delete_hashes"),
+            load("delete_words"),
+        )
+
+    def _word_count(self, word: str) -> int:
+        i = self._arrays.vocab.find(word)
+        return int(self._vocab_counts[i]) if i >= 0 else 0
+
+    def _entry(self, key: str, kind: str) -> Optional[int]:
+        i = self._lookup.find(f"{kind}\0{key}")
+        return int(self._lookup_entries[i]) if i >= 0 else None
+
+
+class CatalogSnapshot(ColumnarView):
+    """Read-only catalog served from one mapped snapshot version.
+
+    Offers the read side of Catalog (get, len, iteration), CatalogStore
+    (queries and pages), SearchIndex (search), Gazetteer (match),
+    SuggestIndex (suggest and snap), ProductLookup and RowEncoder, all
+    over the mapped arrays. Rows are decoded from their stored JSON only
+    when returned.
+    """
+
+    PREFIX_WEIGHT = SearchIndex.PREFIX_WEIGHT
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        super().__init__(meta["categories"])
+        self.path = path
+        self.version = os.path.basename(path)
+
+        def load(name: str) -> np.ndarray:
+            return _load(os.path.join(path, f"{name}.npy"))
+
+        self.ids = load("ids")
+        self.price = load("price")
+        self.rating = load("rating")
+        self.category_mask = load("category_mask")
+        self.store_code = load("store_code")
+        self.stores = StringTable.load(path, "stores")
+        self._orders = {sort_by: load(f"order_{name}") for sort_by, name in _ORDER_FILES.items()}
+        self._ranks = {sort_by: load(f"rank_{name}") for sort_by, name in _ORDER_FILES.items() if sort_by}
+        self._id_order = self._orders[None]
+        self._sorted_ids = load("sorted_ids")
+        self._row_offsets = load("row_offsets")
+        rows_path = os.path.join(path, "rows.bin")
+        self._row_blob = (
+            np.memmap(rows_path, dtype=np.uint8, mode="r") if os.path.getsize(rows_path)
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+        self._terms = StringTable.load(path, "terms")
+        search = meta["search"]
+        self.k1, self.b = search["k1"], search["b"]
+        self.max_expansions = search["max_expansions"]
+        self._total_len = search["total_len"]
+        self._postings_offsets = load("postings_offsets")
+        self._postings_rows = load("postings_rows")
+        self._postings_tf = load("postings_tf")
+        self._doc_len = load("doc_len")
+
+        self._names = StringTable.load(path, "names")
+        self._names_rows = load("names_rows")
+        self._name_stores = StringTable.load(path, "name_stores")
+        self._name_stores_rows = load("name_stores_rows")
+        self._gazetteer = SnapshotGazetteer(path)
+        self._suggest = SnapshotSuggestIndex(path, meta["suggest"]["max_edits"])
+
+    # Catalog
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[ProductRecord]:
+        return (self._row(i) for i in range(len(self.ids)))
+
+    def get(self, product_id: int) -> Optional[ProductRecord]:
+        slots = self._slots_of(np.array([product_id], dtype=np.int64))
+        return self._row(int(slots[0])) if slots[0] >= 0 else None
+
+    def _encoded(self, position: int) -> bytes:
+        return self._row_blob[self._row_offsets[position]:self._row_offsets[position + 1]].tobytes()
+
+    def _row(self, position: int) -> ProductRecord:
+        return ProductRecord(**fast_json.loads(self._encoded(position)))
+
+    # CatalogStore
+    def rows(self, positions: np.ndarray) -> List[ProductRecord]:
+        return [self._row(i) for i in positions.tolist()]
+
+    def iter_rows(self, positions: np.ndarray) -> Iterator[ProductRecord]:
+        return (self._row(i) for i in positions.tolist())
+
+    # RowEncoder: rows were encoded from normalized values when published,
+    # which is what validating them through Product produces
+    def encode(self, product) -> bytes:
+        return self._encoded(int(self.positions([product["id"]])[0]))
+
+    def encode_list(self, rows: Iterable) -> bytes:
+        positions = self.positions(row["id"] for row in rows).tolist()
+        return b"[" + b",".join([self._encoded(i) for i in positions]) + b"]"
+
+    def encode_each(self, rows: Iterable) -> Iterator[bytes]:
+        return (self.encode(row) for row in rows)
+
+    # ProductLookup
+    def by_name(self, name: str) -> Optional[ProductRecord]:
+        i = self._names.find(normalize_name(name))
+        return self._row(int(self._names_rows[i])) if i >= 0 else None
+
+    def by_name_and_store(self, name: str, store: str) -> Optional[ProductRecord]:
+        i = self._name_stores.find(f"{normalize_name(name)}\0{normalize_name(store)}")
+        return self._row(int(self._name_stores_rows[i])) if i >= 0 else None
+
+    # Gazetteer
+    def match(self, text: str) -> List[Dict[str, str]]:
+        return self._gazetteer.match(text)
+
+    # SuggestIndex
+    def suggest(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[dict]:
+        return self._suggest.suggest(query, limit, kind)
+
+    def snap(self, text: str, kind: str) -> Optional[Tuple[str, int]]:
+        return self._suggest.snap(text, kind)
+
+    # SearchIndex (same scoring and order as SearchIndex.search)
+    def _expand(self, token: str) -> List[Tuple[int, float]]:
+        terms = self._terms
+        matches = []
+        i = bisect_left(terms, token)
+        if i < len(terms) and terms[i] == token:
+            matches.append((i, 1.0))
+        while i < len(terms) and len(matches) < self.max_expansions:
+            if not terms[i].startswith(token):
+                break
+            if terms[i] != token:
+                matches.append((i, self.PREFIX_WEIGHT))
+            i += 1
+        return matches
+
+    def _token_scores(self, token: str, n_docs: int, avg_len: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows matching `token` (ascending) and their best score over its expansions"""
+        rows, scores = [], []
+        for term, weight in self._expand(token):
+            start, end = self._postings_offsets[term], self._postings_offsets[term + 1]
+            docs = self._postings_rows[start:end]
+            tf = self._postings_tf[start:end].astype(np.float64)
+            df = int(end - start)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[docs] / avg_len)
+            rows.append(docs)
+            scores.append(weight * idf * tf * (self.k1 + 1) / norm)
+        if not rows:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        order = np.lexsort((-scores, rows))
+        rows, scores = rows[order], scores[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        return rows[first], scores[first]
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Return (product id, score) pairs, best match first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        n_docs = len(self.ids)
+        if not tokens or not n_docs:
+            return []
+        avg_len = self._total_len / n_docs
+        rows = scores = None
+        for token in tokens:
+            token_rows, token_scores = self._token_scores(token, n_docs, avg_len)
+            if rows is None:
+                rows, scores = token_rows, token_scores
+            else:
+                rows, i, j = np.intersect1d(rows, token_rows, assume_unique=True, return_indices=True)
+                scores = scores[i] + token_scores[j]
+            if not len(rows):
+                return []
+        ids = self.ids[rows]
+        order = np.lexsort((ids, -scores))
+        return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+
+class SnapshotCatalog:
+    """The current snapshot of a directory, swapped when a new one is published.
+
+    Stands in for the catalog, its store, search index, gazetteer,
+    typeahead, lookups and row encoder: `len`, iteration and `get` are served by the current snapshot,
+    as is every other attribute. Swaps happen on the event loop between
+    requests (see `start`), and a request's synchronous handler code sees
+    one snapshot throughout; streamed responses keep the snapshot they
+    started with. `on_swap` callbacks run after each swap, e.g. to drop
+    caches computed from the previous version.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.current: Optional[CatalogSnapshot] = None
+        self.on_swap: List[Callable[[CatalogSnapshot], None]] = []
+        self.swaps = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def published_version(self) -> Optional[str]:
+        return current_version(self.directory)
+
+    def open_if_changed(self) -> Optional[CatalogSnapshot]:
+        """Open the published version if it isn't the one being served"""
+        version = self.published_version()
+        if version is None or (self.current is not None and version == self.current.version):
+            return None
+        return CatalogSnapshot(os.path.join(self.directory, version))
+
+    def swap(self, snapshot: CatalogSnapshot):
+        self.current = snapshot
+        self.swaps += 1
+        for callback in self.on_swap:
+            callback(snapshot)
+
+    def refresh(self) -> bool:
+        snapshot = self.open_if_changed()
+        if snapshot is not None:
+            self.swap(snapshot)
+        return snapshot is not None
+
+    async def poll(self) -> bool:
+        """`refresh`, with the snapshot opened off the event loop"""
+        snapshot = await asyncio.get_running_loop().run_in_executor(None, self.open_if_changed)
+        if snapshot is None:
+            return False
+        self.swap(snapshot)
+        logger.info("Serving catalog snapshot %s (%d products)", snapshot.version, len(snapshot))
+        return True
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.poll()
+            except (OSError, ValueError) as e:
+                # e.g. a version deleted between reading CURRENT and opening it
+                logger.warning("Could not open catalog snapshot: %s", e)
+
+    def start(self, interval: float):
+        """Poll for newly published versions every `interval` seconds"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self.current)
+
+    def __iter__(self) -> Iterator[ProductRecord]:
+        return iter(self.current)
+
+    def get(self, product_id: int) -> Optional[ProductRecord]:
+        return self.current.get(product_id)
+
+    def __getattr__(self, name: str):
+        return getattr(self.current, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish a catalog file as a new shared snapshot")
+    parser.add_argument("source", help="CSV, JSONL or SQLite catalog file")
+    parser.add_argument("directory", help="snapshot directory (CATALOG_SNAPSHOT_DIR)")
+    parser.add_argument("--keep", type=int, default=3, help="snapshot versions to keep")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version, rows = publish(args.directory, iter_products(args.source), keep=args.keep)
+    elapsed = time.perf_counter() - start
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Published {version} with {rows} products in {elapsed:.1f}s (max RSS {max_rss_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
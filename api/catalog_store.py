@@ -0,0 +1,349 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class ColumnarView:
+    """Columnar view of a catalog for filtering and sorting.
+
+    Price, rating, id, a category bitmask and a store code (an index into
+    `stores`) live in contiguous NumPy arrays, so filters are vectorized boolean masks and sorts reuse precomputed
+    orders. Queries return row positions; product rows are only looked up
+    for the rows actually returned.
+
+    Subclasses provide the columns, `_orders` (sort_by -> positions in
+    (key, id) order, with None for the id order) and the rows themselves.
+    """
+
+    # sort_by value -> (column, descending)
+    SORTS = {
+        "price-low": ("price", False),
+        "price-high": ("price", True),
+        "rating": ("rating", True),
+    }
+
+    def __init__(self, categories: List[str]):
+        if len(categories) > 64:
+            raise ValueError("A catalog view supports at most 64 categories")
+        self.categories = list(categories)
+        self._category_bit = {c: 1 << i for i, c in enumerate(self.categories)}
+        # categories tuple -> bitmask; rows share a handful of combinations
+        self._masks: Dict[Tuple[str, ...], int] = {}
+        self.stores: List[str] = []
+        self._store_codes: Dict[str, int] = {}
+        self._ranks: Dict[str, np.ndarray] = {}
+
+    def _order_names(self):
+        # None is the id order used to resolve ids to positions
+        return (None,) + tuple(self.SORTS)
+
+    def _sort_key(self, sort_by: Optional[str], slots=slice(None)) -> np.ndarray:
+        if sort_by is None:
+            return self.ids[slots]
+        column, descending = self.SORTS[sort_by]
+        values = getattr(self, column)[slots]
+        return -values if descending else values
+
+    def _mask_of(self, categories: Iterable[str]) -> int:
+        key = tuple(categories)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = sum({self._category_bit.get(c, 0) for c in key})
+        return mask
+
+    def _store_code(self, store: Optional[str]) -> int:
+        store = store or ""
+        code = self._store_codes.get(store)
+        if code is None:
+            code = self._store_codes[store] = len(self.stores)
+            self.stores.append(store)
+        return code
+
+    def _ensure_fresh(self):
+        pass
+
+    def _catalog_order(self) -> np.ndarray:
+        return np.arange(len(self.ids))
+
+    def _rank(self, sort_by: str) -> np.ndarray:
+        rank = self._ranks.get(sort_by)
+        if rank is None:
+            order = self._orders[sort_by]
+            rank = self._ranks[sort_by] = np.zeros(len(self.ids), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+        return rank
+
+    def positions(self, product_ids: Iterable[int]) -> np.ndarray:
+        """Row positions for the given ids, in the given order"""
+        return self.positions_of_ids(np.fromiter(product_ids, dtype=np.int64))
+
+    def positions_of_ids(self, ids: np.ndarray) -> np.ndarray:
+        """Vectorized version of `positions`; ids no longer in the catalog are skipped"""
+        self._ensure_fresh()
+        slots = self._slots_of(ids)
+        return slots[slots >= 0]
+
+    def _slots_of(self, ids: np.ndarray) -> np.ndarray:
+        """Slot of each id, or -1 for ids not in the view"""
+        if not len(self._sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        idx = np.searchsorted(self._sorted_ids, ids)
+        idx[idx >= len(self._sorted_ids)] = 0
+        return np.where(self._sorted_ids[idx] == ids, self._id_order[idx], -1)
+
+    def query(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort_by: Optional[str] = None,
+        subset: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Filter and sort the catalog (or `subset` positions); returns positions"""
+        self._ensure_fresh()
+        if subset is None:
+            mask = self._filter_mask(slice(None), category, min_price, max_price)
+            order = self._orders[sort_by] if sort_by in self.SORTS else self._catalog_order()
+            return order[mask[order]] if mask is not None else order
+        mask = self._filter_mask(subset, category, min_price, max_price)
+        result = subset[mask] if mask is not None else subset
+        if sort_by in self.SORTS:
+            result = result[np.argsort(self._rank(sort_by)[result], kind="stable")]
+        return result
+
+    def _filter_mask(self, rows, category, min_price, max_price) -> Optional[np.ndarray]:
+        mask = None
+        if category is not None:
+            bit = np.uint64(self._category_bit.get(category, 0))
+            mask = (self.category_mask[rows] & bit) != 0
+        if min_price is not None:
+            m = self.price[rows] >= min_price
+            mask = m if mask is None else mask & m
+        if max_price is not None:
+            m = self.price[rows] <= max_price
+            mask = m if mask is None else mask & m
+        return mask
+
+    def page(
+        self,
+        positions: np.ndarray,
+        sort_by: Optional[str] = None,
+        after: Optional[dict] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, Optional[dict]]:
+        """Cut one page out of `query` results.
+
+        `after` is the position marker returned with the previous page.
+        Returns the page positions and the marker for the next page, or None
+        when this is the last page.
+        """
+        start = self._resume_index(positions, sort_by, after) if after else 0
+        start = min(start + offset, len(positions))
+        end = len(positions) if limit is None else min(start + limit, len(positions))
+        page = positions[start:end]
+        if end >= len(positions) or not len(page):
+            return page, None
+        last = page[-1]
+        marker = {"id": int(self.ids[last]), "index": int(end)}
+        sort = self.SORTS.get(sort_by)
+        if sort is not None:
+            marker["key"] = float(getattr(self, sort[0])[last])
+        return page, marker
+
+    def _resume_index(self, positions: np.ndarray, sort_by: Optional[str], after: dict) -> int:
+        sort = self.SORTS.get(sort_by)
+        if sort is not None and "key" in after:
+            # Keyset: first row strictly after (key, id) in (key, id) order
+            column, descending = sort
+            values = getattr(self, column)[positions]
+            key = after["key"]
+            if descending:
+                values, key = -values, -key
+            lo = int(np.searchsorted(values, key, side="left"))
+            hi = int(np.searchsorted(values, key, side="right"))
+            return lo + int(np.searchsorted(self.ids[positions[lo:hi]], after["id"], side="right"))
+        # Catalog or relevance order: continue after the last row seen, or at
+        # its old index if that row has since gone away
+        hits = np.flatnonzero(self.ids[positions] == after["id"])
+        return int(hits[0]) + 1 if len(hits) else min(int(after.get("index", 0)), len(positions))
+
+    def rows(self, positions: np.ndarray) -> List[dict]:
+        raise NotImplementedError
+
+    def iter_rows(self, positions: np.ndarray) -> Iterator[dict]:
+        raise NotImplementedError
+
+
+class CatalogStore(ColumnarView):
+    """Columnar view of the in-memory catalog, kept in sync as a listener.
+
+    Every row keeps its position (slot) for as long as it is in the catalog:
+    updates are written in place, new rows are appended and deleted rows
+    leave a dead slot behind. Changes are collected as they happen and
+    patched into the arrays and sort orders on the next query; the whole
+    view is only rebuilt when a large share of the catalog changed or too
+    many slots are dead.
+    """
+
+    # Rebuild instead of patching past this share of changed or dead rows
+    REBUILD_RATIO = 0.25
+    # Past this many changed rows, sort orders are re-sorted rather than
+    # having each row inserted at its searched position
+    MERGE_LIMIT = 4096
+
+    def __init__(self, catalog, categories: List[str]):
+        super().__init__(categories)
+        self._catalog = catalog
+        self._stale = True
+        # id -> new row, or None once deleted; ids deleted since the last patch
+        self._changed: Dict[int, Optional[dict]] = {}
+        self._removed: Set[int] = set()
+        catalog.subscribe(self)
+
+    # Catalog listener interface. New rows are appended in the order they
+    # were added, so a row added back after a delete moves to the end.
+    def add(self, product: dict):
+        if not self._stale:
+            self._changed.pop(product["id"], None)
+            self._changed[product["id"]] = product
+
+    def add_many(self, products: Iterable[dict]):
+        if self._stale:
+            return
+        for product in products:
+            self._changed.pop(product["id"], None)
+            self._changed[product["id"]] = product
+        if len(self._changed) > self.REBUILD_RATIO * len(self._rows):
+            self._invalidate()
+
+    def replace(self, old: dict, product: dict):
+        if not self._stale:
+            self._changed[product["id"]] = product
+
+    def remove(self, product: dict):
+        if not self._stale:
+            self._changed[product["id"]] = None
+            self._removed.add(product["id"])
+
+    def _invalidate(self):
+        self._stale = True
+        self._changed.clear()
+        self._removed.clear()
+
+    def _rebuild(self):
+        rows: List[Optional[dict]] = list(self._catalog)
+        self._rows = rows
+        self.ids = np.fromiter((p["id"] for p in rows), dtype=np.int64, count=len(rows))
+        self.price = np.fromiter((p["price"] for p in rows), dtype=np.float64, count=len(rows))
+        # Missing ratings sort as 0, like the original list sort did
+        self.rating = np.fromiter((p.get("rating") or 0.0 for p in rows), dtype=np.float64, count=len(rows))
+        self.category_mask = np.fromiter(
+            (self._mask_of(p.get("categories") or []) for p in rows), dtype=np.uint64, count=len(rows)
+        )
+        self.stores, self._store_codes = [], {}
+        self.store_code = np.fromiter((self._store_code(p.get("store")) for p in rows), dtype=np.int32, count=len(rows))
+        self.alive = np.ones(len(rows), dtype=bool)
+        self._live = np.arange(len(rows))
+        self._dead = 0
+        # Equal keys are ordered by id so that keyset cursors are unambiguous
+        self._orders = {}
+        for sort_by in self._order_names():
+            self._orders[sort_by] = np.lexsort((self.ids, self._sort_key(sort_by)))
+        self._id_order = self._orders[None]
+        self._sorted_ids = self.ids[self._id_order]
+        self._ranks = {}
+        self._stale = False
+        self._changed.clear()
+        self._removed.clear()
+
+    def _patch(self):
+        changed, removed = self._changed, self._removed
+        self._changed, self._removed = {}, set()
+        slots = self._slots_of(np.fromiter(changed, dtype=np.int64, count=len(changed))).tolist()
+        touched, updated, appended = [], [], []
+        for slot, (product_id, product) in zip(slots, changed.items()):
+            if slot >= 0:
+                touched.append(slot)
+                if product is not None and product_id not in removed:
+                    self._rows[slot] = product
+                    updated.append(slot)
+                    continue
+                # Deleted, or deleted and added back (which moves it to the end)
+                self._rows[slot] = None
+                self.alive[slot] = False
+                self._dead += 1
+            if product is not None:
+                appended.append(product)
+
+        if updated:
+            slots = np.array(updated, dtype=np.int64)
+            rows = [self._rows[i] for i in updated]
+            self.price[slots] = [p["price"] for p in rows]
+            self.rating[slots] = [p.get("rating") or 0.0 for p in rows]
+            self.category_mask[slots] = [self._mask_of(p.get("categories") or []) for p in rows]
+            self.store_code[slots] = [self._store_code(p.get("store")) for p in rows]
+        if appended:
+            self._rows.extend(appended)
+            n = len(appended)
+            self.ids = np.concatenate([self.ids, np.fromiter((p["id"] for p in appended), np.int64, n)])
+            self.price = np.concatenate([self.price, np.fromiter((p["price"] for p in appended), np.float64, n)])
+            self.rating = np.concatenate(
+                [self.rating, np.fromiter((p.get("rating") or 0.0 for p in appended), np.float64, n)]
+            )
+            self.category_mask = np.concatenate([self.category_mask, np.fromiter(
+                (self._mask_of(p.get("categories") or []) for p in appended), np.uint64, n
+            )])
+            self.store_code = np.concatenate(
+                [self.store_code, np.fromiter((self._store_code(p.get("store")) for p in appended), np.int32, n)]
+            )
+            self.alive = np.concatenate([self.alive, np.ones(n, dtype=bool)])
+
+        # Take every touched row out of the sort orders and merge the live
+        # ones back in at their new keys
+        drop = np.zeros(len(self._rows), dtype=bool)
+        drop[touched] = True
+        inserted = np.array(updated + list(range(len(self._rows) - len(appended), len(self._rows))), dtype=np.int64)
+        for sort_by, order in self._orders.items():
+            order = order[~drop[order]]
+            if len(inserted) > self.MERGE_LIMIT:
+                merged = np.concatenate([order, inserted])
+                self._orders[sort_by] = merged[np.lexsort((self.ids[merged], self._sort_key(sort_by, merged)))]
+                continue
+            new = inserted[np.lexsort((self.ids[inserted], self._sort_key(sort_by, inserted)))]
+            at = self._insert_positions(order, self._sort_key(sort_by, order), self.ids[order],
+                                        self._sort_key(sort_by, new), self.ids[new])
+            self._orders[sort_by] = np.insert(order, at, new)
+        self._id_order = self._orders[None]
+        self._sorted_ids = self.ids[self._id_order]
+        self._live = np.flatnonzero(self.alive)
+        self._ranks = {}
+
+    @staticmethod
+    def _insert_positions(order, keys, ids, new_keys, new_ids) -> np.ndarray:
+        """Where each (key, id) goes in an order sorted by (key, id)"""
+        lo = np.searchsorted(keys, new_keys, side="left")
+        hi = np.searchsorted(keys, new_keys, side="right")
+        for i in np.flatnonzero(hi > lo).tolist():
+            lo[i] += np.searchsorted(ids[lo[i]:hi[i]], new_ids[i])
+        return lo
+
+    def _ensure_fresh(self):
+        if not self._stale and self._changed:
+            if self._dead + len(self._changed) > self.REBUILD_RATIO * len(self._rows):
+                self._stale = True
+            else:
+                self._patch()
+        if self._stale:
+            self._rebuild()
+
+    def _catalog_order(self) -> np.ndarray:
+        return self._live
+
+    def rows(self, positions: np.ndarray) -> List[dict]:
+        rows = self._rows
+        return [rows[i] for i in positions.tolist()]
+
+    def iter_rows(self, positions: np.ndarray) -> Iterator[dict]:
+        rows = self._rows
+        return (rows[i] for i in positions.tolist())
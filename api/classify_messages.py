@@ -0,0 +1,209 @@
+"""Classify logged assistant messages offline, on every core.
+
+Streams messages from a JSONL or CSV file and shards them, in batches,
+across worker processes that each load their own tokenizer, intent model
+and NER pipeline. Each worker runs one batched intent prediction and one
+nlp.pipe per batch. Writes every input record back as a JSON line with its
+"intent" and "entities" added, in input order, and reports throughput on
+stderr as it goes.
+
+Only the models run: no assistant actions are taken, so carts and the
+catalog are never touched. Entities are the NER model's own, without the
+API's catalog gazetteer or name snapping, which is what auditing the
+models and labelling training data need.
+
+    python classify_messages.py messages.jsonl intents.jsonl --workers 8
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+from assistant_models import (
+    AssistantModels,
+    load_assistant_models,
+    load_numpy_assistant_models,
+    load_registry_assistant_models,
+)
+from mlflow_registry import LocalModelRegistry
+
+# Thread pools of the numerical libraries, capped per worker process so that
+# workers don't oversubscribe the cores between them
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS")
+
+_models: Optional[AssistantModels] = None
+
+Result = Tuple[str, List[Dict[str, str]]]
+
+
+def read_records(path: str, field: str) -> Iterator[dict]:
+    """Records of a JSONL file (objects, or bare strings taken as `field`) or a CSV file with a header"""
+    with (sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")) as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record if isinstance(record, dict) else {field: record}
+
+
+def load_models(backend: str, ner_model_path: Optional[str], ner_mode: str,
+                artifact_path: Optional[str] = None) -> AssistantModels:
+    if artifact_path:
+        return load_registry_assistant_models(
+            config.TOKENIZER_VOCAB_PATH, config.LABEL_ENCODER_PATH, artifact_path, ner_model_path, ner_mode=ner_mode,
+        )
+    if backend == "numpy":
+        return load_numpy_assistant_models(
+            config.TOKENIZER_VOCAB_PATH, config.INTENT_NUMPY_WEIGHTS_PATH, ner_model_path, ner_mode=ner_mode,
+        )
+    return load_assistant_models(
+        config.TOKENIZER_VOCAB_PATH, config.LABEL_ENCODER_PATH, config.INTENT_MODEL_PATH,
+        ner_model_path, ner_mode=ner_mode,
+    )
+
+
+def init_worker(backend: str, ner_model_path: Optional[str], ner_mode: str, threads: int,
+                artifact_path: Optional[str] = None):
+    """Process pool initializer: load a private copy of every model"""
+    global _models
+    if backend == "keras" or artifact_path:
+        try:
+            import tensorflow as tf
+        except ImportError:
+            # Registry versions exported for the NumPy backend don't need it
+            pass
+        else:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(threads)
+    _models = load_models(backend, ner_model_path, ner_mode, artifact_path)
+
+
+def classify_batch(messages: List[str]) -> List[Result]:
+    intents = _models.predict_intents(_models.prepare_sentences(messages))
+    entities = _models.extract_entities(messages)
+    return list(zip(intents, entities))
+
+
+def batches(records: Iterable[dict], field: str, size: int, skipped: Counter) -> Iterator[Tuple[List[dict], List[str]]]:
+    """(records, messages) batches; records without a text message are counted and dropped"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        kept = [r for r in chunk if isinstance(r.get(field), str)]
+        skipped["records"] += len(chunk) - len(kept)
+        if kept:
+            yield kept, [r[field] for r in kept]
+
+
+def classify(batches: Iterable[Tuple[List[dict], List[str]]], workers: int, in_flight: int,
+             initargs: tuple) -> Iterator[Tuple[dict, Result]]:
+    """(record, (intent, entities)) for every record, in input order"""
+    if workers <= 1:
+        init_worker(*initargs)
+        for records, messages in batches:
+            yield from zip(records, classify_batch(messages))
+        return
+
+    # Only `in_flight` batches are read ahead of the writer, so memory stays
+    # flat however large the input is
+    slots = threading.Semaphore(in_flight)
+    pending: deque = deque()
+
+    def feed() -> Iterator[List[str]]:
+        for records, messages in batches:
+            slots.acquire()
+            pending.append(records)
+            yield messages
+
+    # Spawned rather than forked: workers start without the parent's
+    # threads and pick up the thread limits from the environment
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        for results in pool.imap(classify_batch, feed()):
+            yield from zip(pending.popleft(), results)
+            slots.release()
+
+
+class Progress:
+    """Throughput lines on stderr every `interval` seconds, and a summary at the end"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.count = 0
+        self.start = self._last_time = time.perf_counter()
+        self._last_count = 0
+
+    def tick(self):
+        self.count += 1
+        now = time.perf_counter()
+        if now - self._last_time >= self.interval:
+            rate = (self.count - self._last_count) / (now - self._last_time)
+            print(f"{self.count} messages, {rate:.0f} msg/s "
+                  f"(overall {self.count / (now - self.start):.0f} msg/s)", file=sys.stderr, flush=True)
+            self._last_time, self._last_count = now, self.count
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run intent and entity extraction over logged assistant messages")
+    parser.add_argument("input", help="JSONL or CSV file of messages ('-' reads JSONL from stdin)")
+    parser.add_argument("output", help="JSONL results file ('-' writes to stdout)")
+    parser.add_argument("--field", default="message", help="record field holding the message text")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, each with its own models (1 runs in this process)")
+    parser.add_argument("--batch-size", type=int, default=256, help="messages per model call")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="numerical library threads per worker")
+    parser.add_argument("--backend", choices=["keras", "numpy"], default=config.INTENT_BACKEND)
+    parser.add_argument("--model-version", default=config.INTENT_MODEL_VERSION,
+                        help=f"intent model version of {config.INTENT_REGISTRY_MODEL} in the MLflow registry "
+                             "(a number, 'latest' or '@alias'; overrides --backend)")
+    parser.add_argument("--ner-model", default=config.NER_MODEL_PATH, help="spaCy model ('' skips entities)")
+    parser.add_argument("--ner-mode", choices=["full", "trimmed"], default=config.NER_MODE)
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between throughput lines")
+    args = parser.parse_args()
+
+    for name in _THREAD_ENV:
+        os.environ.setdefault(name, str(args.threads_per_worker))
+    artifact_path = None
+    if args.model_version:
+        registry = LocalModelRegistry(config.MLFLOW_TRACKING_DIR, config.MLFLOW_ARTIFACTS_DIR, config.INTENT_REGISTRY_MODEL)
+        version = registry.resolve(args.model_version)
+        artifact_path = version["path"]
+        print(f"Intent model: {version['name']} version {version['version']}", file=sys.stderr)
+    initargs = (args.backend, args.ner_model or None, args.ner_mode, args.threads_per_worker, artifact_path)
+    skipped: Counter = Counter()
+    intents: Counter = Counter()
+    progress = Progress(args.report_every)
+
+    records = batches(read_records(args.input, args.field), args.field, args.batch_size, skipped)
+    with (sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")) as out:
+        for record, (intent, entities) in classify(records, args.workers, 2 * args.workers, initargs):
+            out.write(json.dumps({**record, "intent": intent, "entities": entities}) + "\n")
+            intents[intent] += 1
+            progress.tick()
+
+    elapsed = progress.elapsed()
+    print(f"Classified {progress.count} messages in {elapsed:.1f}s "
+          f"({progress.count / max(elapsed, 1e-9):.0f} msg/s) with {args.workers} workers"
+          + (f"; skipped {skipped['records']} records without a {args.field!r} text" if skipped else ""),
+          file=sys.stderr)
+    for intent, n in intents.most_common():
+        print(f"  {intent}: {n}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
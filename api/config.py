@@ -0,0 +1,135 @@
+import os
+
+# Runtime settings for the API. Every value can be overridden through an
+# environment variable of the same name.
+
+# Micro-batching of assistant messages (intent model + NER)
+ASSISTANT_MAX_BATCH_SIZE = int(os.getenv("ASSISTANT_MAX_BATCH_SIZE", "32"))
+ASSISTANT_MAX_WAIT_MS = float(os.getenv("ASSISTANT_MAX_WAIT_MS", "5"))
+
+# Model execution pools and back-pressure. Set ASSISTANT_NER_PROCESSES > 0
+# to run spaCy in that many worker processes instead of threads.
+ASSISTANT_INTENT_WORKERS = int(os.getenv("ASSISTANT_INTENT_WORKERS", "1"))
+ASSISTANT_NER_WORKERS = int(os.getenv("ASSISTANT_NER_WORKERS", "1"))
+ASSISTANT_NER_PROCESSES = int(os.getenv("ASSISTANT_NER_PROCESSES", "0"))
+ASSISTANT_MAX_PENDING = int(os.getenv("ASSISTANT_MAX_PENDING", "256"))
+ASSISTANT_RETRY_AFTER = int(os.getenv("ASSISTANT_RETRY_AFTER", "1"))
+
+# NER serving: "full" loads the whole spaCy pipeline, "trimmed" only what
+# entity extraction needs. NER_N_PROCESS > 1 lets large batches use
+# nlp.pipe's own worker processes. With NER_GAZETTEER on, messages naming
+# a catalog product take their entities from the catalog names and skip
+# the NER model.
+NER_MODE = os.getenv("NER_MODE", "full")
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", "1"))
+NER_GAZETTEER = os.getenv("NER_GAZETTEER", "1") == "1"
+# Replace misspelled product and store entities ("gari") with the closest
+# catalog name ("Garri"), using the /suggest index
+NER_SNAP_ENTITIES = os.getenv("NER_SNAP_ENTITIES", "1") == "1"
+
+# Typeahead (/suggest): words are matched with up to SUGGEST_MAX_EDITS typos
+# (0 turns spelling correction off)
+SUGGEST_MAX_EDITS = int(os.getenv("SUGGEST_MAX_EDITS", "2"))
+
+# Prometheus metrics on /metrics. Traces (one JSON log line per request
+# with its stage timings) are written for a TRACE_SAMPLE_RATE fraction of
+# requests and for every request slower than TRACE_SLOW_MS (0 = off).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "0"))
+
+# Serve catalog and cart responses from pre-encoded JSON instead of
+# re-validating every row through the Pydantic response models
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+# Catalog source. CATALOG_PATH bulk-loads a CSV, JSONL or SQLite file at
+# startup instead of the built-in sample products. With CATALOG_STORE_PATH
+# set, admin changes are persisted to that SQLite file, which is loaded
+# instead once it has rows (it is seeded from the source on first start).
+# The /admin endpoints require the X-Admin-Token header to match
+# ADMIN_TOKEN and are disabled while it is empty.
+CATALOG_PATH = os.getenv("CATALOG_PATH", "")
+CATALOG_STORE_PATH = os.getenv("CATALOG_STORE_PATH", "")
+CATALOG_LOAD_BATCH_SIZE = int(os.getenv("CATALOG_LOAD_BATCH_SIZE", "10000"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Hold catalog rows as compact slotted records with shared strings (see
+# product_record.py) instead of one dict per product
+CATALOG_COMPACT_ROWS = os.getenv("CATALOG_COMPACT_ROWS", "1") == "1"
+
+# Serve the catalog from memory-mapped snapshots in this directory, shared
+# by every uvicorn worker (see catalog_snapshot.py). The first worker to
+# start publishes one from the catalog source if none exists. Admin changes
+# are then only persisted (CATALOG_STORE_PATH is required for them) until
+# POST /admin/catalog/publish; workers check for a newly published
+# snapshot every CATALOG_SNAPSHOT_POLL_S seconds.
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", "")
+CATALOG_SNAPSHOT_POLL_S = float(os.getenv("CATALOG_SNAPSHOT_POLL_S", "1.0"))
+
+# Facet counts returned with ?facets=true listings: price bands split at
+# FACET_PRICE_EDGES, "and up" counts per FACET_RATING_THRESHOLDS, and the
+# FACET_STORE_LIMIT stores with the most results
+FACET_PRICE_EDGES = [float(v) for v in os.getenv("FACET_PRICE_EDGES", "1000,2500,5000,10000,25000,50000").split(",") if v]
+FACET_RATING_THRESHOLDS = [float(v) for v in os.getenv("FACET_RATING_THRESHOLDS", "4.5,4,3.5,3").split(",") if v]
+FACET_STORE_LIMIT = int(os.getenv("FACET_STORE_LIMIT", "20"))
+
+# Cache of filter/sort/search results, invalidated on catalog changes.
+# Set QUERY_CACHE_MAX_ENTRIES=0 to disable it.
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+# Assistant inference caches (entries; 0 disables): full results per
+# normalized message, and intents per padded token-id sequence
+ASSISTANT_CACHE_SIZE = int(os.getenv("ASSISTANT_CACHE_SIZE", "10000"))
+ASSISTANT_INTENT_CACHE_SIZE = int(os.getenv("ASSISTANT_INTENT_CACHE_SIZE", "10000"))
+
+# Cart storage backend: "memory", "sqlite" (CART_DB_PATH) or "redis"
+# (CART_REDIS_URL, any Redis-compatible server; needs the redis package)
+CART_BACKEND = os.getenv("CART_BACKEND", "memory")
+CART_DB_PATH = os.getenv("CART_DB_PATH", "carts.sqlite3")
+CART_REDIS_URL = os.getenv("CART_REDIS_URL", "redis://localhost:6379/0")
+CART_LOCK_STRIPES = int(os.getenv("CART_LOCK_STRIPES", "64"))
+
+# Model artifacts, resolved relative to this directory rather than the CWD
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The pickled Keras tokenizer is only read by export_intent_model.py; serving
+# loads the vocabulary it exports
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", os.path.join(BASE_DIR, "tokenizer.pickle"))
+TOKENIZER_VOCAB_PATH = os.getenv("TOKENIZER_VOCAB_PATH", os.path.join(BASE_DIR, "tokenizer_vocab.json"))
+LABEL_ENCODER_PATH = os.getenv("LABEL_ENCODER_PATH", os.path.join(BASE_DIR, "label_encoder.pickle"))
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", os.path.join(BASE_DIR, "intent_recognition_model"))
+# An empty NER_MODEL_PATH runs without the NER model (gazetteer entities only)
+NER_MODEL_PATH = os.getenv("NER_MODEL_PATH", os.path.join(BASE_DIR, "model-best"))
+
+# Intent model versions from the local MLflow model registry (mlruns/models).
+# With INTENT_MODEL_VERSION set (a number, "latest" or "@alias"), the intent
+# model of that version of INTENT_REGISTRY_MODEL is served instead of
+# INTENT_MODEL_PATH, and every INTENT_MODEL_POLL_S seconds (0 = never) each
+# worker checks whether it names another version and rolls that out without
+# a restart (see model_rollout.py). Rollouts are smoke-tested on the warm-up
+# messages and shadow-score INTENT_SHADOW_SAMPLE of live batches for
+# INTENT_SHADOW_S seconds first, and are rejected below
+# INTENT_SHADOW_MIN_AGREEMENT agreement with the serving model in either
+# (0 lets any version that loads through).
+MLFLOW_TRACKING_DIR = os.getenv("MLFLOW_TRACKING_DIR", os.path.join(BASE_DIR, "..", "mlruns"))
+MLFLOW_ARTIFACTS_DIR = os.getenv("MLFLOW_ARTIFACTS_DIR", os.path.join(BASE_DIR, "..", "mlartifacts"))
+INTENT_REGISTRY_MODEL = os.getenv("INTENT_REGISTRY_MODEL", "LSTM-Intent-Recog-Best")
+INTENT_MODEL_VERSION = os.getenv("INTENT_MODEL_VERSION", "")
+INTENT_MODEL_POLL_S = float(os.getenv("INTENT_MODEL_POLL_S", "30"))
+INTENT_SHADOW_SAMPLE = float(os.getenv("INTENT_SHADOW_SAMPLE", "0.1"))
+INTENT_SHADOW_S = float(os.getenv("INTENT_SHADOW_S", "60"))
+INTENT_SHADOW_MIN_AGREEMENT = float(os.getenv("INTENT_SHADOW_MIN_AGREEMENT", "0.9"))
+
+# When to load the models: "background" (at startup, without blocking it),
+# "lazy" (on the first assistant request) or "eager" (before serving)
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
+# After a failed load, assistant requests fail fast for MODEL_RETRY_S seconds
+# before the next attempt, doubling per consecutive failure up to
+# MODEL_RETRY_MAX_S
+MODEL_RETRY_S = float(os.getenv("MODEL_RETRY_S", "5"))
+MODEL_RETRY_MAX_S = float(os.getenv("MODEL_RETRY_MAX_S", "300"))
+
+# Intent model backend: "keras" (TensorFlow SavedModel) or "numpy" (the
+# exported weights and vocabulary from export_intent_model.py, no TensorFlow)
+INTENT_BACKEND = os.getenv("INTENT_BACKEND", "keras")
+INTENT_NUMPY_WEIGHTS_PATH = os.getenv("INTENT_NUMPY_WEIGHTS_PATH", os.path.join(BASE_DIR, "intent_model.npz"))
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class QueueFull(Exception):
+    """Raised when a bounded model queue cannot accept more work"""
+
+
+class ModelExecutor:
+    """Runs blocking model calls away from the event loop.
+
+    Uses a thread pool by default (TensorFlow and spaCy release the GIL for
+    most of their work) or a process pool when `processes` is set, in which
+    case `initializer` is run once per worker to load its own model copy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 1,
+        processes: bool = False,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.processes = processes
+        if processes:
+            self._pool: Executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=initializer, initargs=initargs
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=name,
+                initializer=initializer, initargs=initargs,
+            )
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    async def run(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self._pool, fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.busy_seconds += time.perf_counter() - start
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.completed + self.failed
+        return {
+            "name": self.name,
+            "kind": "process" if self.processes else "thread",
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_run_ms": round(self.busy_seconds * 1000 / calls, 3) if calls else 0.0,
+        }
@@ -0,0 +1,137 @@
+"""Export the intent classifier for serving without TensorFlow.
+
+Writes the Embedding/LSTM/Dense weights and label classes to an .npz file and
+the tokenizer vocabulary to JSON, then checks that the NumPy backend (see
+numpy_intent.py and text_tokenizer.py) reproduces the Keras tokenizer ids and
+model outputs on a sample corpus. Needs TensorFlow; serving does not.
+
+    python export_intent_model.py
+
+With --fixture-out, the corpus token ids and Keras probabilities are also
+saved for tests/test_numpy_intent.py, so the NumPy backend is checked
+against Keras without TensorFlow installed.
+"""
+import argparse
+import json
+import pickle
+import random
+import sys
+from typing import List
+
+import numpy as np
+
+import config
+from assistant_models import WARMUP_MESSAGES
+from numpy_intent import NumpyIntentModel
+from text_tokenizer import VocabTokenizer
+
+MAX_SEQ_LEN = 35
+
+
+def parity_corpus(tokenizer, size: int = 500):
+    """Warm-up messages plus random vocabulary sentences, some longer than
+    MAX_SEQ_LEN and some with unknown words and punctuation"""
+    rng = random.Random(0)
+    words = list(tokenizer.word_index)
+    corpus = list(WARMUP_MESSAGES) + ["", "!!!", "Add GARRI, please... to my cart?!", "xyzzy plugh"]
+    while len(corpus) < size:
+        length = rng.randint(1, MAX_SEQ_LEN + 10)
+        corpus.append(" ".join(rng.choice(words + ["unknownword", "Lagos,"]) for _ in range(length)))
+    return corpus
+
+
+def architecture_problems(embedding, lstm, dense) -> List[str]:
+    """What numpy_intent.py's hardcoded forward pass doesn't match in the Keras layers"""
+    expected = [
+        (embedding, "mask_zero", True),
+        (lstm, "activation", "relu"),
+        (lstm, "recurrent_activation", "sigmoid"),
+        (lstm, "use_bias", True),
+        (lstm, "return_sequences", False),
+        (lstm, "go_backwards", False),
+        (dense, "activation", "softmax"),
+    ]
+    problems = []
+    for layer, option, value in expected:
+        actual = layer.get_config().get(option)
+        if actual != value:
+            problems.append(f"{layer.name}.{option} is {actual!r}, expected {value!r}")
+    return problems
+
+
+def export(args) -> int:
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+    with open(args.tokenizer, "rb") as handle:
+        tokenizer = pickle.load(handle)
+    with open(args.label_encoder, "rb") as f:
+        label_encoder = pickle.load(f)
+    model = load_model(args.model)
+
+    embedding, lstm, dense = model.layers
+    problems = architecture_problems(embedding, lstm, dense)
+    if problems:
+        print("The NumPy backend can't run this model: " + "; ".join(problems))
+        return 1
+    kernel, recurrent_kernel, bias = lstm.get_weights()
+    dense_kernel, dense_bias = dense.get_weights()
+    np.savez(
+        args.weights_out,
+        embeddings=embedding.get_weights()[0],
+        lstm_kernel=kernel,
+        lstm_recurrent_kernel=recurrent_kernel,
+        lstm_bias=bias,
+        dense_kernel=dense_kernel,
+        dense_bias=dense_bias,
+        classes=np.asarray(label_encoder.classes_, dtype=str),
+        max_seq_len=np.int32(MAX_SEQ_LEN),
+    )
+    with open(args.vocab_out, "w") as f:
+        json.dump({
+            "filters": tokenizer.filters,
+            "lower": tokenizer.lower,
+            "split": tokenizer.split,
+            "oov_token": tokenizer.oov_token,
+            "num_words": tokenizer.num_words,
+            "word_index": tokenizer.word_index,
+        }, f, indent=1, sort_keys=True)
+    print(f"Wrote {args.weights_out} and {args.vocab_out}")
+
+    # Parity check against Keras
+    corpus = parity_corpus(tokenizer)
+    keras_ids = pad_sequences(tokenizer.texts_to_sequences(corpus), maxlen=MAX_SEQ_LEN, padding="post")
+    vocab_tokenizer = VocabTokenizer.load(args.vocab_out)
+    ids = vocab_tokenizer.encode(corpus, MAX_SEQ_LEN)
+    mismatched_ids = int((keras_ids != ids).any(axis=1).sum())
+
+    keras_probs = model.predict(keras_ids, verbose=0)
+    numpy_probs = NumpyIntentModel.load(args.weights_out).predict(ids)
+    max_diff = float(np.abs(keras_probs - numpy_probs).max())
+    agreement = float((keras_probs.argmax(-1) == numpy_probs.argmax(-1)).mean())
+    if args.fixture_out:
+        np.savez_compressed(args.fixture_out, messages=np.asarray(corpus, dtype=str),
+                            token_ids=keras_ids.astype(np.int32), probs=keras_probs)
+        print(f"Wrote {args.fixture_out}")
+    print(f"Parity on {len(corpus)} messages: token id mismatches={mismatched_ids}, "
+          f"max |p_keras - p_numpy|={max_diff:.2e}, intent agreement={agreement:.2%}")
+    if mismatched_ids or max_diff > args.tolerance:
+        print("Parity check FAILED")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the intent model for the NumPy serving backend")
+    parser.add_argument("--model", default=config.INTENT_MODEL_PATH)
+    parser.add_argument("--tokenizer", default=config.TOKENIZER_PATH)
+    parser.add_argument("--label-encoder", default=config.LABEL_ENCODER_PATH)
+    parser.add_argument("--weights-out", default=config.INTENT_NUMPY_WEIGHTS_PATH)
+    parser.add_argument("--vocab-out", default=config.TOKENIZER_VOCAB_PATH)
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    parser.add_argument("--fixture-out", help="also save the corpus ids and Keras probabilities here")
+    sys.exit(export(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
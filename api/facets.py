@@ -0,0 +1,111 @@
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bit j of byte value v, for counting category bits one mask byte at a time
+_BYTE_BITS = (np.arange(256)[:, None] >> np.arange(8)) & 1
+
+
+class FacetCounts:
+    """Result counts per category, store, price band and rating for listing pages.
+
+    As a catalog listener it keeps the counts of the whole catalog up to
+    date with every change, so unfiltered listings are served from them
+    without counting. Counts of a filtered result are taken in one
+    vectorized pass over the rows' columns in a ColumnarView.
+
+    Price bands are split at `price_edges`; rating counts are "and up",
+    one per threshold. Stores are cut to the `store_limit` largest.
+    """
+
+    def __init__(self, price_edges: Sequence[float], rating_thresholds: Sequence[float], store_limit: int = 20):
+        self.price_edges = sorted(price_edges)
+        self.rating_thresholds = sorted(rating_thresholds, reverse=True)
+        self.store_limit = store_limit
+        self.clear()
+
+    def clear(self):
+        self._categories: Counter = Counter()
+        self._stores: Counter = Counter()
+        self._prices = [0] * (len(self.price_edges) + 1)
+        self._ratings = [0] * len(self.rating_thresholds)
+
+    # Catalog listener interface
+    def add(self, product: dict, delta: int = 1):
+        for category in dict.fromkeys(product.get("categories") or []):
+            self._categories[category] += delta
+            if not self._categories[category]:
+                del self._categories[category]
+        store = product.get("store")
+        if store:
+            self._stores[store] += delta
+            if not self._stores[store]:
+                del self._stores[store]
+        self._prices[bisect_right(self.price_edges, product["price"])] += delta
+        rating = product.get("rating") or 0.0
+        for i, threshold in enumerate(self.rating_thresholds):
+            if rating >= threshold:
+                self._ratings[i] += delta
+
+    def add_many(self, products: Iterable[dict]):
+        for product in products:
+            self.add(product)
+
+    def remove(self, product: dict):
+        self.add(product, -1)
+
+    def reset(self, view):
+        """Take the catalog counts from every row of `view` (snapshots have no change feed)"""
+        self.clear()
+        categories, stores, self._prices, self._ratings = self._count(view, view.query())
+        self._categories.update(categories)
+        self._stores.update(stores)
+
+    def totals(self) -> dict:
+        """Counts over the whole catalog"""
+        return self._result(self._categories, self._stores, self._prices, self._ratings)
+
+    def count(self, view, positions: np.ndarray) -> dict:
+        """Counts over the rows at `positions` of `view`"""
+        return self._result(*self._count(view, positions))
+
+    def _count(self, view, positions: np.ndarray) -> Tuple[Dict[str, int], Dict[str, int], List[int], List[int]]:
+        categories = {}
+        if view.categories and len(positions):
+            # Histogram each byte of the masks, then count the set bits per
+            # byte value: one bincount per 8 categories
+            masks = view.category_mask[positions].astype("<u8", copy=False).view(np.uint8).reshape(-1, 8)
+            for byte in range((len(view.categories) + 7) // 8):
+                bits = np.bincount(masks[:, byte], minlength=256) @ _BYTE_BITS
+                for category, n in zip(view.categories[byte * 8:byte * 8 + 8], bits.tolist()):
+                    if n:
+                        categories[category] = n
+
+        store_counts = np.bincount(view.store_code[positions], minlength=len(view.stores))
+        stores = {}
+        for code in np.flatnonzero(store_counts).tolist():
+            if view.stores[code]:
+                stores[view.stores[code]] = int(store_counts[code])
+
+        price = view.price[positions]
+        at_least = [len(positions)] + [int(np.count_nonzero(price >= edge)) for edge in self.price_edges] + [0]
+        prices = [at_least[i] - at_least[i + 1] for i in range(len(self.price_edges) + 1)]
+        rating = view.rating[positions]
+        ratings = [int(np.count_nonzero(rating >= threshold)) for threshold in self.rating_thresholds]
+        return categories, stores, prices, ratings
+
+    def _result(self, categories: Dict[str, int], stores: Dict[str, int], prices: List[int], ratings: List[int]) -> dict:
+        def top(counts: Dict[str, int], limit: Optional[int] = None) -> List[dict]:
+            ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [{"value": value, "count": n} for value, n in ordered]
+
+        bounds = [None] + self.price_edges + [None]
+        return {
+            "category": top(categories),
+            "store": top(stores, self.store_limit),
+            "price": [{"min": bounds[i], "max": bounds[i + 1], "count": n} for i, n in enumerate(prices)],
+            "rating": [{"min": threshold, "max": None, "count": n}
+                       for threshold, n in zip(self.rating_thresholds, ratings)],
+        }
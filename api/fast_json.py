@@ -0,0 +1,54 @@
+import json
+from typing import Dict, Iterable, Iterator, Type
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class RowEncoder:
+    """Keeps every catalog row pre-encoded as JSON bytes.
+
+    Rows are validated through `model` once, when first encoded, so the bytes
+    match what FastAPI's response_model would have produced. Subscribed to
+    the catalog so changed or deleted rows are dropped from the cache.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._cache: Dict[int, bytes] = {}
+
+    # Catalog listener interface; rows are encoded lazily on first use
+    def add(self, product: dict):
+        pass
+
+    def add_many(self, products: Iterable[dict]):
+        pass
+
+    def remove(self, product: dict):
+        self._cache.pop(product["id"], None)
+
+    def encode(self, product: dict) -> bytes:
+        encoded = self._cache.get(product["id"])
+        if encoded is None:
+            encoded = self._cache[product["id"]] = dumps(self.model(**product).dict())
+        return encoded
+
+    def encode_list(self, rows: Iterable[dict]) -> bytes:
+        return b"[" + b",".join([self.encode(row) for row in rows]) + b"]"
+
+    def encode_each(self, rows: Iterable[dict]) -> Iterator[bytes]:
+        return (self.encode(row) for row in rows)
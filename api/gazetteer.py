@@ -0,0 +1,101 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+Key = Tuple[str, ...]
+
+
+def name_key(name: Optional[str]) -> Key:
+    """Lowercased word tokens of a name, so matching ignores case, spacing and punctuation"""
+    return tuple(token.lower() for token in _TOKEN.findall(name or ""))
+
+
+class Gazetteer:
+    """Exact matcher for catalog product and store names in assistant messages.
+
+    Subscribed to the catalog, so its names follow upserts and deletes. A
+    message is scanned left to right and the longest known name starting
+    at each word wins, like spaCy's EntityRuler with overlapping matches
+    filtered; a name listed both as a product and as a store is a product.
+    Results have the same shape as the NER model's entities and keep the
+    text as the user typed it.
+    """
+
+    LABELS = ("product", "store")
+
+    def __init__(self):
+        # (name tokens, label) -> number of catalog rows using it
+        self._counts: Dict[Tuple[Key, str], int] = {}
+        # first token -> {name length: number of names}, to bound the lookahead
+        self._lengths: Dict[str, Dict[int, int]] = {}
+
+    # Catalog listener interface
+    def add(self, product: dict, key_of=name_key):
+        for label in self.LABELS:
+            key = key_of(product.get(label))
+            if not key:
+                continue
+            count = self._counts.get((key, label), 0)
+            self._counts[(key, label)] = count + 1
+            if count == 0:
+                lengths = self._lengths.setdefault(key[0], {})
+                lengths[len(key)] = lengths.get(len(key), 0) + 1
+
+    def add_many(self, products: Iterable[dict]):
+        key_of = lru_cache(maxsize=65536)(name_key)
+        for product in products:
+            self.add(product, key_of)
+
+    def remove(self, product: dict):
+        for label in self.LABELS:
+            key = name_key(product.get(label))
+            count = self._counts.get((key, label))
+            if not count:
+                continue
+            if count > 1:
+                self._counts[(key, label)] = count - 1
+                continue
+            del self._counts[(key, label)]
+            lengths = self._lengths[key[0]]
+            lengths[len(key)] -= 1
+            if not lengths[len(key)]:
+                del lengths[len(key)]
+                if not lengths:
+                    del self._lengths[key[0]]
+
+    def clear(self):
+        self._counts.clear()
+        self._lengths.clear()
+
+    def _name_lengths(self, word: str) -> List[int]:
+        """Word counts of the names starting with `word`, longest first"""
+        return sorted(self._lengths.get(word, ()), reverse=True)
+
+    def _label(self, key: Key) -> Optional[str]:
+        for label in self.LABELS:
+            if (key, label) in self._counts:
+                return label
+        return None
+
+    def match(self, text: str) -> List[Dict[str, str]]:
+        tokens = [(m.start(), m.end(), m.group().lower()) for m in _TOKEN.finditer(text)]
+        words = [token for _, _, token in tokens]
+        entities = []
+        i = 0
+        while i < len(tokens):
+            matched = 0
+            for length in self._name_lengths(words[i]):
+                if i + length > len(tokens):
+                    continue
+                label = self._label(tuple(words[i:i + length]))
+                if label is not None:
+                    entities.append({"text": text[tokens[i][0]:tokens[i + length - 1][1]], "label": label})
+                    matched = length
+                    break
+            i += matched or 1
+        return entities
+
+    def __len__(self) -> int:
+        return len(self._counts)
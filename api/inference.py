@@ -0,0 +1,191 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from executor import QueueFull
+
+# (intent, entities) for a single assistant message
+InferenceResult = Tuple[str, List[Dict[str, str]]]
+# Receives (stage, value) partial results of one message, e.g. ("intent", "viewCart")
+PartialCallback = Callable[[str, Any], None]
+# Called by run_batch with (index of the message in the batch, stage, value)
+Notify = Callable[[int, str, Any], None]
+# (message, future, queue time, partial callback) of one queued message
+Item = Tuple[str, asyncio.Future, float, Optional[PartialCallback]]
+
+
+class EngineStopped(Exception):
+    """Set on messages whose batch was cancelled or that were still queued at stop()"""
+
+
+def fail_pending(items: List[Item], error: Exception):
+    for _, future, _, _ in items:
+        if not future.done():
+            future.set_exception(error)
+
+
+class BatchInferenceEngine:
+    """Micro-batches concurrent assistant messages.
+
+    Messages are queued by `infer` and picked up by a background worker that
+    waits at most `max_wait_ms` for up to `max_batch_size` messages, runs
+    `run_batch` once over all of them and hands each caller its own result.
+    At most `max_concurrency` batches run at a time; while they do, new
+    messages keep accumulating into the next batch. Once `max_pending`
+    messages are waiting, `infer` raises `QueueFull` instead of queueing.
+
+    `run_batch` also gets a `notify` callback for reporting a stage's
+    results as soon as they are known (the intents before NER finishes);
+    they reach the `on_partial` callback each message was queued with.
+
+    Every future resolves: a failing batch, or one returning a result count
+    other than its message count, fails all of its messages, and `stop()`
+    fails whatever is still queued with EngineStopped once the running
+    batches have finished.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[str], Notify], Awaitable[List[InferenceResult]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 256,
+        max_concurrency: int = 1,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_pending = max(1, max_pending)
+        self.max_concurrency = max(1, max_concurrency)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches = set()
+        # Counters exposed through stats()
+        self.pending = 0
+        self.rejected = 0
+        self.batch_count = 0
+        self.message_count = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._queue is not None:
+            stopped = EngineStopped("The assistant is shutting down")
+            while not self._queue.empty():
+                fail_pending([self._queue.get_nowait()], stopped)
+
+    def submit(self, message: str, on_partial: Optional[PartialCallback] = None) -> asyncio.Future:
+        """Queue a message; the returned future resolves to its result.
+
+        Cancelling the future drops the message if its batch hasn't started.
+        """
+        self.start()
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise QueueFull(f"{self.pending} assistant messages already queued")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending += 1
+        future.add_done_callback(self._finished)
+        self._queue.put_nowait((message, future, loop.time(), on_partial))
+        return future
+
+    async def infer(self, message: str, on_partial: Optional[PartialCallback] = None) -> InferenceResult:
+        return await self.submit(message, on_partial)
+
+    def _finished(self, future: asyncio.Future):
+        self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "in_flight_batches": len(self._batches),
+            "rejected": self.rejected,
+            "batches": self.batch_count,
+            "avg_batch_size": round(self.message_count / self.batch_count, 2) if self.batch_count else 0.0,
+            "avg_wait_ms": round(self.total_wait * 1000 / self.message_count, 3) if self.message_count else 0.0,
+            "max_wait_ms": round(self.max_wait_seen * 1000, 3),
+        }
+
+    async def _collect(self, batch: List[Item]):
+        """Fill `batch` in place, so that messages already taken off the queue
+        aren't lost if the wait is cancelled"""
+        batch.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first so the next batch fills up meanwhile
+            await self._slots.acquire()
+            batch: List[Item] = []
+            try:
+                await self._collect(batch)
+            except BaseException:
+                self._slots.release()
+                fail_pending(batch, EngineStopped("The assistant is shutting down"))
+                raise
+            # Callers that gave up (e.g. client disconnected) are dropped here
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            now = loop.time()
+            for _, _, queued_at, _ in batch:
+                waited = now - queued_at
+                self.total_wait += waited
+                self.max_wait_seen = max(self.max_wait_seen, waited)
+            self.batch_count += 1
+            self.message_count += len(batch)
+            task = loop.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch: List[Item]):
+        def notify(index: int, stage: str, value: Any):
+            _, future, _, on_partial = batch[index]
+            if on_partial is not None and not future.done():
+                on_partial(stage, value)
+
+        try:
+            results = await self.run_batch([message for message, _, _, _ in batch], notify)
+        except Exception as e:
+            fail_pending(batch, e)
+            return
+        except BaseException:
+            # Cancelled: the callers must not wait forever
+            fail_pending(batch, EngineStopped("The assistant batch was cancelled"))
+            raise
+        finally:
+            self._slots.release()
+        if len(results) != len(batch):
+            fail_pending(batch, RuntimeError(f"Got {len(results)} results for a batch of {len(batch)} messages"))
+            return
+        for (_, future, _, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
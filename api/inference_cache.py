@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """Thread-safe bounded LRU map with hit/miss/eviction counters"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.split())
+
+
+class InferenceCache:
+    """Memoizes the model stage of the assistant.
+
+    `messages` maps a whitespace-normalized message to its (intent, entities)
+    and skips both models. `intents` maps a padded token-id sequence to its
+    intent, so phrasings that tokenize identically ("View my cart!" and
+    "view my cart") share one intent prediction even though NER still runs.
+
+    Both are flushed by `flush()` whenever the models are reloaded. Results
+    computed by the previous models are discarded: callers read `generation`
+    before inferring and pass it back to the put methods.
+    """
+
+    def __init__(self, max_messages: int = 10000, max_intents: int = 10000):
+        self.messages = LRUCache(max_messages)
+        self.intents = LRUCache(max_intents)
+        self.generation = 0
+        self.flushes = 0
+
+    def get_message(self, message: str):
+        return self.messages.get(normalize_message(message))
+
+    def put_message(self, message: str, result, generation: int):
+        if generation == self.generation:
+            self.messages.put(normalize_message(message), result)
+
+    def get_intent(self, token_ids: bytes) -> Optional[str]:
+        return self.intents.get(token_ids)
+
+    def put_intent(self, token_ids: bytes, intent: str, generation: int):
+        if generation == self.generation:
+            self.intents.put(token_ids, intent)
+
+    def flush(self):
+        self.generation += 1
+        self.flushes += 1
+        self.messages.clear()
+        self.intents.clear()
+
+    def flush_messages(self):
+        """Drop whole-message results only, e.g. when the catalog names the
+        gazetteer matches or entities are snapped to have changed; intents
+        stay valid"""
+        self.generation += 1
+        self.flushes += 1
+        self.messages.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "flushes": self.flushes,
+            "messages": self.messages.stats(),
+            "intents": self.intents.stats(),
+        }
@@ -0,0 +1,116 @@
+import contextvars
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger("naijamarket")
+trace_logger = logging.getLogger("naijamarket.trace")
+
+# Metrics shared by every module; rendered by the /metrics endpoint
+registry = MetricsRegistry()
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in each stage of the request handlers and model pipeline", ("stage",)
+)
+BATCH_SIZE = registry.histogram(
+    "assistant_batch_size", "Messages per assistant model batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+ERRORS = registry.counter("assistant_errors_total", "Errors handled inside the assistant endpoint", ("stage",))
+
+# Stage durations (ms) of the current request, when it is being traced
+_trace: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("trace", default=None)
+
+
+def enable_trace_logging():
+    """Print trace lines as bare JSON on stderr (the trace logger has no handler by default)"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into STAGE_SECONDS and the current request's trace.
+
+    Blocks running in executor threads only feed the histogram: the
+    request context isn't carried over to them.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = trace.get(name, 0.0) + elapsed * 1000
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template.
+
+    A fraction `trace_sample_rate` of requests, and every request slower
+    than `trace_slow_ms` (if set), is logged as one JSON line with its
+    stage timings on the "naijamarket.trace" logger.
+    """
+
+    def __init__(self, app, router, trace_sample_rate: float = 0.0, trace_slow_ms: float = 0.0):
+        self.app = app
+        self.router = router
+        self.trace_sample_rate = trace_sample_rate
+        self.trace_slow_ms = trace_slow_ms
+        self._route_paths = None
+
+    def _route(self, scope) -> str:
+        # Route templates keep label cardinality bounded (not raw paths)
+        if self._route_paths is None:
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path for route in self.router.routes
+            }
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sampled = self.trace_sample_rate > 0 and random.random() < self.trace_sample_rate
+        stages: Optional[Dict[str, float]] = {} if sampled or self.trace_slow_ms > 0 else None
+        token = _trace.set(stages)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _trace.reset(token)
+            route = self._route(scope)
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            slow = self.trace_slow_ms > 0 and elapsed * 1000 >= self.trace_slow_ms
+            if stages is not None and (sampled or slow):
+                trace_logger.info(json.dumps({
+                    "trace_id": uuid.uuid4().hex[:16],
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "stages_ms": {name: round(ms, 3) for name, ms in stages.items()},
+                }))
+
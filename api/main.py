@@ -1,13 +1,54 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Dict, Any, Optional, Union
+import asyncio
+import secrets
 import uvicorn
-import pickle
-import numpy as np
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from tensorflow.keras.models import load_model
-import spacy
+
+import config
+import fast_json
+import ner_worker
+from assistant_models import (
+    WARMUP_MESSAGES,
+    load_assistant_models,
+    load_numpy_assistant_models,
+    load_registry_assistant_models,
+)
+from cart_store import CartItemNotFound, CartNotFound, create_cart_store
+from catalog import Catalog
+from catalog_io import CatalogFile, iter_products
+from catalog_snapshot import SnapshotCatalog, publish, publish_if_missing
+from catalog_store import CatalogStore
+from executor import ModelExecutor, QueueFull
+from facets import FacetCounts
+from gazetteer import Gazetteer
+from inference import BatchInferenceEngine, InferenceResult, Notify, PartialCallback
+from inference_cache import InferenceCache
+from instrumentation import BATCH_SIZE, ERRORS, MetricsMiddleware, enable_trace_logging, logger, registry, stage
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from mlflow_registry import LocalModelRegistry, RegistryError
+from model_registry import ModelRegistry, ModelsUnavailable
+from model_rollout import ModelRollout, RolloutConflict
+from pagination import (
+    NDJSON_MEDIA_TYPE, decode_cursor, encode_cursor, iter_project, ndjson_lines, parse_fields, project,
+)
+from product_index import ProductLookup
+from query_cache import QueryCache
+from schemas import (
+    PRODUCT_FIELDS,
+    AIAssistantRequest,
+    AIAssistantResponse,
+    CartItem,
+    CartUpdate,
+    FacetedProducts,
+    Product,
+    RolloutRequest,
+    SearchQuery,
+    Suggestion,
+)
+from search_index import SearchIndex, tokenize
+from suggest_index import KINDS as SUGGEST_KINDS, SuggestIndex
 
 # Product categories for the marketplace
 PRODUCT_CATEGORIES = [
@@ -30,68 +71,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Load models and tokenizers
-try:
-    # Load intent recognition model and tokenizers
-    with open('tokenizer.pickle', 'rb') as handle:
-        tokenizer = pickle.load(handle)
-    
-    with open('label_encoder.pickle', 'rb') as f:
-        label_encoder = pickle.load(f)
-    
-    intent_model = load_model('intent_recognition_model')
-    
-    # Load NER model
-    nlp_ner = spacy.load("model-best")
-except Exception as e:
-    print(f"Error loading models: {e}")
-    raise
-
-# BaseModel from Pydantic provides:
-# 1. Data validation - ensures all fields have correct types
-# 2. JSON serialization/deserialization - converts between Python objects and JSON
-# 3. Schema generation - creates OpenAPI documentation automatically
-# 4. Type checking - provides runtime type checking for all fields
-class Product(BaseModel):
-    id: int
-    product: str
-    price: float
-    image: str
-    categories: List[str]
-    rating: Optional[float] = None
-    store: Optional[str] = None
-    badge: Optional[str] = None
-    description: Optional[str] = None
-
-class CartItem(BaseModel):
-    id: int
-    product: str
-    price: float
-    quantity: int
-    image: str
-    store: str
-
-class CartUpdate(BaseModel):
-    product_id: int
-    quantity: int
-
-class SearchQuery(BaseModel):
-    query: str
-    category: Optional[str] = None
-    min_price: Optional[float] = None
-    max_price: Optional[float] = None
-    sort_by: Optional[str] = None
-
-class AIAssistantRequest(BaseModel):
-    message: str
-
-class AIAssistantResponse(BaseModel):
-    message: str
-    intent: Optional[str] = None
-    entities: Optional[List[Dict[str, str]]] = None
-    navigation: Optional[Dict[str, str]] = None
+# Request latency histograms and sampled per-request traces
+if config.METRICS_ENABLED:
+    app.add_middleware(
+        MetricsMiddleware,
+        router=app.router,
+        trace_sample_rate=config.TRACE_SAMPLE_RATE,
+        trace_slow_ms=config.TRACE_SLOW_MS,
+    )
+    if config.TRACE_SAMPLE_RATE or config.TRACE_SLOW_MS:
+        enable_trace_logging()
 
 # Sample product database
 products_db = [
@@ -342,281 +334,931 @@ products_db = [
     }
 ]
 
-# In-memory cart storage (in production, use a database)
-carts = {}
+# Persisted catalog (see CATALOG_STORE_PATH); products_db is only the
+# fallback when neither a store nor CATALOG_PATH has rows
+catalog_file = CatalogFile(config.CATALOG_STORE_PATH) if config.CATALOG_STORE_PATH else None
+
+def catalog_source():
+    if config.CATALOG_PATH:
+        return iter_products(config.CATALOG_PATH)
+    return products_db
+
+def initial_products():
+    if catalog_file is not None and len(catalog_file):
+        return catalog_file.rows()
+    return catalog_source()
+
+if catalog_file is not None and not len(catalog_file):
+    catalog_file.save(catalog_source())
+
+# Catalog-wide facet counts, returned as is for unfiltered listings
+facet_counts = FacetCounts(config.FACET_PRICE_EDGES, config.FACET_RATING_THRESHOLDS, config.FACET_STORE_LIMIT)
+query_cache = QueryCache(
+    max_entries=config.QUERY_CACHE_MAX_ENTRIES,
+    max_bytes=config.QUERY_CACHE_MAX_BYTES,
+    ttl=config.QUERY_CACHE_TTL,
+)
+
+if config.CATALOG_SNAPSHOT_DIR:
+    # One mapped snapshot serves as the catalog, its columns, search index,
+    # gazetteer, typeahead, lookups and encoded rows, shared with the other
+    # workers
+    snapshots = SnapshotCatalog(config.CATALOG_SNAPSHOT_DIR)
+    publish_if_missing(config.CATALOG_SNAPSHOT_DIR, initial_products)
+    snapshots.on_swap.append(lambda snapshot: query_cache.clear())
+    snapshots.on_swap.append(facet_counts.reset)
+    snapshots.refresh()
+    catalog = catalog_store = search_index = suggest_index = product_lookup = row_encoder = snapshots
+    gazetteer = snapshots if config.NER_GAZETTEER else None
+else:
+    # Derived structures are kept in sync through the catalog. They subscribe
+    # before it is loaded, so the initial load reaches them in bulk batches.
+    snapshots = None
+    catalog = Catalog(compact=config.CATALOG_COMPACT_ROWS)
+    search_index = catalog.subscribe(SearchIndex())
+    catalog_store = CatalogStore(catalog, PRODUCT_CATEGORIES)
+    product_lookup = catalog.subscribe(ProductLookup())
+    row_encoder = catalog.subscribe(fast_json.RowEncoder(Product))
+    # Known product and store names, the NER fast path (see NER_GAZETTEER)
+    gazetteer = catalog.subscribe(Gazetteer()) if config.NER_GAZETTEER else None
+    # Typeahead over product, store and category names (see /suggest)
+    suggest_index = catalog.subscribe(SuggestIndex(max_edits=config.SUGGEST_MAX_EDITS))
+    catalog.subscribe(facet_counts)
+    catalog.subscribe(query_cache)
+    catalog.load(initial_products(), batch_size=config.CATALOG_LOAD_BATCH_SIZE)
+    # Built before serving; later rebuilds run in the background
+    suggest_index.build()
+logger.info("Loaded %d products", len(catalog))
+
+# Cart storage: in-memory by default, or SQLite/Redis to survive restarts
+# and be shared between uvicorn workers (see CART_BACKEND)
+cart_store = create_cart_store(
+    config.CART_BACKEND,
+    db_path=config.CART_DB_PATH,
+    redis_url=config.CART_REDIS_URL,
+    lock_stripes=config.CART_LOCK_STRIPES,
+)
+
+def cart_response(items: List[dict]):
+    """Cart items are validated on the way in, so FAST_JSON skips re-validating them"""
+    if config.FAST_JSON:
+        return Response(fast_json.dumps(items), media_type="application/json")
+    return items
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to NaijaMarket API"}
 
+@app.get("/suggest", response_model=List[Suggestion])
+async def suggest(
+    q: str = Query(..., max_length=100),
+    limit: int = Query(10, ge=1, le=SuggestIndex.MEMO_SIZE),
+    kind: Optional[str] = None,
+):
+    """Typeahead: product, store and category names completing `q`, tolerating typos.
+
+    Exact completions come first, by popularity (listings per name), then
+    corrected ones by number of edits.
+    """
+    if kind is not None and kind not in SUGGEST_KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid kind. Must be one of: {', '.join(SUGGEST_KINDS)}")
+    with stage("suggest"):
+        return suggest_index.suggest(q, limit, kind)
+
 @app.get("/categories")
 async def get_categories():
     """Get list of all available product categories"""
     return PRODUCT_CATEGORIES
 
-@app.get("/products", response_model=List[Product])
+def cached_query(key, tag: Optional[str], compute):
+    """Positions for a filter/sort/search query, served from the query cache when fresh"""
+    with stage("catalog_query"):
+        ids = query_cache.get(key)
+        if ids is not None:
+            return catalog_store.positions_of_ids(ids)
+        positions = compute()
+        query_cache.put(key, catalog_store.ids[positions], tag)
+        return positions
+
+def result_facets(positions) -> dict:
+    """Facet counts of a query result"""
+    with stage("facets"):
+        # A result holding every row has the catalog-wide counts, which are
+        # kept up to date as rows change
+        if len(positions) == len(catalog):
+            return facet_counts.totals()
+        return facet_counts.count(catalog_store, positions)
+
+def catalog_page(
+    request: Request,
+    response: Response,
+    positions,
+    sort_by: Optional[str],
+    cursor: Optional[str],
+    offset: int,
+    limit: Optional[int],
+    fields: Optional[str],
+    facets: bool = False,
+):
+    """Paginate, project and encode filtered catalog positions.
+
+    Returns the next page cursor in the X-Next-Cursor header. Clients that
+    send `Accept: application/x-ndjson` get the rows streamed as NDJSON.
+    With `facets`, the page comes back as {"products": [...], "facets": {...}}
+    with the counts of the whole result, not just the page.
+    """
+    try:
+        selected = parse_fields(fields, PRODUCT_FIELDS)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if after is not None and after.get("sort") != sort_by:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by")
+    ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    if facets and ndjson:
+        raise HTTPException(status_code=400, detail="Facets are not available in NDJSON responses")
+    counts = result_facets(positions) if facets else None
+    
+    with stage("paginate"):
+        page, marker = catalog_store.page(positions, sort_by, after, offset, limit)
+    headers = {}
+    if marker is not None:
+        marker["sort"] = sort_by
+        headers["X-Next-Cursor"] = encode_cursor(marker)
+    
+    if ndjson:
+        rows = catalog_store.iter_rows(page)
+        if selected is None:
+            encoded = row_encoder.encode_each(rows)
+        else:
+            encoded = map(fast_json.dumps, iter_project(rows, selected, Product))
+        return StreamingResponse(ndjson_lines(encoded), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    
+    rows = catalog_store.rows(page)
+    if config.FAST_JSON:
+        with stage("serialize"):
+            if selected is None:
+                body = row_encoder.encode_list(rows)
+            else:
+                body = fast_json.dumps(project(rows, selected, Product))
+            if counts is not None:
+                body = b'{"products":' + body + b',"facets":' + fast_json.dumps(counts) + b"}"
+        return Response(body, media_type="application/json", headers=headers)
+    if selected is not None:
+        rows = project(rows, selected, Product)
+        return JSONResponse(rows if counts is None else {"products": rows, "facets": counts}, headers=headers)
+    response.headers.update(headers)
+    return rows if counts is None else {"products": rows, "facets": counts}
+
+@app.get("/products", response_model=Union[List[Product], FacetedProducts])
 async def get_products(
+    request: Request,
+    response: Response,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: Optional[str] = None
+    sort_by: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    facets: bool = False,
 ):
-    filtered_products = products_db
-    
-    if category:
-        if category not in PRODUCT_CATEGORIES:
-            raise HTTPException(status_code=400, detail=f"Invalid category. Must be one of: {', '.join(PRODUCT_CATEGORIES)}")
-        filtered_products = [p for p in filtered_products if category in p["categories"]]
-    
-    if min_price is not None:
-        filtered_products = [p for p in filtered_products if p["price"] >= min_price]
-    
-    if max_price is not None:
-        filtered_products = [p for p in filtered_products if p["price"] <= max_price]
+    if category and category not in PRODUCT_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Invalid category. Must be one of: {', '.join(PRODUCT_CATEGORIES)}")
     
-    if sort_by:
-        if sort_by == "price-low":
-            filtered_products.sort(key=lambda x: x["price"])
-        elif sort_by == "price-high":
-            filtered_products.sort(key=lambda x: x["price"], reverse=True)
-    
-    return filtered_products
+    # Plain listings only depend on rows of the filtered category
+    key = ("products", category, min_price, max_price, sort_by)
+    positions = cached_query(key, category, lambda: catalog_store.query(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        sort_by=sort_by,
+    ))
+    return catalog_page(request, response, positions, sort_by, cursor, 0, limit, fields, facets)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and eviction counters of the catalog query cache"""
+    return query_cache.stats()
 
 @app.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: int):
-    product = next((p for p in products_db if p["id"] == product_id), None)
+    product = catalog.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    if config.FAST_JSON:
+        return Response(row_encoder.encode(product), media_type="application/json")
     return product
 
 @app.get("/products_with_Ai_Assitant/{product_name}", response_model=Product)
-async def get_product_with_Ai_Assitant(product_name: str):
-    product = next((p for p in products_db if p["product"] == product_name), None)
+async def get_product_with_Ai_Assitant(product_name: str, store: Optional[str] = None):
+    """Resolve a product by name (case/whitespace-insensitive), optionally from a specific store"""
+    with stage("catalog_lookup"):
+        if store:
+            product = product_lookup.by_name_and_store(product_name, store)
+        else:
+            product = product_lookup.by_name(product_name)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
+# Cart handlers are plain functions: FastAPI runs them in its thread pool,
+# so blocking SQLite and Redis calls never hold up the event loop, and the
+# cart store's per-user locks serialize them
 @app.post("/cart/{user_id}/add", response_model=List[CartItem])
-async def add_to_cart(user_id: str, cart_item: CartItem):
-    if user_id not in carts:
-        carts[user_id] = []
-    
-    existing_item = next((item for item in carts[user_id] if item["id"] == cart_item.id), None)
-    
-    if existing_item:
-        existing_item["quantity"] += cart_item.quantity
-    else:
-        carts[user_id].append(cart_item.dict())
-    
-    return carts[user_id]
+def add_to_cart(user_id: str, cart_item: CartItem):
+    with stage("cart_write"):
+        cart = cart_store.add(user_id, cart_item.dict())
+    return cart_response(cart)
+
+@app.post("/cart/{user_id}/add_many", response_model=List[CartItem])
+def add_many_to_cart(user_id: str, cart_items: List[CartItem]):
+    with stage("cart_write"):
+        cart = cart_store.add_many(user_id, [item.dict() for item in cart_items])
+    return cart_response(cart)
 
 @app.get("/cart/{user_id}", response_model=List[CartItem])
-async def get_cart(user_id: str):
-    return carts.get(user_id, [])
+def get_cart(user_id: str):
+    with stage("cart_read"):
+        cart = cart_store.get(user_id)
+    return cart_response(cart)
 
 @app.put("/cart/{user_id}/update", response_model=List[CartItem])
-async def update_cart(user_id: str, update: CartUpdate):
-    if user_id not in carts:
+def update_cart(user_id: str, update: CartUpdate):
+    return update_many_in_cart(user_id, [update])
+
+@app.put("/cart/{user_id}/update_many", response_model=List[CartItem])
+def update_many_in_cart(user_id: str, updates: List[CartUpdate]):
+    """Set several item quantities at once; a quantity of 0 removes the item"""
+    try:
+        with stage("cart_write"):
+            cart = cart_store.update_many(user_id, [(u.product_id, u.quantity) for u in updates])
+    except CartNotFound:
         raise HTTPException(status_code=404, detail="Cart not found")
-    
-    cart = carts[user_id]
-    item = next((item for item in cart if item["id"] == update.product_id), None)
-    
-    if not item:
+    except CartItemNotFound:
         raise HTTPException(status_code=404, detail="Item not found in cart")
-    
-    if update.quantity <= 0:
-        cart.remove(item)
-    else:
-        item["quantity"] = update.quantity
-    
-    return cart
+    return cart_response(cart)
 
 @app.delete("/cart/{user_id}/remove/{product_id}", response_model=List[CartItem])
-async def remove_from_cart(user_id: str, product_id: int):
-    if user_id not in carts:
+def remove_from_cart(user_id: str, product_id: int):
+    try:
+        with stage("cart_write"):
+            cart = cart_store.remove(user_id, product_id)
+    except CartNotFound:
         raise HTTPException(status_code=404, detail="Cart not found")
-    
-    cart = carts[user_id]
-    cart = [item for item in cart if item["id"] != product_id]
-    carts[user_id] = cart
-    
-    return cart
+    return cart_response(cart)
 
 @app.delete("/cart/{user_id}/clear", response_model=List[CartItem])
-async def clear_cart(user_id: str):
-    if user_id in carts:
-        carts[user_id] = []
+def clear_cart(user_id: str):
+    with stage("cart_write"):
+        cart_store.clear(user_id)
     return []
 
-@app.post("/search", response_model=List[Product])
-async def search_products(search_query: SearchQuery):
-    filtered_products = products_db
-    
-    # Search by query
-    if search_query.query:
-        query = search_query.query.lower()
-        filtered_products = [
-            p for p in filtered_products
-            if query in p["product"].lower() or
-            query in p.get("description", "").lower() or
-            any(query in cat.lower() for cat in p["categories"])
-        ]
-    
-    # Apply filters
-    if search_query.category:
-        if search_query.category not in PRODUCT_CATEGORIES:
-            raise HTTPException(status_code=400, detail=f"Invalid category. Must be one of: {', '.join(PRODUCT_CATEGORIES)}")
-        filtered_products = [p for p in filtered_products if search_query.category in p["categories"]]
-    
-    if search_query.min_price is not None:
-        filtered_products = [p for p in filtered_products if p["price"] >= search_query.min_price]
+@app.post("/search", response_model=Union[List[Product], FacetedProducts])
+async def search_products(request: Request, response: Response, search_query: SearchQuery):
+    if search_query.category and search_query.category not in PRODUCT_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Invalid category. Must be one of: {', '.join(PRODUCT_CATEGORIES)}")
     
-    if search_query.max_price is not None:
-        filtered_products = [p for p in filtered_products if p["price"] <= search_query.max_price]
+    # A query without any searchable terms ("", "!!!") is no text query: it
+    # lists every row, and shares its cache entry with the empty query
+    terms = " ".join(tokenize(search_query.query))
+
+    def run_search():
+        # Search by query (results come back ranked by relevance)
+        subset = None
+        if terms:
+            with stage("search_index"):
+                ranked = search_index.search(search_query.query)
+            subset = catalog_store.positions(product_id for product_id, _ in ranked)
+        
+        # Apply filters and sorting (sorting overrides relevance order)
+        return catalog_store.query(
+            category=search_query.category,
+            min_price=search_query.min_price,
+            max_price=search_query.max_price,
+            sort_by=search_query.sort_by,
+            subset=subset,
+        )
     
-    # Apply sorting
-    if search_query.sort_by:
-        if search_query.sort_by == "price-low":
-            filtered_products.sort(key=lambda x: x["price"])
-        elif search_query.sort_by == "price-high":
-            filtered_products.sort(key=lambda x: x["price"], reverse=True)
-        elif search_query.sort_by == "rating":
-            filtered_products.sort(key=lambda x: x.get("rating", 0), reverse=True)
+    # Relevance scores depend on the whole catalog, so text searches are
+    # invalidated by any change; pure filters only by their category
+    key = ("search", terms, search_query.category, search_query.min_price, search_query.max_price, search_query.sort_by)
+    tag = None if terms else search_query.category
+    positions = cached_query(key, tag, run_search)
     
-    return filtered_products
+    # Apply pagination before materializing rows
+    return catalog_page(
+        request,
+        response,
+        positions,
+        search_query.sort_by,
+        search_query.cursor,
+        search_query.offset,
+        search_query.limit,
+        search_query.fields,
+        search_query.facets,
+    )
 
-def prepare_sentence(sentence: str, max_seq_len: int = 35) -> np.ndarray:
-    input_seq = tokenizer.texts_to_sequences([sentence])
-    input_features = pad_sequences(input_seq, maxlen=max_seq_len, padding='post')
-    return input_features
+def require_admin(x_admin_token: str = Header("")):
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not secrets.compare_digest(x_admin_token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
-@app.post("/personal_assistant", response_model=AIAssistantResponse)
-async def process_ai_request(request: AIAssistantRequest):
-    message = request.message.strip()
-    
+def catalog_changed():
+    # Cached assistant replies may carry entities matched or snapped
+    # against old names
+    if gazetteer is not None or config.NER_SNAP_ENTITIES:
+        inference_cache.flush_messages()
+
+def require_writable_catalog():
+    # Snapshots are read-only; changes are collected in the catalog store
+    # and go live with the next publish
+    if snapshots is not None and catalog_file is None:
+        raise HTTPException(status_code=409, detail="Catalog changes need CATALOG_STORE_PATH in snapshot mode")
+
+@app.put("/admin/products/{product_id}", response_model=Product,
+         dependencies=[Depends(require_admin), Depends(require_writable_catalog)])
+async def upsert_product(product_id: int, product: Product):
+    """Create or replace one product; the change is persisted before it is applied"""
+    if product.id != product_id:
+        raise HTTPException(status_code=400, detail="Product id does not match the URL")
+    row = product.dict()
+    if catalog_file is not None:
+        catalog_file.save([row])
+    if snapshots is None:
+        catalog.upsert(row)
+        catalog_changed()
+    return row
+
+@app.post("/admin/products", dependencies=[Depends(require_admin), Depends(require_writable_catalog)])
+async def upsert_products(products: List[Product]):
+    """Bulk create or replace products"""
+    rows = [product.dict() for product in products]
+    if catalog_file is not None:
+        catalog_file.save(rows)
+    if snapshots is not None:
+        return {"upserted": len({row["id"] for row in rows})}
+    count = catalog.load(rows, batch_size=config.CATALOG_LOAD_BATCH_SIZE)
+    catalog_changed()
+    return {"upserted": count}
+
+@app.delete("/admin/products/{product_id}", response_model=Product,
+            dependencies=[Depends(require_admin), Depends(require_writable_catalog)])
+async def delete_product(product_id: int):
+    if snapshots is not None:
+        product = catalog_file.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        catalog_file.delete([product_id])
+        return product
+    if catalog.get(product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if catalog_file is not None:
+        catalog_file.delete([product_id])
+    product = catalog.delete(product_id)
+    catalog_changed()
+    return product
+
+@app.post("/admin/catalog/publish", dependencies=[Depends(require_admin)])
+async def publish_catalog():
+    """Publish the catalog store as a new snapshot; every worker picks it up on its next poll"""
+    if snapshots is None:
+        raise HTTPException(status_code=409, detail="Catalog snapshots are disabled (see CATALOG_SNAPSHOT_DIR)")
+    if catalog_file is None:
+        raise HTTPException(status_code=409, detail="Nothing to publish without CATALOG_STORE_PATH")
+    loop = asyncio.get_running_loop()
+    version, count = await loop.run_in_executor(
+        None, lambda: publish(config.CATALOG_SNAPSHOT_DIR, catalog_file.rows()))
+    await snapshots.poll()
+    return {"version": version, "products": count}
+
+# Memoized model outputs; flushed whenever the models are reloaded
+inference_cache = InferenceCache(
+    max_messages=config.ASSISTANT_CACHE_SIZE,
+    max_intents=config.ASSISTANT_INTENT_CACHE_SIZE,
+)
+
+def predict_intents(models, messages: List[str]) -> List[str]:
+    generation = inference_cache.generation
+    with stage("tokenize"):
+        input_features = models.prepare_sentences(messages)
+    # Only run the model for token sequences it hasn't classified yet
+    keys = [row.tobytes() for row in input_features]
+    intents = [inference_cache.get_intent(key) for key in keys]
+    missing = [i for i, intent in enumerate(intents) if intent is None]
+    if missing:
+        with stage("intent_model"):
+            predicted = models.predict_intents(input_features[missing])
+        for i, intent in zip(missing, predicted):
+            intents[i] = intent
+            inference_cache.put_intent(keys[i], intent, generation)
+    return intents
+
+# Model calls never run on the event loop: TensorFlow gets a thread pool,
+# spaCy either a thread pool or a process pool with one model per worker
+intent_executor = ModelExecutor("intent", max_workers=config.ASSISTANT_INTENT_WORKERS)
+if config.ASSISTANT_NER_PROCESSES:
+    ner_executor = ModelExecutor(
+        "ner",
+        max_workers=config.ASSISTANT_NER_PROCESSES,
+        processes=True,
+        initializer=ner_worker.init_worker,
+        initargs=(config.NER_MODEL_PATH, config.NER_MODE),
+    )
+else:
+    ner_executor = ModelExecutor("ner", max_workers=config.ASSISTANT_NER_WORKERS)
+
+async def model_entities(models, messages: List[str]):
+    if config.ASSISTANT_NER_PROCESSES:
+        return await ner_executor.run(ner_worker.extract_entities, messages)
+    return await ner_executor.run(models.extract_entities, messages)
+
+async def extract_entities(models, messages: List[str]):
+    """Catalog names when the gazetteer finds a product, the NER model otherwise"""
+    if gazetteer is None:
+        with stage("ner_model"):
+            return await model_entities(models, messages)
+    with stage("ner_gazetteer"):
+        entities = [gazetteer.match(message) for message in messages]
+    misses = [i for i, found in enumerate(entities) if not any(e["label"] == "product" for e in found)]
+    if misses:
+        with stage("ner_model"):
+            found = await model_entities(models, [messages[i] for i in misses])
+        for i, message_entities in zip(misses, found):
+            entities[i] = message_entities
+    return entities
+
+def snap_entities(entities: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Misspelled product and store names replaced by the closest catalog name"""
+    snapped = []
+    for entity in entities:
+        if entity["label"] in Gazetteer.LABELS:
+            match = suggest_index.snap(entity["text"], entity["label"])
+            # Exact names keep the text as the user typed it
+            if match is not None and match[1]:
+                entity = {**entity, "text": match[0]}
+        snapped.append(entity)
+    return snapped
+
+async def run_inference_batch(messages: List[str], notify: Notify):
+    """Run the intent model and NER once over a whole batch of messages.
+
+    The two run concurrently on their own executors, and each reports its
+    results as soon as it finishes, for streamed replies.
+    """
+    models = await model_registry.get()
+    BATCH_SIZE.observe(len(messages))
+
+    async def intent_stage():
+        intents = await intent_executor.run(predict_intents, models, messages)
+        for i, intent in enumerate(intents):
+            notify(i, "intent", intent)
+        model_rollout.observe(messages)
+        return intents
+
+    async def entity_stage():
+        entities = await extract_entities(models, messages)
+        if config.NER_SNAP_ENTITIES:
+            entities = [snap_entities(message_entities) for message_entities in entities]
+        for i, message_entities in enumerate(entities):
+            notify(i, "entities", message_entities)
+        return entities
+
+    intents, entities = await asyncio.gather(intent_stage(), entity_stage())
+    return list(zip(intents, entities))
+
+# Intent model versions registered by the training runs (see INTENT_MODEL_VERSION)
+intent_registry = LocalModelRegistry(config.MLFLOW_TRACKING_DIR, config.MLFLOW_ARTIFACTS_DIR, config.INTENT_REGISTRY_MODEL)
+
+def load_models():
+    # Pool workers load their own NER copy in process mode
+    ner_model_path = None if config.ASSISTANT_NER_PROCESSES else config.NER_MODEL_PATH
+    if config.INTENT_MODEL_VERSION:
+        version = intent_registry.resolve(config.INTENT_MODEL_VERSION)
+        models = load_registry_assistant_models(
+            config.TOKENIZER_VOCAB_PATH,
+            config.LABEL_ENCODER_PATH,
+            version["path"],
+            ner_model_path,
+            ner_mode=config.NER_MODE,
+            ner_processes=config.NER_N_PROCESS,
+        )
+        model_rollout.version = version
+        return models
+    if config.INTENT_BACKEND == "numpy":
+        return load_numpy_assistant_models(
+            config.TOKENIZER_VOCAB_PATH,
+            config.INTENT_NUMPY_WEIGHTS_PATH,
+            ner_model_path,
+            ner_mode=config.NER_MODE,
+            ner_processes=config.NER_N_PROCESS,
+        )
+    return load_assistant_models(
+        config.TOKENIZER_VOCAB_PATH,
+        config.LABEL_ENCODER_PATH,
+        config.INTENT_MODEL_PATH,
+        ner_model_path,
+        ner_mode=config.NER_MODE,
+        ner_processes=config.NER_N_PROCESS,
+    )
+
+async def warm_up_models(models):
+    """Push a sample batch through both models to trigger graph tracing"""
+    for size in (1, len(WARMUP_MESSAGES)):
+        batch = WARMUP_MESSAGES[:size]
+        await intent_executor.run(lambda: models.predict_intents(models.prepare_sentences(batch)))
+        await model_entities(models, batch)
+
+async def warm_up_intent_model(models):
+    """Warm-up for a new intent model version; the NER pipeline is shared with the serving models"""
+    for size in (1, len(WARMUP_MESSAGES)):
+        batch = WARMUP_MESSAGES[:size]
+        await intent_executor.run(lambda: models.predict_intents(models.prepare_sentences(batch)))
+
+# Models load off the import path; catalog and cart endpoints work meanwhile
+model_registry = ModelRegistry(
+    load_models, warmup=warm_up_models,
+    retry_seconds=config.MODEL_RETRY_S, max_retry_seconds=config.MODEL_RETRY_MAX_S,
+)
+# Cached results from previous models must not outlive a reload or swap
+model_registry.on_loaded.append(lambda models: inference_cache.flush())
+# New intent model versions are swapped in without a restart
+model_rollout = ModelRollout(
+    intent_registry,
+    model_registry,
+    lambda serving, path: serving.with_intent_artifact(path, config.LABEL_ENCODER_PATH),
+    warm_up_intent_model,
+    shadow_sample=config.INTENT_SHADOW_SAMPLE,
+    shadow_seconds=config.INTENT_SHADOW_S,
+    min_agreement=config.INTENT_SHADOW_MIN_AGREEMENT,
+    smoke_messages=WARMUP_MESSAGES,
+)
+if snapshots is not None:
+    snapshots.on_swap.append(lambda snapshot: catalog_changed())
+
+# Concurrent assistant requests share one model call per batch
+inference_engine = BatchInferenceEngine(
+    run_inference_batch,
+    max_batch_size=config.ASSISTANT_MAX_BATCH_SIZE,
+    max_wait_ms=config.ASSISTANT_MAX_WAIT_MS,
+    max_pending=config.ASSISTANT_MAX_PENDING,
+    max_concurrency=config.ASSISTANT_INTENT_WORKERS,
+)
+
+@app.on_event("startup")
+async def start_inference_engine():
+    inference_engine.start()
+    if config.MODEL_LOADING == "eager":
+        await model_registry.load()
+    elif config.MODEL_LOADING == "background":
+        model_registry.start_loading()
+    if snapshots is not None:
+        snapshots.start(config.CATALOG_SNAPSHOT_POLL_S)
+    if config.INTENT_MODEL_VERSION and config.INTENT_MODEL_POLL_S > 0:
+        model_rollout.watch(config.INTENT_MODEL_VERSION, config.INTENT_MODEL_POLL_S)
+
+@app.on_event("shutdown")
+async def stop_inference_engine():
+    if snapshots is not None:
+        await snapshots.stop()
+    await model_rollout.stop()
+    await inference_engine.stop()
+    intent_executor.shutdown()
+    ner_executor.shutdown()
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the assistant models are loaded and warmed up"""
+    status = {"ready": model_registry.ready, "models": model_registry.status()}
+    return JSONResponse(status, status_code=200 if model_registry.ready else 503)
+
+@app.get("/assistant/stats")
+async def get_assistant_stats():
+    """Queue depth, wait times and executor load of the assistant pipeline"""
+    return {
+        "queue": inference_engine.stats(),
+        "executors": [intent_executor.stats(), ner_executor.stats()],
+        "cache": inference_cache.stats(),
+        "models": model_registry.status(),
+        "rollout": model_rollout.status(),
+    }
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def get_model_versions():
+    """Registered intent model versions and aliases, the serving version and any rollout"""
+    return {"registry": intent_registry.status(), **model_rollout.status()}
+
+@app.post("/admin/models/rollout", status_code=202, dependencies=[Depends(require_admin)])
+async def start_model_rollout(request: RolloutRequest):
+    """Load, warm up, shadow-score and swap in an intent model version, in the background.
+
+    Only this worker rolls it out; see INTENT_MODEL_POLL_S for all of them.
+    """
     try:
-        navigation = None
-        # Get intent prediction
-        input_features = prepare_sentence(message)
-        probs = intent_model.predict(input_features)
-        predicted_y = probs.argmax(axis=-1)
-        intent = label_encoder.classes_[predicted_y][0]
-        
-        # Get entity recognition
-        doc = nlp_ner(message)
-        entities = [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
+        model_rollout.start(
+            request.version,
+            shadow_sample=request.shadow_sample,
+            shadow_seconds=request.shadow_seconds,
+            min_agreement=request.min_agreement,
+            auto_promote=request.auto_promote,
+        )
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RolloutConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_rollout.status()
+
+@app.post("/admin/models/promote", dependencies=[Depends(require_admin)])
+async def promote_model():
+    """Swap the loaded candidate in now, without waiting for the rest of its shadow period"""
+    try:
+        model_rollout.promote()
+    except RolloutConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_rollout.status()
+
+@app.delete("/admin/models/rollout", dependencies=[Depends(require_admin)])
+async def cancel_model_rollout():
+    """Drop the candidate and keep serving the current model"""
+    try:
+        await model_rollout.cancel()
+    except RolloutConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_rollout.status()
+
+# Gauges and counters the components already keep, read at scrape time
+def cache_stats():
+    return {
+        "query": query_cache.stats(),
+        "assistant_messages": inference_cache.messages.stats(),
+        "assistant_intents": inference_cache.intents.stats(),
+    }
+
+def per_cache(field: str):
+    return lambda: {(name,): stats[field] for name, stats in cache_stats().items()}
+
+def per_executor(field: str):
+    return lambda: {(e.name,): getattr(e, field) for e in (intent_executor, ner_executor)}
+
+registry.collected("cache_hits_total", "Cache hits", per_cache("hits"), ("cache",), kind="counter")
+registry.collected("cache_misses_total", "Cache misses", per_cache("misses"), ("cache",), kind="counter")
+registry.collected("cache_hit_ratio", "Cache hits / lookups since start", per_cache("hit_ratio"), ("cache",))
+registry.collected("cache_evictions_total", "Cache evictions", per_cache("evictions"), ("cache",), kind="counter")
+registry.collected("assistant_queue_pending", "Assistant messages waiting for a result",
+                   lambda: inference_engine.pending)
+registry.collected("assistant_rejected_total", "Assistant messages rejected by back-pressure",
+                   lambda: inference_engine.rejected, kind="counter")
+registry.collected("assistant_batches_total", "Assistant model batches run",
+                   lambda: inference_engine.batch_count, kind="counter")
+registry.collected("assistant_queue_wait_seconds_total", "Total time messages spent queued before their batch",
+                   lambda: inference_engine.total_wait, kind="counter")
+registry.collected("executor_in_flight", "Model calls running or queued per executor",
+                   per_executor("in_flight"), ("executor",))
+registry.collected("executor_busy_seconds_total", "Time spent in model calls per executor",
+                   per_executor("busy_seconds"), ("executor",), kind="counter")
+registry.collected("assistant_models_ready", "1 once the assistant models are loaded and warmed up",
+                   lambda: int(model_registry.ready))
+registry.collected("catalog_products", "Products in the catalog", lambda: len(catalog))
+registry.collected("intent_model_version", "Registry version of the serving intent model (0 when loaded from a path)",
+                   lambda: model_rollout.version["version"] if model_rollout.version else 0)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text-format metrics"""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+def submit_message(message: str, on_partial: Optional[PartialCallback] = None) -> "asyncio.Future[InferenceResult]":
+    """Intent and entities of a message, from the cache or queued for the batched models.
+
+    Raises QueueFull right away when the queue is full.
+    """
+    loop = asyncio.get_running_loop()
+    result = inference_cache.get_message(message)
+    if result is not None:
+        future = loop.create_future()
+        future.set_result(result)
+        return future
+    generation = inference_cache.generation
+    future = inference_engine.submit(message, on_partial)
+    future.add_done_callback(
+        lambda f: f.cancelled() or f.exception() or inference_cache.put_message(message, f.result(), generation))
+    return future
+
+def assistant_busy() -> HTTPException:
+    # Shed load quickly instead of letting latency grow without bound
+    ERRORS.inc("queue_full")
+    return HTTPException(
+        status_code=503,
+        detail="The assistant is busy. Please try again shortly.",
+        headers={"Retry-After": str(config.ASSISTANT_RETRY_AFTER)},
+    )
+
+ASSISTANT_UNAVAILABLE = "The assistant is unavailable right now."
+ASSISTANT_ERROR = "Sorry, I encountered an error processing your request. Please try again."
+
+async def assistant_reply(intent: str, entities: List[Dict[str, str]]) -> AIAssistantResponse:
+    """Act on a classified message (cart changes, lookups) and phrase the reply"""
+    navigation = None
+    # Intents without a handler below
+    response = "Sorry, I didn't understand that. You can ask me to search for products, add or remove cart items, or view your cart."
+
+    # Generate response based on intent and entities
+    if intent == "addToCart":
+        # Filter entities to get only products and stores
+        product_entities = [e for e in entities if e["label"] == "product"]
+        store_entities = [e for e in entities if e["label"] == "store"]
         
-        # Generate response based on intent and entities
-        if intent == "addToCart":
-            # Filter entities to get only products and stores
-            product_entities = [e for e in entities if e["label"] == "product"]
-            store_entities = [e for e in entities if e["label"] == "store"]
+        if product_entities and store_entities:
+            # Get the first product and store found in the message
+            # [0] gets the first item in the list, ["text"] gets the actual text content
+            product_name = product_entities[0]["text"]
+            store = store_entities[0]["text"]
             
-            if product_entities and store_entities:
-                # Get the first product and store found in the message
-                # [0] gets the first item in the list, ["text"] gets the actual text content
-                product_name = product_entities[0]["text"]
-                store = store_entities[0]["text"]
+            try:
+                # First check if the store has this product
+                product = await get_product_with_Ai_Assitant(product_name, store)
+                
+                # If product exists, create cart item and add to cart
+                cart_item = CartItem(
+                    id=product["id"],
+                    product=product["product"],
+                    price=product["price"],
+                    quantity=1,  # Default quantity
+                    image=product["image"],
+                    store=product["store"]
+                )
                 
-                try:
-                    # First check if product exists
-                    product = await get_product_with_Ai_Assitant(product_name)
-                    
-                    # If product exists, create cart item and add to cart
-                    cart_item = CartItem(
-                        id=product["id"],
-                        product=product["product"],
-                        price=product["price"],
-                        quantity=1,  # Default quantity
-                        image=product["image"],
-                        store=product["store"]
-                    )
-                    
-                    # Add to cart
-                    await add_to_cart("default_user", cart_item)
-                    response = f"I've added {product_name} from {store} to your cart. Would you like to view your cart or continue shopping?"
-                except HTTPException as e:
-                    if e.status_code == 404:
-                        response = f"I couldn't find {product_name} in our catalog. Would you like to search for similar products?"
-                    else:
-                        print(f"HTTPException during addToCart: {e}")  # Log the exception
-                        response = "Sorry, I encountered an error while adding the item to your cart. Please try again."
-                except Exception as e:
-                    print(f"Unexpected exception during addToCart: {e}")  # Log unexpected exceptions
+                # Add to cart, off the event loop like the cart endpoints
+                await asyncio.get_running_loop().run_in_executor(
+                    None, cart_store.add, "default_user", cart_item.dict())
+                response = f"I've added {product_name} from {store} to your cart. Would you like to view your cart or continue shopping?"
+            except HTTPException as e:
+                if e.status_code == 404:
+                    response = f"I couldn't find {product_name} from {store} in our catalog. Would you like to search for similar products?"
+                else:
+                    ERRORS.inc("add_to_cart")
+                    logger.warning("HTTPException during addToCart: %s", e)
                     response = "Sorry, I encountered an error while adding the item to your cart. Please try again."
-            else:
-                response = "Could you please specify the product and store you'd like to add? For example: 'Add Garri from Mama Nkechi's Groceries'"
-
-        elif intent == "removeFromCart":
-            product_entities = [e for e in entities if e["label"] == "product"]
-            if product_entities:
-                product_name = product_entities[0]["text"]
-                try:
-                    product = await get_product_with_Ai_Assitant(product_name)
-                    await remove_from_cart("default_user", product["id"])
-                    response = f"I've removed {product_name} from your cart. Would you like to view your updated cart?"
-                except HTTPException as e:
-                    if e.status_code == 404:
-                        response = f"I couldn't find {product_name} in your cart. Would you like to view your cart to see what's there?"
-                    else:
-                        response = "Sorry, I encountered an error while removing the item. Please try again."
-            else:
-                response = "Could you please specify which product you'd like to remove from your cart?"
+            except Exception:
+                ERRORS.inc("add_to_cart")
+                logger.exception("Unexpected exception during addToCart")
+                response = "Sorry, I encountered an error while adding the item to your cart. Please try again."
+        else:
+            response = "Could you please specify the product and store you'd like to add? For example: 'Add Garri from Lagos Premium Garri'"
 
-        elif intent == "searchProduct":
-            # Extract product entity
-            product = next((e["text"] for e in entities if e["label"] == "product"), None)
-            
-            if product:
-                # Search for the product
-                try:
-                    search_results = await get_product_with_Ai_Assitant(product)
-                    return AIAssistantResponse(
-                        message=f"I have found products that are {product}.",
-                        intent=intent,
-                        entities=entities,
-                        navigation={
-                            "path": f"/products?search={product}",
-                            "action": "navigate"
-                        }
-                    )
-                except HTTPException:
-                    return AIAssistantResponse(
-                        message=f"I couldn't find {product}. Please try a different search term.",
-                        intent=intent,
-                        entities=entities
-                    )
-            else:
+    elif intent == "removeFromCart":
+        product_entities = [e for e in entities if e["label"] == "product"]
+        store_entities = [e for e in entities if e["label"] == "store"]
+        if product_entities:
+            product_name = product_entities[0]["text"]
+            store = store_entities[0]["text"] if store_entities else None
+            try:
+                product = await get_product_with_Ai_Assitant(product_name, store)
+                await asyncio.get_running_loop().run_in_executor(
+                    None, cart_store.remove, "default_user", product["id"])
+                response = f"I've removed {product_name} from your cart. Would you like to view your updated cart?"
+            except CartNotFound:
+                response = f"I couldn't find {product_name} in your cart. Would you like to view your cart to see what's there?"
+            except HTTPException as e:
+                if e.status_code == 404:
+                    response = f"I couldn't find {product_name} in your cart. Would you like to view your cart to see what's there?"
+                else:
+                    response = "Sorry, I encountered an error while removing the item. Please try again."
+        else:
+            response = "Could you please specify which product you'd like to remove from your cart?"
+
+    elif intent == "searchProduct":
+        # Extract product entity
+        product = next((e["text"] for e in entities if e["label"] == "product"), None)
+        
+        if product:
+            # Search for the product
+            try:
+                search_results = await get_product_with_Ai_Assitant(product)
+                return AIAssistantResponse(
+                    message=f"I have found products that are {product}.",
+                    intent=intent,
+                    entities=entities,
+                    navigation={
+                        "path": f"/products?search={product}",
+                        "action": "navigate"
+                    }
+                )
+            except HTTPException:
                 return AIAssistantResponse(
-                    message="I couldn't understand what product you're looking for. Please try again.",
+                    message=f"I couldn't find {product}. Please try a different search term.",
                     intent=intent,
                     entities=entities
                 )
+        else:
+            return AIAssistantResponse(
+                message="I couldn't understand what product you're looking for. Please try again.",
+                intent=intent,
+                entities=entities
+            )
 
-        elif intent == "viewCart":
-            cart_items = await get_cart("default_user")
-            if cart_items:
-                response = f"Here is your cart, Would you like to remove any items or proceed to checkout?"
-                # Add navigation to cart page
-                navigation = {"path": "/cart", "action": "navigate"}
-            else:
-                response = "Your cart is empty. Would you like to browse some products?"
-        elif intent == "greeting":
-            response = "Hello! I'm your NaijaMarket shopping assistant. How can I help you today? You can ask me to:\n- Add items to your cart\n- Search for products\n- View your cart\n- Remove items from cart"
-
-        return AIAssistantResponse(
-            message=response,
-            intent=intent,
-            entities=entities,
-            navigation=navigation
-        )
+    elif intent == "viewCart":
+        if await asyncio.get_running_loop().run_in_executor(None, cart_store.get, "default_user"):
+            response = f"Here is your cart, Would you like to remove any items or proceed to checkout?"
+            # Add navigation to cart page
+            navigation = {"path": "/cart", "action": "navigate"}
+        else:
+            response = "Your cart is empty. Would you like to browse some products?"
+    elif intent == "greeting":
+        response = "Hello! I'm your NaijaMarket shopping assistant. How can I help you today? You can ask me to:\n- Add items to your cart\n- Search for products\n- View your cart\n- Remove items from cart"
+
+    return AIAssistantResponse(
+        message=response,
+        intent=intent,
+        entities=entities,
+        navigation=navigation
+    )
+
+@app.post("/personal_assistant", response_model=AIAssistantResponse)
+async def process_ai_request(request: AIAssistantRequest):
+    message = request.message.strip()
+    
+    try:
+        # Get intent prediction and entity recognition (batched with other requests)
+        future = submit_message(message)
+        # Queue wait plus the batched intent and NER stages
+        with stage("assistant_inference"):
+            intent, entities = await future
+        return await assistant_reply(intent, entities)
         
-    except Exception as e:
-        print(f"Error processing request: {e}")
-        return AIAssistantResponse(
-            message="Sorry, I encountered an error processing your request. Please try again."
-        )
+    except ModelsUnavailable:
+        ERRORS.inc("models_unavailable")
+        raise HTTPException(status_code=503, detail=ASSISTANT_UNAVAILABLE)
+    except QueueFull:
+        raise assistant_busy()
+    except Exception:
+        ERRORS.inc("assistant")
+        logger.exception("Error processing assistant request")
+        return AIAssistantResponse(message=ASSISTANT_ERROR)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+def encode_event(event: str, data: Any, sse: bool) -> bytes:
+    if sse:
+        return b"event: " + event.encode() + b"\ndata: " + fast_json.dumps(data) + b"\n\n"
+    return fast_json.dumps({"event": event, "data": data}) + b"\n"
+
+async def assistant_events(future: asyncio.Future, events: asyncio.Queue, sse: bool):
+    """Stream intent, entities and the final reply as each becomes known"""
+    sent = set()
+    # Partial results arrive on `events`; None marks the end of inference
+    future.add_done_callback(lambda f: events.put_nowait(None))
+    try:
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            event, data = item
+            if event not in sent:
+                sent.add(event)
+                yield encode_event(event, data, sse)
+        try:
+            intent, entities = future.result()
+            # Cached results, or stages that reported nothing early
+            if "intent" not in sent:
+                yield encode_event("intent", intent, sse)
+            if "entities" not in sent:
+                yield encode_event("entities", entities, sse)
+            reply = await assistant_reply(intent, entities)
+        except ModelsUnavailable:
+            ERRORS.inc("models_unavailable")
+            yield encode_event("error", {"status": 503, "detail": ASSISTANT_UNAVAILABLE}, sse)
+            return
+        except Exception:
+            ERRORS.inc("assistant")
+            logger.exception("Error processing assistant request")
+            reply = AIAssistantResponse(message=ASSISTANT_ERROR)
+        yield encode_event("response", reply.dict(), sse)
+    finally:
+        # The client went away before the models ran: drop the message
+        future.cancel()
+
+@app.post("/personal_assistant/stream")
+async def stream_ai_request(request: AIAssistantRequest, http_request: Request):
+    """Streamed /personal_assistant: "intent" and "entities" events as soon as each
+    model finishes, then the "response" event with the full reply.
+
+    Server-sent events when the client accepts text/event-stream, NDJSON
+    ({"event": ..., "data": ...} lines) otherwise.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    try:
+        future = submit_message(request.message.strip(), lambda event, data: events.put_nowait((event, data)))
+    except QueueFull:
+        raise assistant_busy()
+    sse = SSE_MEDIA_TYPE in http_request.headers.get("accept", "")
+    return StreamingResponse(
+        assistant_events(future, events, sse),
+        media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+        # Keep proxies from buffering the early events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
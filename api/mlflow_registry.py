@@ -0,0 +1,132 @@
+import glob
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+_SCALAR = re.compile(r"^\s*([A-Za-z_][\w.]*):\s*(.*?)\s*$")
+
+
+class RegistryError(Exception):
+    """Raised when a model version can't be found in the registry"""
+
+
+def read_scalars(path: str) -> Dict[str, str]:
+    """`key: value` lines of an MLflow YAML file (meta.yaml, MLmodel), at any nesting.
+
+    MLflow writes these files as plain block YAML, so the scalars are all
+    serving needs, without a YAML dependency. Later keys win; quotes are
+    stripped and empty values (mapping headers) are skipped.
+    """
+    values = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = _SCALAR.match(line)
+            if match and match.group(2) and not line.lstrip().startswith("-"):
+                values[match.group(1)] = match.group(2).strip("'\"")
+    return values
+
+
+class LocalModelRegistry:
+    """Read-only view of one model in MLflow's file-based registry.
+
+    Versions live in `<tracking_dir>/models/<name>/version-<n>/meta.yaml`
+    and aliases in `.../aliases/<alias>` files holding a version number.
+    Artifacts logged through an MLflow server (`mlflow-artifacts:/` sources)
+    are read from `artifacts_dir`. Everything is re-read on each call, so
+    versions and aliases registered after startup are seen.
+    """
+
+    def __init__(self, tracking_dir: str, artifacts_dir: str, name: str):
+        self.tracking_dir = tracking_dir
+        self.artifacts_dir = artifacts_dir
+        self.name = name
+        self.path = os.path.join(tracking_dir, "models", name)
+
+    def versions(self) -> List[int]:
+        versions = []
+        for entry in glob.glob(os.path.join(self.path, "version-*")):
+            suffix = os.path.basename(entry)[len("version-"):]
+            if suffix.isdigit():
+                versions.append(int(suffix))
+        return sorted(versions)
+
+    def aliases(self) -> Dict[str, int]:
+        aliases = {}
+        for entry in glob.glob(os.path.join(self.path, "aliases", "*")):
+            with open(entry) as f:
+                version = f.read().strip()
+            if version.isdigit():
+                aliases[os.path.basename(entry)] = int(version)
+        return aliases
+
+    def resolve(self, ref: str) -> dict:
+        """The version `ref` names: a number, "latest", or an alias ("champion" or "@champion")"""
+        ref = ref.strip()
+        if ref.isdigit():
+            version = int(ref)
+        elif ref == "latest":
+            versions = self.versions()
+            if not versions:
+                raise RegistryError(f"Model {self.name!r} has no versions")
+            version = versions[-1]
+        else:
+            version = self.aliases().get(ref.lstrip("@"))
+            if version is None:
+                raise RegistryError(f"Model {self.name!r} has no alias {ref.lstrip('@')!r}")
+        meta_path = os.path.join(self.path, f"version-{version}", "meta.yaml")
+        if not os.path.exists(meta_path):
+            raise RegistryError(f"Model {self.name!r} has no version {version}")
+        meta = read_scalars(meta_path)
+        return {
+            "name": self.name,
+            "version": version,
+            "run_id": meta.get("run_id"),
+            "source": meta.get("source"),
+            "path": self._artifact_path(meta.get("source") or "", meta.get("run_id")),
+            "aliases": sorted(alias for alias, v in self.aliases().items() if v == version),
+        }
+
+    def _artifact_path(self, source: str, run_id: Optional[str]) -> str:
+        if source.startswith("mlflow-artifacts:"):
+            path = os.path.join(self.artifacts_dir, source[len("mlflow-artifacts:"):].lstrip("/"))
+        elif source.startswith("file://"):
+            path = source[len("file://"):]
+        elif source.startswith("runs:/"):
+            run_id, _, artifact = source[len("runs:/"):].partition("/")
+            path = os.path.join(self._run_artifacts(run_id) or "", artifact)
+        else:
+            path = source
+        if os.path.exists(path) or not run_id:
+            return path
+        # The registered source sometimes names another artifact path than
+        # the one the run logged the model under; a run that logged a single
+        # model has no ambiguity
+        logged = self._logged_models(run_id)
+        artifacts = self._run_artifacts(run_id)
+        if len(logged) == 1 and artifacts:
+            return os.path.join(artifacts, logged[0])
+        return path
+
+    def _run_dirs(self, run_id: str) -> List[str]:
+        return glob.glob(os.path.join(self.tracking_dir, "*", run_id))
+
+    def _run_artifacts(self, run_id: str) -> Optional[str]:
+        for run_dir in self._run_dirs(run_id):
+            uri = read_scalars(os.path.join(run_dir, "meta.yaml")).get("artifact_uri", "")
+            if uri.startswith("mlflow-artifacts:"):
+                return os.path.join(self.artifacts_dir, uri[len("mlflow-artifacts:"):].lstrip("/"))
+            return uri[len("file://"):] if uri.startswith("file://") else uri
+        return None
+
+    def _logged_models(self, run_id: str) -> List[str]:
+        for run_dir in self._run_dirs(run_id):
+            try:
+                with open(os.path.join(run_dir, "tags", "mlflow.log-model.history")) as f:
+                    return list(dict.fromkeys(entry["artifact_path"] for entry in json.load(f)))
+            except (OSError, ValueError, KeyError):
+                return []
+        return []
+
+    def status(self) -> dict:
+        return {"name": self.name, "versions": self.versions(), "aliases": self.aliases()}
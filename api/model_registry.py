@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from instrumentation import logger
+
+
+class ModelsUnavailable(Exception):
+    """Raised when the models failed to load"""
+
+
+class ModelRegistry:
+    """Owns the lifecycle of the assistant models.
+
+    Loading runs in a worker thread so the API answers catalog requests
+    while TensorFlow and spaCy start up. `load` runs `loader` and then the
+    async `warmup` hook; callers needing the models `await get()`, which
+    starts loading on first use if nothing has started it yet. `on_loaded`
+    callbacks run after every successful (re)load or `swap`.
+
+    After a failed load, `get` fails fast with the cached error until
+    `retry_seconds` have passed, doubling with each consecutive failure up
+    to `max_retry_seconds`, so requests don't each wait for a reload.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[Any], Awaitable]] = None,
+        retry_seconds: float = 5.0,
+        max_retry_seconds: float = 300.0,
+    ):
+        self.loader = loader
+        self.warmup = warmup
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.models: Any = None
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.on_loaded: List[Callable[[Any], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start_loading(self) -> asyncio.Task:
+        retry = self.state == "failed" and time.monotonic() >= self._retry_at
+        if self._task is None or (self._task.done() and retry):
+            self._task = asyncio.get_running_loop().create_task(self._load())
+        return self._task
+
+    async def load(self):
+        await self.start_loading()
+
+    async def get(self) -> Any:
+        if self.state != "ready":
+            await asyncio.shield(self.start_loading())
+        if self.state != "ready":
+            raise ModelsUnavailable(self.error or "Models are not loaded")
+        return self.models
+
+    async def _load(self):
+        loop = asyncio.get_running_loop()
+        self.state = "loading"
+        self.error = None
+        try:
+            start = time.perf_counter()
+            models = await loop.run_in_executor(None, self.loader)
+            self.load_seconds = time.perf_counter() - start
+            if self.warmup is not None:
+                self.state = "warming_up"
+                start = time.perf_counter()
+                await self.warmup(models)
+                self.warmup_seconds = time.perf_counter() - start
+        except Exception as e:
+            self._failures += 1
+            delay = min(self.retry_seconds * 2 ** (self._failures - 1), self.max_retry_seconds)
+            logger.exception("Loading the models failed; retrying in %g s at the earliest", delay)
+            self._retry_at = time.monotonic() + delay
+            self.state = "failed"
+            self.error = str(e)
+            return
+        self._failures = 0
+        self.models = models
+        self.state = "ready"
+        for callback in self.on_loaded:
+            callback(models)
+
+    def swap(self, models: Any):
+        """Serve `models` from now on, e.g. a new intent model version.
+
+        Callers that already got the old models finish with them; only new
+        `get` calls see the swap. `on_loaded` callbacks run as after a load.
+        """
+        self.models = models
+        self.state = "ready"
+        self.error = None
+        for callback in self.on_loaded:
+            callback(models)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "retry_in_seconds": round(max(self._retry_at - time.monotonic(), 0.0), 1) if self.state == "failed" else None,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+        }
@@ -0,0 +1,308 @@
+import asyncio
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from executor import ModelExecutor
+from instrumentation import logger
+from mlflow_registry import LocalModelRegistry
+from model_registry import ModelRegistry
+
+
+class RolloutConflict(Exception):
+    """Raised when a rollout action doesn't fit the current rollout state"""
+
+
+def compare_intents(serving, candidate, messages: List[str]) -> Tuple[List[str], List[str], float, float]:
+    """Intents of both models for the same batch, with each model's time in milliseconds"""
+    start = time.perf_counter()
+    served = serving.predict_intents(serving.prepare_sentences(messages))
+    middle = time.perf_counter()
+    proposed = candidate.predict_intents(candidate.prepare_sentences(messages))
+    end = time.perf_counter()
+    return served, proposed, (middle - start) * 1000, (end - middle) * 1000
+
+
+def smoke_test(serving, candidate, messages: Sequence[str], min_agreement: float):
+    """Raise ValueError unless the candidate outputs one probability row per
+    message over its classes and agrees with the serving model on at least
+    `min_agreement` of the messages"""
+    messages = list(messages)
+    features = candidate.prepare_sentences(messages)
+    probs = np.asarray(candidate.intent_model.predict(features, batch_size=len(features), verbose=0))
+    expected = (len(messages), len(candidate.classes))
+    if probs.shape != expected:
+        raise ValueError(f"Smoke test outputs have shape {probs.shape}, expected {expected}")
+    if not np.isfinite(probs).all() or not np.allclose(probs.sum(axis=-1), 1.0, atol=1e-3):
+        raise ValueError("Smoke test outputs aren't probabilities")
+    served = serving.predict_intents(serving.prepare_sentences(messages))
+    proposed = candidate.classes[probs.argmax(axis=-1)]
+    agreement = float(np.mean([a == b for a, b in zip(served, proposed)]))
+    if agreement < min_agreement:
+        raise ValueError(f"Smoke test agreement {agreement:.3f} is below {min_agreement}")
+
+
+class ShadowStats:
+    """Agreement and latency of a candidate intent model against the serving one, on the same batches"""
+
+    # Latency samples kept per model for the percentiles
+    MAX_SAMPLES = 1000
+
+    def __init__(self):
+        self.batches = 0
+        self.messages = 0
+        self.agreed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.serving_ms: deque = deque(maxlen=self.MAX_SAMPLES)
+        self.candidate_ms: deque = deque(maxlen=self.MAX_SAMPLES)
+        # (serving intent, candidate intent) -> messages they disagreed on
+        self.disagreements: Counter = Counter()
+
+    def record(self, served: List[str], proposed: List[str], serving_ms: float, candidate_ms: float):
+        self.batches += 1
+        self.messages += len(served)
+        for a, b in zip(served, proposed):
+            if a == b:
+                self.agreed += 1
+            else:
+                self.disagreements[(str(a), str(b))] += 1
+        self.serving_ms.append(serving_ms)
+        self.candidate_ms.append(candidate_ms)
+
+    @property
+    def agreement(self) -> Optional[float]:
+        return self.agreed / self.messages if self.messages else None
+
+    def summary(self) -> Dict[str, Any]:
+        def latency(samples: deque) -> Dict[str, float]:
+            if not samples:
+                return {}
+            p50, p99 = np.percentile(np.fromiter(samples, dtype=float), [50, 99])
+            return {"p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "agreement": round(self.agreement, 4) if self.agreement is not None else None,
+            "skipped_batches": self.skipped,
+            "errors": self.errors,
+            "serving_latency": latency(self.serving_ms),
+            "candidate_latency": latency(self.candidate_ms),
+            "top_disagreements": [
+                {"serving": a, "candidate": b, "count": n} for (a, b), n in self.disagreements.most_common(10)
+            ],
+        }
+
+
+class ModelRollout:
+    """Rolls intent model versions from the local MLflow registry into the running API.
+
+    `start(ref)` resolves a version and, in the background, loads it next
+    to the serving models with `load_candidate(serving, path)`, checks its
+    predictions on `smoke_messages` (see smoke_test), warms it up,
+    shadow-scores a `shadow_sample` share of live batches against the
+    serving model for `shadow_seconds`, then swaps it in through
+    ModelRegistry.swap. Shadow batches run on their own executor after the
+    live results are served, and are skipped while one is still running.
+    A candidate agreeing with the serving model on less than
+    `min_agreement` of the shadowed messages is rejected; without
+    `auto_promote` it waits for `promote()`. Batches already running finish
+    on the models they took, so no request is dropped or blocked.
+
+    `watch(ref, interval)` polls the registry and rolls out whatever
+    version `ref` ("latest" or an alias) names whenever it changes. With
+    several uvicorn workers, that is how every worker follows a release.
+    """
+
+    ACTIVE = ("loading", "checking", "warming_up", "shadowing")
+
+    def __init__(
+        self,
+        registry: LocalModelRegistry,
+        models: ModelRegistry,
+        load_candidate: Callable[[Any, str], Any],
+        warmup: Callable[[Any], Awaitable],
+        shadow_sample: float = 0.1,
+        shadow_seconds: float = 60.0,
+        min_agreement: float = 0.9,
+        smoke_messages: Sequence[str] = (),
+    ):
+        self.registry = registry
+        self.models = models
+        self.load_candidate = load_candidate
+        self.warmup = warmup
+        self.smoke_messages = list(smoke_messages)
+        self.defaults = {"shadow_sample": shadow_sample, "shadow_seconds": shadow_seconds,
+                         "min_agreement": min_agreement}
+        # Registry version being served; None for models loaded from a plain path
+        self.version: Optional[dict] = None
+        self.candidate_version: Optional[dict] = None
+        self.candidate: Any = None
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.shadow: Optional[ShadowStats] = None
+        self._settings = dict(self.defaults)
+        self._task: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+        # Versions that failed, were rejected or cancelled; a watch doesn't retry them
+        self._rejected: Set[int] = set()
+        self._executor = ModelExecutor("shadow")
+
+    def start(
+        self,
+        ref: str,
+        shadow_sample: Optional[float] = None,
+        shadow_seconds: Optional[float] = None,
+        min_agreement: Optional[float] = None,
+        auto_promote: bool = True,
+    ) -> dict:
+        """Begin rolling out the version `ref` names; returns that version.
+
+        Raises RegistryError for unknown versions and RolloutConflict while
+        another rollout is in progress.
+        """
+        if self.state in self.ACTIVE:
+            raise RolloutConflict(f"Version {self.candidate_version['version']} is already {self.state}")
+        version = self.registry.resolve(ref)
+        overrides = {"shadow_sample": shadow_sample, "shadow_seconds": shadow_seconds, "min_agreement": min_agreement}
+        self._settings = {k: v if overrides[k] is None else overrides[k] for k, v in self.defaults.items()}
+        self.candidate_version = version
+        self.candidate = None
+        self.error = None
+        self.shadow = None
+        self.state = "loading"
+        self._task = asyncio.get_running_loop().create_task(self._run(version, auto_promote))
+        return version
+
+    async def _run(self, version: dict, auto_promote: bool):
+        loop = asyncio.get_running_loop()
+        settings = self._settings
+        try:
+            serving = await self.models.get()
+            start = time.perf_counter()
+            candidate = await loop.run_in_executor(None, self.load_candidate, serving, version["path"])
+            self.load_seconds = time.perf_counter() - start
+            if self.smoke_messages:
+                self.state = "checking"
+                await loop.run_in_executor(
+                    None, smoke_test, serving, candidate, self.smoke_messages, settings["min_agreement"]
+                )
+            self.state = "warming_up"
+            await self.warmup(candidate)
+        except Exception as e:
+            logger.warning("Intent model version %s failed to load or its smoke test: %s", version["version"], e)
+            self.state = "failed"
+            self.error = str(e)
+            self._rejected.add(version["version"])
+            return
+        self.candidate = candidate
+
+        if settings["shadow_sample"] > 0 and settings["shadow_seconds"] > 0:
+            self.shadow = ShadowStats()
+            self.state = "shadowing"
+            await asyncio.sleep(settings["shadow_seconds"])
+            agreement = self.shadow.agreement
+            if agreement is not None and agreement < settings["min_agreement"]:
+                logger.warning("Intent model version %s rejected: %.3f agreement", version["version"], agreement)
+                self.state = "rejected"
+                self.error = f"Agreement {agreement:.3f} is below {settings['min_agreement']}"
+                self.candidate = None
+                self._rejected.add(version["version"])
+                return
+        if auto_promote:
+            self.promote()
+        else:
+            self.state = "ready"
+
+    def promote(self) -> dict:
+        """Swap the loaded candidate in now, ending its shadow period early"""
+        if self.candidate is None:
+            raise RolloutConflict("No candidate model is loaded")
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self.models.swap(self.candidate)
+        self.version = self.candidate_version
+        self.candidate = None
+        self.state = "promoted"
+        logger.info("Serving intent model %s version %s", self.version["name"], self.version["version"])
+        return self.version
+
+    async def cancel(self):
+        """Drop the candidate; the serving model is left as is"""
+        if self.state not in self.ACTIVE and self.candidate is None:
+            raise RolloutConflict("No rollout in progress")
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.candidate = None
+        self.state = "cancelled"
+        # A watch would otherwise start the same version again on its next poll
+        if self.candidate_version is not None:
+            self._rejected.add(self.candidate_version["version"])
+
+    def observe(self, messages: List[str]):
+        """Shadow hook, called with each live batch once its intents are served"""
+        if self.state != "shadowing" or random.random() >= self._settings["shadow_sample"]:
+            return
+        if self._executor.in_flight:
+            self.shadow.skipped += 1
+            return
+        asyncio.get_running_loop().create_task(self._shadow(self.models.models, self.candidate, self.shadow, messages))
+
+    async def _shadow(self, serving, candidate, stats: ShadowStats, messages: List[str]):
+        try:
+            stats.record(*await self._executor.run(compare_intents, serving, candidate, messages))
+        except Exception as e:
+            logger.warning("Shadow scoring failed: %s", e)
+            stats.errors += 1
+
+    async def poll(self, ref: str):
+        """Start a rollout if `ref` now names another version than the serving one"""
+        if self.state in self.ACTIVE or self.state == "ready":
+            return
+        version = self.registry.resolve(ref)
+        if self.version is not None and version["version"] == self.version["version"]:
+            return
+        if version["version"] not in self._rejected:
+            self.start(ref)
+
+    def watch(self, ref: str, interval: float):
+        async def loop():
+            while True:
+                try:
+                    await self.poll(ref)
+                except Exception as e:
+                    logger.warning("Checking the model registry failed: %s", e)
+                await asyncio.sleep(interval)
+
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(loop())
+
+    async def stop(self):
+        for task in (self._watcher, self._task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._executor.shutdown()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "serving": self.version,
+            "state": self.state,
+            "candidate": self.candidate_version if self.state != "idle" else None,
+            "error": self.error,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "settings": self._settings,
+            "shadow": self.shadow.summary() if self.shadow is not None else None,
+        }
@@ -0,0 +1,67 @@
+import json
+import os
+from typing import Dict, Iterable, List
+
+# NER helpers shared by the API process and the optional spaCy process pool.
+# Kept free of TensorFlow imports so pool workers start quickly.
+
+# Components entity extraction needs; trimmed mode skips everything else
+NER_COMPONENTS = ("tok2vec", "transformer", "ner")
+# Smallest share of a batch worth sending to another nlp.pipe process
+MIN_MESSAGES_PER_PROCESS = 64
+
+_nlp = None
+
+
+def _uses_static_vectors(model_path: str, config) -> bool:
+    with open(os.path.join(model_path, "meta.json")) as f:
+        if not json.load(f).get("vectors", {}).get("width"):
+            return False
+
+    def walk(section) -> bool:
+        if isinstance(section, dict):
+            return bool(section.get("include_static_vectors")) or any(walk(v) for v in section.values())
+        return False
+    return walk(config["components"])
+
+
+def load_ner(model_path: str, mode: str = "full"):
+    """Load the spaCy NER pipeline.
+
+    "full" loads everything in the model directory. "trimmed" excludes
+    components entity extraction doesn't use, and the word vectors unless
+    the NER's tok2vec was trained with them.
+    """
+    import spacy
+    if mode == "full":
+        return spacy.load(model_path)
+    if mode != "trimmed":
+        raise ValueError(f"Unknown NER mode: {mode}")
+    config = spacy.util.load_config(os.path.join(model_path, "config.cfg"))
+    exclude = [name for name in config["nlp"]["pipeline"] if name not in NER_COMPONENTS]
+    if not _uses_static_vectors(model_path, config):
+        exclude.append("vectors")
+    return spacy.load(model_path, exclude=exclude)
+
+
+def pipe_entities(nlp, messages: List[str], n_process: int = 1) -> List[List[Dict[str, str]]]:
+    """Run `nlp.pipe` over a batch, spreading large batches over `n_process` processes"""
+    n_process = max(1, min(n_process, len(messages) // MIN_MESSAGES_PER_PROCESS))
+    batch_size = max(1, -(-len(messages) // n_process))
+    return entities_from_docs(nlp.pipe(messages, batch_size=batch_size, n_process=n_process))
+
+
+def entities_from_docs(docs: Iterable) -> List[List[Dict[str, str]]]:
+    return [[{"text": ent.text, "label": ent.label_} for ent in doc.ents] for doc in docs]
+
+
+def init_worker(model_path: str, mode: str = "full"):
+    """Process pool initializer: load a private copy of the NER pipeline"""
+    global _nlp
+    _nlp = load_ner(model_path, mode) if model_path else None
+
+
+def extract_entities(messages: List[str]) -> List[List[Dict[str, str]]]:
+    if _nlp is None:
+        return [[] for _ in messages]
+    return pipe_entities(_nlp, messages)
@@ -0,0 +1,63 @@
+from typing import Optional
+
+import numpy as np
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # Clipped so large negative gate inputs don't overflow exp()
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -60.0, 60.0)))
+
+
+class NumpyIntentModel:
+    """Pure NumPy forward pass of the Embedding -> LSTM -> Dense intent classifier.
+
+    Weights come from the .npz written by export_intent_model.py. The input
+    projection of every vocabulary entry is precomputed at load time, so
+    each timestep only costs the recurrent matmul. Padding id 0 is masked
+    like Keras' `mask_zero=True`: masked steps carry the state forward, and
+    the loop stops at the longest sequence in the batch.
+    """
+
+    def __init__(self, weights: dict):
+        self.embeddings = weights["embeddings"]
+        self.kernel = weights["lstm_kernel"]
+        self.recurrent_kernel = weights["lstm_recurrent_kernel"]
+        self.bias = weights["lstm_bias"]
+        self.dense_kernel = weights["dense_kernel"]
+        self.dense_bias = weights["dense_bias"]
+        self.classes = weights["classes"]
+        self.max_seq_len = int(weights["max_seq_len"])
+        self.units = self.recurrent_kernel.shape[0]
+        # Embedding lookup followed by x @ W + b, for every token id at once
+        self._input_projection = self.embeddings @ self.kernel + self.bias
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyIntentModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def predict(self, token_ids: np.ndarray, batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        """Class probabilities for a (batch, max_seq_len) array of token ids"""
+        token_ids = np.asarray(token_ids)
+        batch = token_ids.shape[0]
+        mask = token_ids != 0
+        steps = int(mask.any(axis=0).nonzero()[0].max()) + 1 if mask.any() else 0
+        projected = self._input_projection[token_ids[:, :steps]]
+        h = np.zeros((batch, self.units), dtype=np.float32)
+        c = np.zeros((batch, self.units), dtype=np.float32)
+        n = self.units
+        for t in range(steps):
+            z = projected[:, t] + h @ self.recurrent_kernel
+            i = _sigmoid(z[:, :n])
+            f = _sigmoid(z[:, n:2 * n])
+            g = np.maximum(z[:, 2 * n:3 * n], 0.0)
+            o = _sigmoid(z[:, 3 * n:])
+            new_c = f * c + i * g
+            new_h = o * np.maximum(new_c, 0.0)
+            step_mask = mask[:, t:t + 1]
+            c = np.where(step_mask, new_c, c)
+            h = np.where(step_mask, new_h, h)
+        logits = h @ self.dense_kernel + self.dense_bias
+        logits -= logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=-1, keepdims=True)
@@ -0,0 +1,89 @@
+import base64
+import binascii
+import json
+import math
+from typing import Iterable, Iterator, List, Optional, Type
+
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Cursor positions and ids are compared against int64 columns
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _is_int(value, low: int = -_INT64_MAX - 1) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= _INT64_MAX
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    # Every field is checked here, so a tampered cursor is a 400 and not a
+    # TypeError when the page is resumed
+    if not isinstance(data, dict) or not _is_int(data.get("id")):
+        raise InvalidCursor("Malformed cursor")
+    if "index" in data and not _is_int(data["index"], 0):
+        raise InvalidCursor("Malformed cursor")
+    key = data.get("key")
+    if "key" in data and (not isinstance(key, (int, float)) or isinstance(key, bool) or not math.isfinite(key)):
+        raise InvalidCursor("Malformed cursor")
+    if data.get("sort") is not None and not isinstance(data["sort"], str):
+        raise InvalidCursor("Malformed cursor")
+    return data
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Turn a comma separated `fields=` value into a list of known field names"""
+    if not fields:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Must be among: {', '.join(allowed)}")
+    return names
+
+
+def iter_project(rows: Iterable[dict], fields: List[str], model: Type[BaseModel]) -> Iterator[dict]:
+    """The `fields` of each row, coerced like `model` coerces them (an int
+    price comes out as a float), so projected rows match full ones"""
+    model_fields = [model.__fields__[f] for f in fields]
+    for row in rows:
+        projected = {}
+        for field in model_fields:
+            value = row.get(field.name)
+            if value is not None:
+                coerced, error = field.validate(value, projected, loc=field.name)
+                if error is None:
+                    value = coerced
+            projected[field.name] = value
+        yield projected
+
+
+def project(rows: Iterable[dict], fields: List[str], model: Type[BaseModel]) -> List[dict]:
+    return list(iter_project(rows, fields, model))
+
+
+def ndjson_lines(encoded_rows: Iterable[bytes], chunk_size: int = 500) -> Iterator[bytes]:
+    """Join JSON-encoded rows into newline-delimited chunks"""
+    chunk = []
+    for row in encoded_rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
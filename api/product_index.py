@@ -0,0 +1,56 @@
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """Case- and whitespace-insensitive key for product and store names"""
+    return " ".join(name.lower().split()) if name else ""
+
+
+class ProductLookup:
+    """Hash indexes for resolving products by name, or by name and store.
+
+    Subscribed to the catalog so that every upsert and delete keeps the
+    indexes consistent; all lookups are constant time.
+    """
+
+    def __init__(self):
+        # name -> {id: product}, in insertion order so the first listing wins
+        self._by_name: Dict[str, Dict[int, dict]] = {}
+        self._by_name_store: Dict[Tuple[str, str], dict] = {}
+
+    def add(self, product: dict, normalize=normalize_name):
+        name = normalize(product.get("product"))
+        self._by_name.setdefault(name, {})[product["id"]] = product
+        store = normalize(product.get("store"))
+        if store:
+            self._by_name_store.setdefault((name, store), product)
+
+    def add_many(self, products: Iterable[dict]):
+        # Store names (and often product names) repeat across rows
+        normalize = lru_cache(maxsize=65536)(normalize_name)
+        for product in products:
+            self.add(product, normalize)
+
+    def remove(self, product: dict):
+        name = normalize_name(product.get("product"))
+        listings = self._by_name.get(name)
+        if listings is not None:
+            listings.pop(product["id"], None)
+            if not listings:
+                del self._by_name[name]
+        key = (name, normalize_name(product.get("store")))
+        if self._by_name_store.get(key) is product:
+            del self._by_name_store[key]
+            # Another listing may share the same name and store
+            for other in (listings or {}).values():
+                if normalize_name(other.get("store")) == key[1]:
+                    self._by_name_store[key] = other
+                    break
+
+    def by_name(self, name: str) -> Optional[dict]:
+        listings = self._by_name.get(normalize_name(name))
+        return next(iter(listings.values())) if listings else None
+
+    def by_name_and_store(self, name: str, store: str) -> Optional[dict]:
+        return self._by_name_store.get((normalize_name(name), normalize_name(store)))
@@ -0,0 +1,100 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import numpy as np
+
+
+class QueryCache:
+    """LRU + TTL cache of catalog query results (ordered product ids).
+
+    Every entry carries a tag: a category name for listings filtered to one
+    category, or None for anything that depends on the whole catalog. The
+    cache subscribes to the catalog and bumps a version per category on each
+    product change, so only entries whose tag was touched go stale; untagged
+    entries go stale on any change. Stale and expired entries are dropped on
+    lookup. Size is bounded by both entry count and bytes of cached ids.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._versions: Dict[Optional[str], int] = {None: 0}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # Catalog listener interface
+    def add(self, product: dict):
+        self._bump(product)
+
+    def add_many(self, products: Iterable[dict]):
+        categories = set()
+        for product in products:
+            categories.update(product.get("categories") or [])
+        self._bump({"categories": categories})
+
+    def remove(self, product: dict):
+        self._bump(product)
+
+    def _bump(self, product: dict):
+        self._versions[None] += 1
+        for category in product.get("categories") or []:
+            self._versions[category] = self._versions.get(category, 0) + 1
+
+    def _drop(self, key: Hashable):
+        ids = self._entries.pop(key)[0]
+        self.bytes -= ids.nbytes
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        ids, tag, version, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self.expirations += 1
+        elif version != self._versions.get(tag, 0):
+            self.invalidations += 1
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ids
+        self._drop(key)
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, ids: np.ndarray, tag: Optional[str] = None):
+        if self.max_entries <= 0 or ids.nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (ids, tag, self._versions.get(tag, 0), time.monotonic() + self.ttl)
+        self.bytes += ids.nbytes
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
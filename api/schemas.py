@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+# BaseModel from Pydantic provides:
+# 1. Data validation - ensures all fields have correct types
+# 2. JSON serialization/deserialization - converts between Python objects and JSON
+# 3. Schema generation - creates OpenAPI documentation automatically
+# 4. Type checking - provides runtime type checking for all fields
+class Product(BaseModel):
+    id: int
+    product: str
+    price: float
+    image: str
+    categories: List[str]
+    rating: Optional[float] = None
+    store: Optional[str] = None
+    badge: Optional[str] = None
+    description: Optional[str] = None
+
+class CartItem(BaseModel):
+    id: int
+    product: str
+    price: float
+    quantity: int
+    image: str
+    store: str
+
+class CartUpdate(BaseModel):
+    product_id: int
+    quantity: int
+
+class SearchQuery(BaseModel):
+    query: str
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    sort_by: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1, le=1000)
+    cursor: Optional[str] = None
+    fields: Optional[str] = None
+    facets: bool = False
+
+PRODUCT_FIELDS = list(Product.__fields__)
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class FacetRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+class Facets(BaseModel):
+    category: List[FacetValue]
+    store: List[FacetValue]
+    price: List[FacetRange]
+    rating: List[FacetRange]
+
+class FacetedProducts(BaseModel):
+    products: List[Product]
+    facets: Facets
+
+class Suggestion(BaseModel):
+    text: str
+    kind: str
+    listings: int
+    edits: int
+
+class RolloutRequest(BaseModel):
+    # Version number, "latest" or an alias ("@champion")
+    version: str
+    shadow_sample: Optional[float] = Field(None, ge=0, le=1)
+    shadow_seconds: Optional[float] = Field(None, ge=0)
+    min_agreement: Optional[float] = Field(None, ge=0, le=1)
+    auto_promote: bool = True
+
+class AIAssistantRequest(BaseModel):
+    message: str
+
+class AIAssistantResponse(BaseModel):
+    message: str
+    intent: Optional[str] = None
+    entities: Optional[List[Dict[str, str]]] = None
+    navigation: Optional[Dict[str, str]] = None
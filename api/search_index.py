@@ -0,0 +1,153 @@
+import math
+import re
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """In-memory inverted index with BM25 ranking over the product catalog.
+
+    Each query token matches indexed terms exactly or as a prefix ("gar"
+    finds "garri"), and a product must match every token. Prefix matches
+    score a little lower than exact ones. Query cost depends on the size of
+    the matching posting lists, not on the size of the catalog.
+    """
+
+    # Term frequencies are weighted per field, so a hit in the product name
+    # counts more than one in the description
+    FIELD_WEIGHTS = {"product": 3.0, "categories": 1.0, "description": 1.0}
+    PREFIX_WEIGHT = 0.8
+    # Distinct (name, description, categories) texts whose terms are cached
+    TERMS_CACHE_SIZE = 65536
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_expansions: int = 64):
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._doc_len: Dict[int, float] = {}
+        self._total_len = 0.0
+        # Sorted vocabulary for prefix lookups
+        self._vocab: List[str] = []
+        self._cached_terms = lru_cache(maxsize=self.TERMS_CACHE_SIZE)(self._terms)
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def _terms(self, name, description, categories) -> Tuple[Dict[str, float], float]:
+        """Weighted term frequencies of a product's text fields, and their total"""
+        terms: Dict[str, float] = {}
+        fields = [("product", name), ("description", description)]
+        fields.extend(("categories", category) for category in categories)
+        for field, text in fields:
+            weight = self.FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0.0) + weight
+        return terms, sum(terms.values())
+
+    def _index(self, product: dict, new_terms: List[str]):
+        doc_id = product["id"]
+        # Rows with the same texts share one (read-only) term dict
+        terms, length = self._cached_terms(
+            product.get("product"), product.get("description"), tuple(product.get("categories") or ())
+        )
+        all_postings = self._postings
+        for term, tf in terms.items():
+            postings = all_postings.get(term)
+            if postings is None:
+                postings = all_postings[term] = {}
+                new_terms.append(term)
+            postings[doc_id] = tf
+        self._doc_terms[doc_id] = terms
+        self._doc_len[doc_id] = length
+        self._total_len += length
+
+    def add(self, product: dict):
+        if product["id"] in self._doc_len:
+            self.remove(product)
+        new_terms: List[str] = []
+        self._index(product, new_terms)
+        for term in new_terms:
+            insort(self._vocab, term)
+
+    def add_many(self, products: Iterable[dict]):
+        """Bulk `add`: the vocabulary is sorted once at the end instead of
+        once per new term"""
+        new_terms: List[str] = []
+        for product in products:
+            if product["id"] in self._doc_len:
+                # remove() expects every indexed term in the vocabulary
+                self._merge_vocab(new_terms)
+                self.remove(product)
+            self._index(product, new_terms)
+        self._merge_vocab(new_terms)
+
+    def _merge_vocab(self, new_terms: List[str]):
+        if new_terms:
+            self._vocab.extend(new_terms)
+            self._vocab.sort()
+            new_terms.clear()
+
+    def remove(self, product: dict):
+        doc_id = product["id"]
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocab[bisect_left(self._vocab, term)]
+        self._total_len -= self._doc_len.pop(doc_id)
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        matches = []
+        if token in self._postings:
+            matches.append((token, 1.0))
+        i = bisect_left(self._vocab, token)
+        while i < len(self._vocab) and len(matches) < self.max_expansions:
+            term = self._vocab[i]
+            if not term.startswith(token):
+                break
+            if term != token:
+                matches.append((term, self.PREFIX_WEIGHT))
+            i += 1
+        return matches
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Return (product id, score) pairs, best match first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self._doc_len:
+            return []
+        n_docs = len(self._doc_len)
+        avg_len = self._total_len / n_docs
+        scores = None
+        for token in tokens:
+            token_scores: Dict[int, float] = {}
+            for term, weight in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if scores is not None and doc_id not in scores:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    score = weight * idf * tf * (self.k1 + 1) / norm
+                    # A product matching several expansions keeps its best one
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: scores[doc_id] + s for doc_id, s in token_scores.items()}
+            if not scores:
+                return []
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,534 @@
+import asyncio
+import heapq
+import zlib
+from array import array
+from bisect import bisect_left, insort
+from itertools import product as combinations
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from gazetteer import name_key
+from instrumentation import logger
+
+KINDS = ("product", "store", "category")
+_KIND_CODE = {kind: i for i, kind in enumerate(KINDS)}
+
+
+def _deletes(word: str, edits: int) -> set:
+    """`word` and every string left after deleting up to `edits` characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+def delete_hash(text: str) -> int:
+    """Hash of a deletion; unlike hash(), the same in every process, so snapshots can store them"""
+    return zlib.crc32(text.encode())
+
+
+def edit_distance(a: str, b: str, prefix: bool = False, limit: Optional[int] = None) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent swaps).
+
+    With `prefix`, the distance from `a` to the closest prefix of `b`, for
+    words still being typed. With `limit`, any distance above it may be
+    returned as limit + 1, which stops early on clearly different words.
+    """
+    if limit is not None and not prefix and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    n = len(b)
+    before, previous = None, list(range(n + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] * (n + 1)
+        row_min = i
+        char, last = a[i - 1], a[i - 2] if i > 1 else ""
+        for j in range(1, n + 1):
+            other = b[j - 1]
+            value = previous[j - 1] + (char != other)
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if j > 1 and char == b[j - 2] and last == other and before[j - 2] + 1 < value:
+                value = before[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if limit is not None and row_min > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous) if prefix else previous[-1]
+
+
+class _Rotations:
+    """Sorted sequence view of (entry, offset) pairs as key suffixes, for bisect"""
+
+    def __init__(self, keys: Sequence[str], entries: np.ndarray, offsets: np.ndarray):
+        self._keys = keys
+        self._entries = entries
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, i: int) -> str:
+        return self._keys[self._entries[i]][self._offsets[i]:]
+
+
+class SuggestArrays:
+    """The sorted arrays of one SuggestIndex build; never changed once built.
+
+    `vocab` holds the indexed words in sorted order, and `delete_words`
+    the vocab position of the word each deletion hash belongs to.
+    """
+
+    def __init__(self, keys: Sequence[str], rot_entries: np.ndarray, rot_offsets: np.ndarray,
+                 vocab: Sequence[str], delete_hashes: np.ndarray, delete_words: np.ndarray):
+        self.rot_entries = rot_entries
+        self.rot_offsets = rot_offsets
+        self.rotations = _Rotations(keys, rot_entries, rot_offsets)
+        self.vocab = vocab
+        self.delete_hashes = delete_hashes
+        self.delete_words = delete_words
+
+
+class SuggestIndex:
+    """Typo-tolerant typeahead over catalog product names, stores and categories.
+
+    Every name is indexed from each of its words ("lagos premium garri",
+    "premium garri", "garri") in one sorted array, so a query prefix maps
+    to one contiguous range, wherever in the name the user started. The
+    range is ranked by popularity (the number of listings using the name,
+    doubled when the query matches its first word); wide ranges, the
+    short prefixes typed first, have their top results memoized.
+
+    Misspelled words are corrected SymSpell-style: each word's first
+    PREFIX_LENGTH characters are indexed under every string left after
+    deleting up to `max_edits` of them, and a query word only has to be
+    compared with the words sharing one of its own deletions. Corrected
+    suggestions rank after exact ones, by their number of edits.
+
+    Subscribed to the catalog like the other indexes; `build` indexes the
+    names loaded so far. Names added later go into a small pending list
+    that queries merge in. Past REBUILD_PENDING of them, the arrays are
+    rebuilt on a thread pool and swapped in whole, with the names added
+    meanwhile carried over, so lookups never wait for a build.
+    """
+
+    # Score multiplier for names matched from their first word
+    FULL_NAME_BOOST = 2
+    # Prefix ranges wider than this have their top MEMO_SIZE results memoized
+    MEMO_MIN_RANGE = 1024
+    MEMO_SIZE = 50
+    # Characters of each word covered by the deletion index
+    PREFIX_LENGTH = 7
+    # Corrections tried per query word, and corrected queries per lookup
+    MAX_CORRECTIONS = 4
+    MAX_QUERIES = 16
+    # Query words whose corrections are remembered (typing repeats them)
+    CORRECTIONS_CACHE_SIZE = 65536
+    REBUILD_PENDING = 4096
+    # Rotations sorted per call while building
+    SORT_SLICE = 16384
+
+    def __init__(self, max_edits: int = 2):
+        self.max_edits = max_edits
+        # (normalized name, kind) -> entry; entries are never reused
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._keys: List[str] = []
+        self._text: List[str] = []
+        self._kinds = np.zeros(1024, dtype=np.int8)
+        self._counts = np.zeros(1024, dtype=np.int64)
+        # word -> listings of the names using it
+        self._words: Dict[str, int] = {}
+        # Arrays of the last build; None until the first
+        self._arrays: Optional[SuggestArrays] = None
+        self._rebuilding: Optional[asyncio.Task] = None
+        # Entries and words that came into use while a rebuild runs
+        self._changed_entries: List[int] = []
+        self._changed_words: List[str] = []
+        self._memo: Dict[Tuple[str, Optional[str]], Tuple[np.ndarray, np.ndarray]] = {}
+        self._corrections: Dict[Tuple[str, bool], List[Tuple[str, int]]] = {}
+        self._reset_pending(np.zeros(0, dtype=bool))
+
+    def _reset_pending(self, indexed: np.ndarray):
+        # Entries in the arrays or in the pending list
+        self._indexed = indexed
+        # (suffix, entry, offset) of names added since the build, sorted
+        self._pending: List[Tuple[str, int, int]] = []
+        # Words added since the build; their ids follow the arrays' vocabulary
+        self._new_words: List[str] = []
+        self._new_word_ids: Dict[str, int] = {}
+        self._new_sorted: List[str] = []
+        # deletion hash -> ids of the words added since the build
+        self._pending_deletes: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._counts))
+
+    # Catalog listener interface
+    def add(self, product: dict, delta: int = 1):
+        self.add_name("product", product.get("product"), delta)
+        self.add_name("store", product.get("store"), delta)
+        for category in product.get("categories") or ():
+            self.add_name("category", category, delta)
+
+    def add_many(self, products: Iterable[dict]):
+        for product in products:
+            self.add(product)
+
+    def remove(self, product: dict):
+        self.add(product, -1)
+
+    def add_name(self, kind: str, text: Optional[str], count: int = 1):
+        """Add `count` listings of a name (negative to remove them)"""
+        key = " ".join(name_key(text))
+        if not key:
+            return
+        entry = self._ids.get((key, kind))
+        if entry is None:
+            if count <= 0:
+                return
+            entry = self._ids[(key, kind)] = len(self._keys)
+            self._keys.append(key)
+            self._text.append(text)
+            if entry == len(self._counts):
+                self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+                self._kinds = np.concatenate([self._kinds, np.zeros_like(self._kinds)])
+            self._kinds[entry] = _KIND_CODE[kind]
+        old = int(self._counts[entry])
+        new = self._counts[entry] = max(0, old + count)
+        for word in key.split():
+            before = self._words.get(word, 0)
+            self._words[word] = before + new - old
+            if before <= 0 < self._words[word]:
+                self._word_added(word)
+        if new and not old:
+            self._entry_added(entry)
+        self._memo.clear()
+
+    def _entry_added(self, entry: int):
+        if self._arrays is None:
+            return
+        if self._rebuilding is not None:
+            self._changed_entries.append(entry)
+        if not self._is_indexed(entry):
+            self._index_new_entry(entry)
+
+    def _word_added(self, word: str):
+        if self._arrays is None:
+            return
+        if self._rebuilding is not None:
+            self._changed_words.append(word)
+        if not self._has_word(word):
+            self._index_new_word(word)
+
+    # Derived structures
+    def build(self):
+        """Index every name now (at startup, before serving)"""
+        live = self._counts[:len(self._keys)] > 0
+        self._install(self.build_arrays(self._keys, live, self._words), live)
+
+    def build_arrays(self, keys: Sequence[str], live: np.ndarray, words: Dict[str, int]) -> SuggestArrays:
+        """Arrays over the names of `keys` at the `live` entries and the `words` with listings.
+
+        Reads nothing else of the index, so it can run on another thread.
+        """
+        # Filled as typed arrays: converting lists this long to NumPy would
+        # hold the GIL, and stall the event loop, for as long as the copy
+        rotations, entries, offsets = [], array("q"), array("i")
+        for entry in np.flatnonzero(live).tolist():
+            key = keys[entry]
+            start = 0
+            while True:
+                rotations.append(key[start:])
+                entries.append(entry)
+                offsets.append(start)
+                start = key.find(" ", start) + 1
+                if not start:
+                    break
+        # Sorted in slices, then merged, for the same reason
+        key = rotations.__getitem__
+        runs = [sorted(range(start, min(start + self.SORT_SLICE, len(rotations))), key=key)
+                for start in range(0, len(rotations), self.SORT_SLICE)]
+        order = array("q", heapq.merge(*runs, key=key) if len(runs) > 1 else (runs or [[]])[0])
+        order = np.frombuffer(order, dtype=np.int64)
+        del rotations, runs
+
+        vocab = sorted(word for word, count in words.items() if count > 0)
+        hashes, ids = array("I"), array("i")
+        for i, word in enumerate(vocab):
+            for deleted in _deletes(word[:self.PREFIX_LENGTH], self.max_edits):
+                hashes.append(delete_hash(deleted))
+                ids.append(i)
+        hashes = np.frombuffer(hashes, dtype=np.uint32)
+        by_hash = np.argsort(hashes, kind="stable")
+        return SuggestArrays(
+            keys,
+            np.frombuffer(entries, dtype=np.int64)[order],
+            np.frombuffer(offsets, dtype=np.int32)[order],
+            vocab,
+            hashes[by_hash],
+            np.frombuffer(ids, dtype=np.int32)[by_hash],
+        )
+
+    def _install(self, arrays: SuggestArrays, indexed: np.ndarray):
+        """Swap in the arrays of a build, then index what came into use since it started"""
+        self._arrays = arrays
+        self._reset_pending(indexed)
+        self._memo.clear()
+        self._corrections.clear()
+        entries, words = self._changed_entries, self._changed_words
+        self._changed_entries, self._changed_words = [], []
+        for word in words:
+            if self._words.get(word, 0) > 0 and not self._has_word(word):
+                self._index_new_word(word)
+        for entry in entries:
+            if self._counts[entry] > 0 and not self._is_indexed(entry):
+                self._index_new_entry(entry)
+
+    def _schedule_rebuild(self):
+        if self._rebuilding is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not serving requests (scripts, benchmarks): build in place
+            self.build()
+            return
+        live = self._counts[:len(self._keys)] > 0
+        self._rebuilding = loop.create_task(self._rebuild(loop, live, dict(self._words)))
+
+    async def _rebuild(self, loop: asyncio.AbstractEventLoop, live: np.ndarray, words: Dict[str, int]):
+        try:
+            arrays = await loop.run_in_executor(None, self.build_arrays, self._keys, live, words)
+        except Exception:
+            logger.exception("Rebuilding the suggest index failed")
+            arrays = None
+        self._rebuilding = None
+        if arrays is not None:
+            self._install(arrays, live)
+        else:
+            self._changed_entries, self._changed_words = [], []
+
+    def _index_new_entry(self, entry: int):
+        if len(self._pending) >= self.REBUILD_PENDING:
+            # Left to the rebuild, which indexes every name in use
+            self._schedule_rebuild()
+            return
+        key = self._keys[entry]
+        start = 0
+        while True:
+            insort(self._pending, (key[start:], entry, start))
+            start = key.find(" ", start) + 1
+            if not start:
+                break
+        if entry >= len(self._indexed):
+            grown = np.zeros(len(self._counts), dtype=bool)
+            grown[:len(self._indexed)] = self._indexed
+            self._indexed = grown
+        self._indexed[entry] = True
+
+    def _is_indexed(self, entry: int) -> bool:
+        return entry < len(self._indexed) and self._indexed[entry]
+
+    def _has_word(self, word: str) -> bool:
+        vocab = self._arrays.vocab
+        i = bisect_left(vocab, word)
+        return (i < len(vocab) and vocab[i] == word) or word in self._new_word_ids
+
+    def _index_new_word(self, word: str):
+        self._corrections.clear()
+        i = self._new_word_ids[word] = len(self._arrays.vocab) + len(self._new_words)
+        self._new_words.append(word)
+        insort(self._new_sorted, word)
+        for deleted in _deletes(word[:self.PREFIX_LENGTH], self.max_edits):
+            self._pending_deletes.setdefault(delete_hash(deleted), []).append(i)
+
+    # Storage lookups (read-only snapshots override these)
+    def _word_count(self, word: str) -> int:
+        return self._words.get(word, 0)
+
+    def _entry(self, key: str, kind: str) -> Optional[int]:
+        return self._ids.get((key, kind))
+
+    def _vocab_word(self, i: int) -> str:
+        vocab = self._arrays.vocab
+        return vocab[i] if i < len(vocab) else self._new_words[i - len(vocab)]
+
+    def _completes(self, prefix: str) -> bool:
+        """Whether an indexed word starts with `prefix`"""
+        for words in (self._arrays.vocab, self._new_sorted):
+            i = bisect_left(words, prefix)
+            if i < len(words) and words[i].startswith(prefix):
+                return True
+        return False
+
+    # Lookups
+    def _scored(self, entries: np.ndarray, offsets: np.ndarray, kind: Optional[str],
+                limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Best `limit` live entries of a prefix range and their scores, one row per entry"""
+        scores = self._counts[entries] * np.where(offsets == 0, self.FULL_NAME_BOOST, 1)
+        keep = scores > 0
+        if kind is not None:
+            keep &= self._kinds[entries] == _KIND_CODE[kind]
+        entries, scores = entries[keep], scores[keep]
+        # Higher score first, then older entry: one sortable key per row
+        keys = (scores << 32) | (0xFFFFFFFF - entries)
+        # A name matched through several of its words has several rows, so
+        # a few times `limit` rows are kept to leave `limit` distinct names
+        candidates = 4 * limit
+        if len(keys) > candidates:
+            top = np.argpartition(-keys, candidates)[:candidates]
+            distinct = len(np.unique(entries[top]))
+            if distinct >= limit or distinct == len(np.unique(entries)):
+                entries, scores, keys = entries[top], scores[top], keys[top]
+        order = np.argsort(-keys, kind="stable")
+        entries, scores = entries[order], scores[order]
+        _, first = np.unique(entries, return_index=True)
+        first.sort()
+        return entries[first][:limit], scores[first][:limit]
+
+    def _top(self, prefix: str, limit: int, kind: Optional[str]) -> List[Tuple[int, int]]:
+        """Best `limit` (entry, score) pairs among names with a word sequence starting with `prefix`"""
+        arrays = self._arrays
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        lo, hi = bisect_left(arrays.rotations, prefix), bisect_left(arrays.rotations, upper)
+        if hi - lo > self.MEMO_MIN_RANGE and limit <= self.MEMO_SIZE:
+            memo = self._memo.get((prefix, kind))
+            if memo is None:
+                memo = self._memo[(prefix, kind)] = self._scored(
+                    arrays.rot_entries[lo:hi], arrays.rot_offsets[lo:hi], kind, self.MEMO_SIZE)
+            entries, scores = memo
+        else:
+            entries, scores = self._scored(arrays.rot_entries[lo:hi], arrays.rot_offsets[lo:hi], kind, limit)
+        found = list(zip(entries[:limit].tolist(), scores[:limit].tolist()))
+        if self._pending:
+            i = bisect_left(self._pending, (prefix,))
+            j = bisect_left(self._pending, (upper,))
+            if i < j:
+                pending = self._pending[i:j]
+                extra = self._scored(
+                    np.array([p[1] for p in pending], dtype=np.int64),
+                    np.array([p[2] for p in pending], dtype=np.int32),
+                    kind,
+                    limit,
+                )
+                found = {**dict(zip(*extra)), **dict(found)}
+                found = sorted(found.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return found
+
+    def _allowed_edits(self, word: str) -> int:
+        if len(word) <= 2:
+            return 0
+        return min(self.max_edits, 1 if len(word) <= 4 else 2)
+
+    def corrections(self, word: str, prefix: bool = False) -> List[Tuple[str, int]]:
+        """Known words within the allowed edits of `word`, closest and most used first.
+
+        With `prefix`, `word` may be the start of a longer word.
+        """
+        if self._arrays is None:
+            return []
+        cached = self._corrections.get((word, prefix))
+        if cached is None:
+            if len(self._corrections) >= self.CORRECTIONS_CACHE_SIZE:
+                self._corrections.clear()
+            cached = self._corrections[(word, prefix)] = self._correct(word, prefix)
+        return cached
+
+    def _correct(self, word: str, prefix: bool) -> List[Tuple[str, int]]:
+        edits = self._allowed_edits(word)
+        if not edits:
+            return []
+        arrays = self._arrays
+        hashes = np.array([delete_hash(d) for d in _deletes(word[:self.PREFIX_LENGTH], edits)], dtype=np.uint32)
+        lo = np.searchsorted(arrays.delete_hashes, hashes, side="left")
+        hi = np.searchsorted(arrays.delete_hashes, hashes, side="right")
+        candidates = set()
+        for start, end in zip(lo[lo < hi].tolist(), hi[lo < hi].tolist()):
+            candidates.update(arrays.delete_words[start:end].tolist())
+        if self._pending_deletes:
+            for h in hashes.tolist():
+                candidates.update(self._pending_deletes.get(h, ()))
+        found = []
+        for candidate in candidates:
+            known = self._vocab_word(candidate)
+            count = self._word_count(known)
+            if known == word or count <= 0:
+                continue
+            # The prefix distance never exceeds the full one; comparing with
+            # the start of the known word is enough
+            if prefix:
+                distance = edit_distance(word, known[:len(word) + edits], prefix=True, limit=edits)
+            else:
+                distance = edit_distance(word, known, limit=edits)
+            # Words the query is an exact prefix of are already suggested
+            if 0 < distance <= edits:
+                found.append((distance, -count, known))
+        found.sort()
+        return [(known, distance) for distance, _, known in found[:self.MAX_CORRECTIONS]]
+
+    def _spellings(self, words: List[str], last_is_prefix: bool) -> List[Tuple[List[str], int]]:
+        """Corrected versions of a query's words, fewest edits first (without the query itself)"""
+        options = []
+        for i, word in enumerate(words):
+            prefix = last_is_prefix and i == len(words) - 1
+            if prefix:
+                # Still typing a known word: its completions are exact matches
+                known = self._completes(word)
+            else:
+                known = self._word_count(word) > 0
+            choices = [(word, 0)]
+            if not known:
+                choices.extend(self.corrections(word, prefix))
+            options.append(choices)
+        spellings = []
+        for choice in combinations(*options):
+            edits = sum(e for _, e in choice)
+            if edits:
+                spellings.append(([w for w, _ in choice], edits))
+        spellings.sort(key=lambda s: s[1])
+        return spellings[:self.MAX_QUERIES]
+
+    def suggest(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[dict]:
+        """Up to `limit` names completing `query`, exact matches first"""
+        words = list(name_key(query))
+        if not words or limit <= 0 or self._arrays is None:
+            return []
+        # A query ending in a word character is still being typed
+        last_is_prefix = bool(query) and query[-1].isalnum()
+        found: Dict[int, Tuple[int, int]] = {}
+        for entry, score in self._top(" ".join(words), limit, kind):
+            found[entry] = (0, score)
+        if len(found) < limit and self.max_edits:
+            for spelling, edits in self._spellings(words, last_is_prefix):
+                for entry, score in self._top(" ".join(spelling), limit, kind):
+                    if entry not in found:
+                        found[entry] = (edits, score)
+                if len(found) >= limit:
+                    break
+        ranked = sorted(found.items(), key=lambda item: (item[1][0], -item[1][1], self._keys[item[0]]))
+        return [
+            {"text": self._text[entry], "kind": KINDS[self._kinds[entry]], "listings": int(self._counts[entry]),
+             "edits": edits}
+            for entry, (edits, _) in ranked[:limit]
+        ]
+
+    def snap(self, text: str, kind: str) -> Optional[Tuple[str, int]]:
+        """The catalog name of `kind` closest to `text` as a whole, and its edits
+
+        None when no name is within the allowed edits of every word.
+        """
+        words = list(name_key(text))
+        if not words or self._arrays is None:
+            return None
+        spellings = [(words, 0)] + self._spellings(words, last_is_prefix=False)
+        for spelling, edits in spellings:
+            entry = self._entry(" ".join(spelling), kind)
+            if entry is not None and self._counts[entry] > 0:
+                return self._text[entry], edits
+        return None
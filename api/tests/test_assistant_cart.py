@@ -0,0 +1,57 @@
+"""The assistant's addToCart and removeFromCart replies, against the in-memory cart.
+
+Runs without the models: the replies are produced from a given intent and
+entities, as after inference.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import unittest
+
+os.environ["CART_BACKEND"] = "memory"
+os.environ.setdefault("MODEL_LOADING", "lazy")
+os.environ.setdefault("INTENT_BACKEND", "numpy")
+os.environ.setdefault("NER_MODEL_PATH", "")
+
+import main  # noqa: E402
+
+USER = "default_user"
+GARRI = [{"text": "Garri", "label": "product"}, {"text": "Lagos Premium Garri", "label": "store"}]
+
+
+class AssistantCartTest(unittest.TestCase):
+    def setUp(self):
+        main.cart_store.clear(USER)
+
+    def reply(self, intent, entities):
+        return asyncio.run(main.assistant_reply(intent, entities)).message
+
+    def test_add_to_cart(self):
+        message = self.reply("addToCart", GARRI)
+        self.assertTrue(message.startswith("I've added Garri from Lagos Premium Garri"), message)
+        cart = main.cart_store.get(USER)
+        self.assertEqual([(item["product"], item["quantity"]) for item in cart], [("Garri", 1)])
+
+        self.reply("addToCart", GARRI)
+        self.assertEqual(main.cart_store.get(USER)[0]["quantity"], 2)
+
+    def test_add_unknown_product(self):
+        message = self.reply("addToCart", [{"text": "Unobtainium", "label": "product"}] + GARRI[1:])
+        self.assertTrue(message.startswith("I couldn't find Unobtainium"), message)
+        self.assertEqual(main.cart_store.get(USER), [])
+
+    def test_remove_from_cart(self):
+        self.reply("addToCart", GARRI)
+        message = self.reply("removeFromCart", GARRI)
+        self.assertTrue(message.startswith("I've removed Garri"), message)
+        self.assertEqual(main.cart_store.get(USER), [])
+
+    def test_remove_without_cart(self):
+        main.cart_store.backend._carts.pop(USER, None)
+        message = self.reply("removeFromCart", GARRI)
+        self.assertTrue(message.startswith("I couldn't find Garri in your cart"), message)
+
+
+if __name__ == "__main__":
+    unittest.main()
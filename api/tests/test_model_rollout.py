@@ -0,0 +1,84 @@
+"""ModelRollout against stub registries and models, without loading any model.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import unittest
+
+import numpy as np
+
+from model_registry import ModelRegistry
+from model_rollout import ModelRollout
+
+
+class StubModels:
+    classes = np.array(["greeting", "viewCart"])
+
+    def prepare_sentences(self, messages):
+        return np.zeros((len(messages), 1))
+
+    def predict_intents(self, features):
+        return ["greeting"] * len(features)
+
+
+class StubRegistry:
+    """Registry whose "latest" names `self.latest`"""
+
+    def __init__(self, latest: int):
+        self.latest = latest
+
+    def resolve(self, ref):
+        version = int(ref) if ref.isdigit() else self.latest
+        return {"name": "Intent", "version": version, "path": f"/models/{version}"}
+
+
+async def no_warmup(models):
+    pass
+
+
+class ModelRolloutWatchTest(unittest.TestCase):
+    def rollout(self, registry):
+        models = ModelRegistry(StubModels)
+        rollout = ModelRollout(registry, models, lambda serving, path: StubModels(), no_warmup,
+                               shadow_sample=1.0, shadow_seconds=60.0)
+        rollout.version = registry.resolve("1")
+        return rollout
+
+    def test_poll_does_not_restart_a_cancelled_version(self):
+        async def run():
+            registry = StubRegistry(latest=2)
+            rollout = self.rollout(registry)
+            await rollout.poll("latest")
+            await asyncio.sleep(0.05)
+            self.assertEqual(rollout.state, "shadowing")
+            await rollout.cancel()
+
+            await rollout.poll("latest")
+            self.assertEqual(rollout.state, "cancelled")
+            self.assertEqual(rollout.version["version"], 1)
+
+            # A newer version is still rolled out
+            registry.latest = 3
+            await rollout.poll("latest")
+            self.assertEqual(rollout.candidate_version["version"], 3)
+            await rollout.stop()
+
+        asyncio.run(run())
+
+    def test_cancelled_version_can_be_started_by_hand(self):
+        async def run():
+            rollout = self.rollout(StubRegistry(latest=2))
+            rollout.start("2")
+            await asyncio.sleep(0.05)
+            await rollout.cancel()
+            rollout.start("2", shadow_seconds=0)
+            await asyncio.sleep(0.05)
+            self.assertEqual(rollout.state, "promoted")
+            self.assertEqual(rollout.version["version"], 2)
+            await rollout.stop()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Parity of the NumPy intent backend with the Keras model it was exported from.
+
+The fixture holds the token ids and class probabilities the Keras model and
+tokenizer gave for export_intent_model.py's parity corpus; re-record it with
+`python export_intent_model.py --fixture-out tests/fixtures/keras_intent_outputs.npz`
+after retraining. Runs without TensorFlow:
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+import numpy as np
+
+import config
+from numpy_intent import NumpyIntentModel
+from text_tokenizer import VocabTokenizer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "keras_intent_outputs.npz")
+
+# Same bound as the exporter's parity check
+TOLERANCE = 1e-5
+
+
+class NumpyIntentParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with np.load(FIXTURE, allow_pickle=False) as data:
+            cls.messages = list(data["messages"])
+            cls.token_ids = data["token_ids"]
+            cls.keras_probs = data["probs"]
+        cls.model = NumpyIntentModel.load(config.INTENT_NUMPY_WEIGHTS_PATH)
+
+    def test_token_ids_match_keras(self):
+        tokenizer = VocabTokenizer.load(config.TOKENIZER_VOCAB_PATH)
+        ids = tokenizer.encode(self.messages, self.model.max_seq_len)
+        np.testing.assert_array_equal(ids, self.token_ids)
+
+    def test_probabilities_match_keras(self):
+        probs = self.model.predict(self.token_ids)
+        self.assertEqual(probs.shape, self.keras_probs.shape)
+        np.testing.assert_allclose(probs, self.keras_probs, rtol=0, atol=TOLERANCE)
+        np.testing.assert_array_equal(probs.argmax(axis=-1), self.keras_probs.argmax(axis=-1))
+
+    def test_batch_composition_does_not_change_results(self):
+        # Masking stops at the longest sequence of each batch, so a message
+        # must score the same alone as next to longer ones
+        alone = np.concatenate([self.model.predict(self.token_ids[i:i + 1]) for i in range(20)])
+        np.testing.assert_allclose(alone, self.keras_probs[:20], rtol=0, atol=TOLERANCE)
+
+
+if __name__ == "__main__":
+    unittest.main()
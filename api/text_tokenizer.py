@@ -0,0 +1,79 @@
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class VocabTokenizer:
+    """Replacement for the pickled Keras Tokenizer at inference time.
+
+    Loads the word index and text settings from a plain JSON file (written
+    by export_intent_model.py) and reproduces Keras' `texts_to_sequences`
+    and post-padding, without importing TensorFlow. `encode` tokenizes a
+    whole batch straight into one int32 array.
+    """
+
+    def __init__(
+        self,
+        word_index: Dict[str, int],
+        filters: str,
+        lower: bool = True,
+        split: str = " ",
+        oov_token: Optional[str] = None,
+        num_words: Optional[int] = None,
+    ):
+        self.word_index = word_index
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        self.oov_token = oov_token
+        self.num_words = num_words
+        self._translate = str.maketrans({c: split for c in filters})
+        self._oov_index = word_index.get(oov_token) if oov_token is not None else None
+        # Words past num_words behave like unknown words
+        self._ids = {w: i for w, i in word_index.items() if not (num_words and i >= num_words)}
+
+    @classmethod
+    def load(cls, path: str) -> "VocabTokenizer":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(
+            data["word_index"],
+            data["filters"],
+            lower=data["lower"],
+            split=data["split"],
+            oov_token=data["oov_token"],
+            num_words=data["num_words"],
+        )
+
+    def _words(self, text: str) -> List[str]:
+        if self.lower:
+            text = text.lower()
+        return [word for word in text.translate(self._translate).split(self.split) if word]
+
+    def _sequence(self, text: str) -> List[int]:
+        ids = self._ids
+        oov = self._oov_index
+        if oov is not None:
+            return [ids.get(word, oov) for word in self._words(text)]
+        return [ids[word] for word in self._words(text) if word in ids]
+
+    def texts_to_sequences(self, texts: List[str]) -> List[List[int]]:
+        return [self._sequence(text) for text in texts]
+
+    def encode(self, texts: List[str], maxlen: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Same ids as Keras' `pad_sequences(texts_to_sequences(texts), maxlen, padding='post')`.
+
+        The ids of the whole batch are written into a single zeroed int32
+        `(len(texts), maxlen)` array (`out` if given); like Keras, long
+        messages keep their last `maxlen` ids.
+        """
+        if out is None:
+            out = np.zeros((len(texts), maxlen), dtype=np.int32)
+        else:
+            out.fill(0)
+        for row, text in enumerate(texts):
+            sequence = self._sequence(text)[-maxlen:]
+            out[row, :len(sequence)] = sequence
+        return out
+
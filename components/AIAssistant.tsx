@@ -4,6 +4,14 @@ import api from '../utils/api';
 import { useCart } from '../contexts/CartContext';
 import { useRouter } from 'next/router';
 
+// Interim replies shown while the assistant finishes a request
+const INTENT_STATUS: Record<string, string> = {
+  addToCart: 'Adding that to your cart...',
+  removeFromCart: 'Removing that from your cart...',
+  searchProduct: 'Searching the catalog...',
+  viewCart: 'Opening your cart...',
+};
+
 export default function AIAssistant({ onClose }: AIAssistantProps) {
   const router = useRouter();
   const [inputMessage, setInputMessage] = useState('');
@@ -32,13 +40,21 @@ export default function AIAssistant({ onClose }: AIAssistantProps) {
     setIsLoading(true);
 
     try {
-      const response = await api.sendMessage(inputMessage);
+      // Show what the assistant is doing as soon as the intent is known,
+      // then replace it with the reply
+      let showingStatus = false;
+      const response = await api.streamMessage(inputMessage, (event) => {
+        if (event.event !== 'intent' || !INTENT_STATUS[event.data]) return;
+        const status: Message = { text: INTENT_STATUS[event.data], isUser: false };
+        setMessages(prev => [...prev, status]);
+        showingStatus = true;
+      });
       
       const aiMessage: Message = {
         text: response.message,
         isUser: false,
       };
-      setMessages(prev => [...prev, aiMessage]);
+      setMessages(prev => (showingStatus ? [...prev.slice(0, -1), aiMessage] : [...prev, aiMessage]));
 
       if (response.navigation) {
         if (response.navigation.action === 'navigate') {
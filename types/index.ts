@@ -41,6 +41,13 @@ export interface AIResponse {
   };
 }
 
+// Events of the streamed assistant reply, in the order they arrive
+export type AIStreamEvent =
+  | { event: 'intent'; data: string }
+  | { event: 'entities'; data: Entity[] }
+  | { event: 'response'; data: AIResponse }
+  | { event: 'error'; data: { status: number; detail: string } };
+
 export interface AIAssistantProps {
   onClose: () => void;
 } 
\ No newline at end of file
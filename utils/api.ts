@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Product, CartItem, AIResponse } from '../types';
+import { Product, CartItem, AIResponse, AIStreamEvent } from '../types';
 
 const BASE_URL = 'http://localhost:8000';
 
@@ -84,6 +84,45 @@ const api = {
   sendMessage: async (message: string): Promise<AIResponse> => {
     const response = await axios.post(`${BASE_URL}/personal_assistant`, { message });
     return response.data;
+  },
+
+  // Streams the intent and entities as soon as they are known, then the
+  // full reply; resolves with the reply
+  streamMessage: async (message: string, onEvent: (event: AIStreamEvent) => void): Promise<AIResponse> => {
+    const response = await fetch(`${BASE_URL}/personal_assistant/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
+      body: JSON.stringify({ message }),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Assistant request failed with status ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let reply: AIResponse | undefined;
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value, { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = lines.pop() ?? '';
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event: AIStreamEvent = JSON.parse(line);
+        if (event.event === 'error') {
+          throw new Error(event.data.detail);
+        }
+        if (event.event === 'response') {
+          reply = event.data;
+        }
+        onEvent(event);
+      }
+      if (done) break;
+    }
+    if (!reply) {
+      throw new Error('Assistant stream ended without a reply');
+    }
+    return reply;
   }
 };
 